@@ -1,5 +1,7 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin
+from .cache import bump_catalog_version
+from .search import invalidate_index
 from .models import Category, Product
 
 
@@ -18,18 +20,28 @@ class CategoryAdmin(ModelAdmin):
         }),
     )
 
+    def delete_queryset(self, request, queryset):
+        # Bulk delete skips Category.delete(), so invalidate here
+        super().delete_queryset(request, queryset)
+        bump_catalog_version()
+
 
 @admin.register(Product)
 class ProductAdmin(ModelAdmin):
-    list_display = ("name", "category", "price", "stock_qty", "is_featured", "active_status")
+    list_display = ("name", "category", "price", "stock_qty", "allocated_qty", "on_hand_qty", "is_featured", "active_status")
     list_editable = ("stock_qty", "price")
     search_fields = ("name", "slug", "name_en", "name_th")
     list_filter = ("category", "is_active", "is_featured")
+    readonly_fields = ("allocated_qty", "on_hand_qty")
     fieldsets = (
         ("ຂໍ້ມູນສິນຄ້າ", {
             "fields": ("category", "name", "description", "price", "stock_qty"),
             "description": "ຂໍ້ມູນທີ່ລູກຄ້າເຫັນໃນຮ້ານ — ຕື່ມໃຫ້ຄົບເພື່ອຂາຍງ່າຍ",
         }),
+        ("ສະຕັອກ", {
+            "fields": ("allocated_qty", "on_hand_qty"),
+            "description": "ລະບົບຄິດໄລ່ໃຫ້ — ໃນຮ້ານ = ຈຳນວນຄົງເຫຼືອ + ກັນໄວ້ໃຫ້ການຈອງ",
+        }),
         ("ຮູບພາບ", {
             "fields": ("image_url", "image"),
             "description": "ແນະນຳໃຊ້ລິ້ງ URL (ບໍ່ຫາຍເມື່ອ deploy). ຖ້າມີທັງສອງ — ລະບົບໃຊ້ URL ກ່ອນ",
@@ -46,3 +58,9 @@ class ProductAdmin(ModelAdmin):
     @admin.display(description="ເປີດຂາຍ", boolean=True)
     def active_status(self, obj):
         return obj.is_active
+
+    def delete_queryset(self, request, queryset):
+        # Bulk delete skips Product.delete(), so invalidate here
+        super().delete_queryset(request, queryset)
+        bump_catalog_version()
+        invalidate_index()
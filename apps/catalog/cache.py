@@ -0,0 +1,184 @@
+"""Versioned cache for storefront catalog reads (home, shop grid, categories).
+
+Two tiers:
+- a per-worker LRU dict (``_local``, at most CATALOG_CACHE_MAX_LOCAL
+  entries) that serves repeat hits with zero queries and no pickling,
+- an optional shared Django cache alias (``CATALOG_CACHE_ALIAS``, e.g. a
+  FileBasedCache or DatabaseCache) so a cold worker can pick up what another
+  worker already built.
+
+Every entry is tagged with the catalog version. Anything that changes what
+the storefront shows (Product/Category save or delete, stock movements in
+apps.catalog.stock, admin bulk edits) calls ``bump_catalog_version()``, which
+makes every cached entry stale at once — no per-key invalidation needed.
+
+The version counter has to be seen by every worker. With a shared alias it
+lives there; with a cache private to one process (LocMemCache, the
+default) it lives in a CacheVersion row instead, read once per request —
+otherwise a bump in one worker would leave the others serving stale pages.
+``version()``/``bump()`` do the same for other counters (the search index).
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models import F
+
+from config.metrics import CACHE_LOOKUPS
+
+CATALOG = "catalog"
+# Cache backends private to one process
+LOCAL_BACKENDS = ("LocMemCache", "DummyCache")
+
+_local: OrderedDict = OrderedDict()
+_local_lock = threading.Lock()
+# Counters already read during the current request (name -> version)
+_request = threading.local()
+
+
+def _shared():
+    return caches[getattr(settings, "CATALOG_CACHE_ALIAS", "default")]
+
+
+def shared_across_workers(cache) -> bool:
+    """False for cache backends that live inside one process."""
+    return type(cache).__name__ not in LOCAL_BACKENDS
+
+
+def _start_request(**kwargs) -> None:
+    _request.versions = {}
+
+
+def _end_request(**kwargs) -> None:
+    _request.versions = None
+
+
+request_started.connect(_start_request)
+request_finished.connect(_end_request)
+
+
+def _read(name: str) -> int:
+    shared = _shared()
+    if shared_across_workers(shared):
+        key = f"{name}:version"
+        version = shared.get(key)
+        if version is None:
+            # add() so two workers starting at once agree on the first value
+            shared.add(key, 1, timeout=None)
+            version = shared.get(key) or 1
+        return version
+    from .models import CacheVersion
+
+    return CacheVersion.objects.filter(name=name).values_list("version", flat=True).first() or 1
+
+
+def version(name: str) -> int:
+    """Current value of the ``name`` counter (once per request when it is
+    kept in the database)."""
+    versions = getattr(_request, "versions", None)
+    if versions is None:
+        return _read(name)
+    if name not in versions:
+        versions[name] = _read(name)
+    return versions[name]
+
+
+def bump(name: str) -> int | None:
+    """Move the ``name`` counter on, right now. Returns the new value, or
+    None when the counter had to be started over."""
+    versions = getattr(_request, "versions", None)
+    if versions:
+        versions.pop(name, None)
+    shared = _shared()
+    if shared_across_workers(shared):
+        key = f"{name}:version"
+        try:
+            return shared.incr(key)
+        except ValueError:
+            shared.set(key, 2, timeout=None)
+            return None
+    from .models import CacheVersion
+
+    if not CacheVersion.objects.filter(name=name).update(version=F("version") + 1):
+        CacheVersion.objects.get_or_create(name=name, defaults={"version": 2})
+        return None
+    # Read back separately: another bump in between only makes the caller
+    # see a value further on, never one it could wrongly claim
+    return _read(name)
+
+
+def catalog_version() -> int:
+    return version(CATALOG)
+
+
+def _bump_now() -> None:
+    bump(CATALOG)
+    with _local_lock:
+        _local.clear()
+
+
+def bump_catalog_version() -> None:
+    """Invalidate every cached catalog read. Deferred to commit when called
+    inside a transaction, so a rolled-back edit does not evict the cache and
+    a concurrent request cannot re-cache pre-commit data under the new
+    version. A bump that fails (the counter row is locked) is logged rather
+    than failing a sale that has already committed; entries then age out
+    after CATALOG_CACHE_TIMEOUT."""
+    transaction.on_commit(_bump_now, robust=True)
+
+
+def cached(key: str, builder, timeout: int | None = None):
+    """Return ``builder()`` memoized under ``key`` for the current catalog
+    version. ``builder`` must return something picklable (model instances
+    and lists of them are fine). Keys must come from a bounded set — never
+    raw search text or cursors."""
+    current = catalog_version()
+    with _local_lock:
+        local = _local.get(key)
+        if local is not None and local[0] == current:
+            _local.move_to_end(key)
+            CACHE_LOOKUPS.inc(result="local")
+            return local[1]
+
+    if timeout is None:
+        timeout = getattr(settings, "CATALOG_CACHE_TIMEOUT", 600)
+    shared = _shared()
+    shared_key = f"catalog:{current}:{key}"
+    value = shared.get(shared_key)
+    if value is None:
+        CACHE_LOOKUPS.inc(result="miss")
+        value = builder()
+        shared.set(shared_key, value, timeout)
+    else:
+        CACHE_LOOKUPS.inc(result="shared")
+
+    with _local_lock:
+        _local[key] = (current, value)
+        _local.move_to_end(key)
+        while len(_local) > getattr(settings, "CATALOG_CACHE_MAX_LOCAL", 512):
+            _local.popitem(last=False)
+    return value
+
+
+def is_cached(key: str) -> bool:
+    """True when this worker's own tier holds ``key`` for the current version."""
+    local = _local.get(key)
+    return local is not None and local[0] == catalog_version()
+
+
+def reset_catalog_cache() -> None:
+    """Drop both tiers outright (tests, manual recovery). Moves the version
+    on rather than deleting it, so entries already in the shared cache under
+    an old version can never be picked up again. A per-process alias is
+    also emptied: its counter row can be rolled back (test transactions),
+    so a version number may come round again."""
+    _bump_now()
+    shared = _shared()
+    if not shared_across_workers(shared):
+        shared.clear()
@@ -0,0 +1,178 @@
+"""Responsive product image renditions.
+
+Product photos are either uploaded (``Product.image``, under MEDIA_ROOT)
+or point at a bundled file (``image_url="/static/img/products/…"``). For
+those local sources the ``{% product_picture %}`` tag emits a <picture>
+with AVIF/WebP/JPEG ``srcset``s at PRODUCT_IMAGE_WIDTHS, so a phone in a
+two-column grid fetches a ~320px WebP instead of the full original.
+External ``image_url``s (CDNs) are rendered as a plain <img>.
+
+Renditions are generated on first request (apps.catalog.views) and kept
+under PRODUCT_IMAGE_CACHE_DIR/<content hash>/<width>.<ext>. The content
+hash is part of the URL, so a replaced photo gets new URLs and the old
+ones can be cached forever (``immutable``). A tiny ``source`` file next to
+the renditions records where the original lives, which lets any worker
+(or a fresh process after a deploy) build a missing rendition.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.conf import settings
+
+# ext → (Pillow format, content type, save options)
+FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 55}),
+    "webp": ("WEBP", "image/webp", {"quality": 78, "method": 4}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+
+@dataclass(frozen=True)
+class SourceImage:
+    path: Path
+    digest: str
+    width: int
+    height: int
+
+
+_sources: dict[tuple[Path, Path], tuple[tuple[int, int], SourceImage]] = {}
+_sources_lock = threading.Lock()
+
+
+def widths() -> tuple[int, ...]:
+    return tuple(getattr(settings, "PRODUCT_IMAGE_WIDTHS", (160, 320, 480, 640, 960)))
+
+
+def cache_dir() -> Path:
+    return Path(getattr(settings, "PRODUCT_IMAGE_CACHE_DIR", Path(settings.BASE_DIR) / "var" / "renditions"))
+
+
+def available_formats() -> list[str]:
+    """Modern formats first; only those this Pillow build can write."""
+    from PIL import features
+
+    return [ext for ext in ("avif", "webp") if features.check(ext)] + ["jpg"]
+
+
+def local_source(product) -> Path | None:
+    """Filesystem path of the product's photo, or None for remote URLs."""
+    if product.image_url:
+        url = product.image_url
+        static_url, media_url = settings.STATIC_URL, settings.MEDIA_URL
+        if url.startswith(static_url):
+            from django.contrib.staticfiles import finders
+
+            found = finders.find(url[len(static_url):])
+            if found:
+                return Path(found)
+            candidate = Path(settings.STATIC_ROOT) / url[len(static_url):]
+            return candidate if candidate.is_file() else None
+        if url.startswith(media_url):
+            candidate = Path(settings.MEDIA_ROOT) / url[len(media_url):]
+            return candidate if candidate.is_file() else None
+        return None
+    if product.image:
+        try:
+            path = Path(product.image.path)
+        except NotImplementedError:  # remote storage backend
+            return None
+        return path if path.is_file() else None
+    return None
+
+
+def inspect(path: Path) -> SourceImage | None:
+    """Content hash and size of ``path``, memoized on (mtime, size)."""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = (cache_dir(), path)
+    with _sources_lock:
+        hit = _sources.get(key)
+    if hit and hit[0] == stamp:
+        return hit[1]
+
+    data = path.read_bytes()
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            size = image.size
+    except (UnidentifiedImageError, OSError):
+        return None
+    source = SourceImage(path, hashlib.sha256(data).hexdigest()[:20], *size)
+    _remember_source(source)
+    with _sources_lock:
+        _sources[key] = (stamp, source)
+    return source
+
+
+def _remember_source(source: SourceImage) -> None:
+    folder = cache_dir() / source.digest
+    marker = folder / "source"
+    if marker.exists():
+        return
+    folder.mkdir(parents=True, exist_ok=True)
+    tmp = folder / f"source.{os.getpid()}.tmp"
+    tmp.write_text(str(source.path))
+    os.replace(tmp, marker)
+
+
+def rendition_widths(source: SourceImage) -> list[int]:
+    """Buckets no wider than the original (plus the original if smaller
+    than every bucket)."""
+    fitting = [w for w in widths() if w <= source.width]
+    return fitting or [source.width]
+
+
+def rendition_path(digest: str, width: int, ext: str) -> Path:
+    return cache_dir() / digest / f"{width}.{ext}"
+
+
+def build_rendition(digest: str, width: int, ext: str) -> Path | None:
+    """Create (if needed) and return the rendition file, or None when the
+    digest/width/format is unknown or the source has since changed."""
+    from PIL import Image, ImageOps
+
+    if ext not in FORMATS or ext not in available_formats():
+        return None
+    target = rendition_path(digest, width, ext)
+    if target.exists():
+        return target
+    marker = cache_dir() / digest / "source"
+    try:
+        source_path = Path(marker.read_text().strip())
+    except OSError:
+        return None
+    source = inspect(source_path)
+    if source is None or source.digest != digest or width not in rendition_widths(source):
+        return None
+
+    fmt, _, options = FORMATS[ext]
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "L"):
+            rgba = image.convert("RGBA")
+            if fmt == "JPEG":
+                # JPEG has no alpha; flatten onto white so transparent
+                # areas do not turn black
+                image = Image.new("RGB", rgba.size, "white")
+                image.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                image = rgba
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, fmt, **options)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(out.getvalue())
+    os.replace(tmp, target)
+    return target
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.catalog.images import available_formats, build_rendition, inspect, local_source, rendition_widths
+from apps.catalog.models import Product
+
+
+class Command(BaseCommand):
+    help = "Pre-generate product photo renditions so the first visitor after a deploy doesn't wait"
+
+    def handle(self, *args, **options):
+        built = skipped = 0
+        formats = available_formats()
+        for product in Product.objects.filter(is_active=True).only("id", "image", "image_url"):
+            path = local_source(product)
+            source = inspect(path) if path else None
+            if source is None:
+                skipped += 1
+                continue
+            for width in rendition_widths(source):
+                for ext in formats:
+                    if build_rendition(source.digest, width, ext):
+                        built += 1
+        self.stdout.write(self.style.SUCCESS(f"{built} rendition(s) ready, {skipped} product(s) without a local photo"))
@@ -0,0 +1,24 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from whitenoise.compress import Compressor
+
+
+class Command(BaseCommand):
+    help = "Write .gz/.br copies of compressible files under MEDIA_ROOT (served by config.media)"
+
+    def handle(self, *args, **options):
+        compressor = Compressor(quiet=True)
+        written = 0
+        for root, _dirs, files in os.walk(settings.MEDIA_ROOT):
+            for name in files:
+                path = os.path.join(root, name)
+                if not compressor.should_compress(name):
+                    continue
+                for suffix in (".br", ".gz"):
+                    if os.path.exists(path + suffix) and int(os.path.getmtime(path + suffix)) >= int(os.path.getmtime(path)):
+                        break
+                else:
+                    written += len(compressor.compress(path))
+        self.stdout.write(self.style.SUCCESS(f"{written} compressed file(s) written"))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from apps.catalog.stock import fix_stock_drift, stock_drift
+
+
+class Command(BaseCommand):
+    help = "Recompute on-hand / allocated / available stock counters and report drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="Write the recomputed counters")
+        parser.add_argument("--product", type=int, action="append", dest="products", help="Only this product id")
+
+    def handle(self, *args, **options):
+        drift = stock_drift(options["products"])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Stock counters match"))
+            return
+
+        self.stdout.write(f"{'id':>6}  {'on hand':>15}  {'allocated':>15}  {'available':>9}  {'batches':>7}  {'pending':>7}  name")
+        for d in drift:
+            on_hand = f"{d.stored[0]}→{d.expected[0]}"
+            allocated = f"{d.stored[1]}→{d.expected[1]}"
+            self.stdout.write(
+                f"{d.product_id:>6}  {on_hand:>15}  {allocated:>15}  {d.stored[2]:>9}  {d.batches:>7}  {d.pending:>7}  {d.name}"
+            )
+
+        if options["fix"]:
+            fixed = fix_stock_drift(drift)
+            self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} product(s)"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(drift)} product(s) drifted — rerun with --fix to correct"))
@@ -0,0 +1,111 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:16
+
+import hashlib
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Frozen copy of the apps.catalog.search tokenizer as of this migration, so
+# the backfill keeps running however that module changes later. Rows saved
+# afterwards are re-tokenized by Product.save().
+_SEA_RANGE = "\u0e00-\u0eff"
+_SEA_RUN = re.compile(f"[{_SEA_RANGE}]+")
+_WORD = re.compile(f"[^\\W_{_SEA_RANGE}]+")
+_LEADING_VOWELS = set("เแโใไເແໂໃໄ")
+
+
+def _clusters(run):
+    clusters = []
+    pending = ""
+    for ch in run:
+        if ch in _LEADING_VOWELS:
+            pending += ch
+        elif unicodedata.category(ch) == "Mn" and clusters and not pending:
+            clusters[-1] += ch
+        else:
+            clusters.append(pending + ch)
+            pending = ""
+    if pending:
+        clusters.append(pending)
+    return clusters
+
+
+def _sea_token(text):
+    return "s" + hashlib.blake2b(text.encode(), digest_size=5).hexdigest()
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize("NFC", text).casefold()
+    tokens = []
+    for run in _SEA_RUN.findall(text):
+        clusters = _clusters(run)
+        if len(clusters) == 1:
+            tokens.append(_sea_token(clusters[0]))
+        for a, b in zip(clusters, clusters[1:]):
+            tokens.append(_sea_token(a + b))
+    tokens.extend(_WORD.findall(_SEA_RUN.sub(" ", text)))
+    return tokens
+
+
+def build_search_tokens(names, descriptions):
+    name_tokens = " ".join(t for text in names for t in tokenize(text))
+    desc_tokens = " ".join(t for text in descriptions for t in tokenize(text))
+    return f"{name_tokens}\n{desc_tokens}"
+
+
+def backfill_search_tokens(apps, schema_editor):
+    Product = apps.get_model("catalog", "Product")
+    batch = []
+    for product in Product.objects.all().iterator(chunk_size=500):
+        product.search_tokens = build_search_tokens(
+            (product.name, product.name_th, product.name_en),
+            (product.description, product.description_th, product.description_en),
+        )
+        batch.append(product)
+        if len(batch) >= 500:
+            Product.objects.bulk_update(batch, ["search_tokens"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["search_tokens"])
+
+
+# PostgreSQL-only: GIN index on the weighted tsvector used by
+# apps.catalog.search.SEARCH_VECTOR_SQL. SQLite searches in-process instead.
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        """
+        CREATE INDEX IF NOT EXISTS catalog_product_search_gin
+            ON catalog_product USING gin (
+                (setweight(to_tsvector('simple', split_part("search_tokens", chr(10), 1)), 'A')
+                 || setweight(to_tsvector('simple', split_part("search_tokens", chr(10), 2)), 'B'))
+            );
+        """
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS catalog_product_search_gin;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_alter_category_options_alter_product_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_tokens',
+            field=models.TextField(blank=True, default='', editable=False, help_text='ສ້າງອັດຕະໂນມັດຈາກຊື່ ແລະ ລາຍລະອຽດທຸກພາສາ (apps.catalog.search)', verbose_name='ດັດຊະນີຄົ້ນຫາ'),
+        ),
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:25
+
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_counters(apps, schema_editor):
+    # Same rule as apps.catalog.stock.stock_drift(): allocated = earmarked
+    # reservations not yet collected, on hand = available + allocated.
+    Product = apps.get_model("catalog", "Product")
+    Reserved = apps.get_model("sales", "Reserved")
+
+    allocated = dict(
+        Reserved.objects.filter(stock_ready=True, status__in=["RESERVED", "PAID"])
+        .values("product_id")
+        .annotate(total=Sum("quantity"))
+        .values_list("product_id", "total")
+    )
+    batch = []
+    for product in Product.objects.only("id", "stock_qty").iterator(chunk_size=500):
+        product.allocated_qty = allocated.get(product.id) or 0
+        product.on_hand_qty = product.stock_qty + product.allocated_qty
+        batch.append(product)
+        if len(batch) >= 500:
+            Product.objects.bulk_update(batch, ["allocated_qty", "on_hand_qty"])
+            batch = []
+    if batch:
+        Product.objects.bulk_update(batch, ["allocated_qty", "on_hand_qty"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_product_search_tokens'),
+        ('sales', '0007_alter_bill_options_alter_order_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='allocated_qty',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='ຈຳນວນທີ່ຈັດໃຫ້ການຈອງແລ້ວ ແຕ່ລູກຄ້າຍັງບໍ່ມາຮັບ', verbose_name='ກັນໄວ້ໃຫ້ການຈອງ'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='on_hand_qty',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='ສິນຄ້າທີ່ຢູ່ໃນຮ້ານຕົວຈິງ = ຂາຍໄດ້ + ກັນໄວ້ໃຫ້ການຈອງ', verbose_name='ຈຳນວນໃນຮ້ານ'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
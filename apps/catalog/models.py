@@ -1,6 +1,12 @@
 from django.db import models
 from django.utils.text import slugify
 
+from .cache import bump_catalog_version
+from .search import forget_product, product_search_tokens, refresh_product
+
+# Fields that feed Product.search_tokens
+_SEARCH_FIELDS = {"name", "name_th", "name_en", "description", "description_th", "description_en", "is_active"}
+
 
 def _pick_lang(lang, lo, th="", en=""):
     if lang == "en" and en:
@@ -44,6 +50,12 @@ class Category(models.Model):
                 n += 1
             self.slug = slug
         super().save(*args, **kwargs)
+        bump_catalog_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_catalog_version()
+        return result
 
     class Meta:
         verbose_name = "ໝວດໝູ່ສິນຄ້າ"
@@ -87,6 +99,20 @@ class Product(models.Model):
         default=0,
         help_text="ຈຳນວນທີ່ຂາຍໄດ້ດຽວນີ້. ຖ້າ = 0 ລູກຄ້າຈະເຫັນ 'ໝົດ — ຈອງໄດ້'",
     )
+    # Maintained by apps.catalog.stock (and `manage.py reconcile_stock`):
+    # on_hand_qty = stock_qty (available) + allocated_qty (earmarked)
+    on_hand_qty = models.PositiveIntegerField(
+        "ຈຳນວນໃນຮ້ານ",
+        default=0,
+        editable=False,
+        help_text="ສິນຄ້າທີ່ຢູ່ໃນຮ້ານຕົວຈິງ = ຂາຍໄດ້ + ກັນໄວ້ໃຫ້ການຈອງ",
+    )
+    allocated_qty = models.PositiveIntegerField(
+        "ກັນໄວ້ໃຫ້ການຈອງ",
+        default=0,
+        editable=False,
+        help_text="ຈຳນວນທີ່ຈັດໃຫ້ການຈອງແລ້ວ ແຕ່ລູກຄ້າຍັງບໍ່ມາຮັບ",
+    )
     image = models.ImageField(
         "ຮູບສິນຄ້າ (ອັບໂຫຼດ)",
         upload_to="products/",
@@ -109,6 +135,13 @@ class Product(models.Model):
         help_text="ປິດ = ລູກຄ້າບໍ່ເຫັນສິນຄ້ານີ້ໃນຮ້ານ",
     )
     created_at = models.DateTimeField("ວັນທີສ້າງ", auto_now_add=True)
+    search_tokens = models.TextField(
+        "ດັດຊະນີຄົ້ນຫາ",
+        blank=True,
+        default="",
+        editable=False,
+        help_text="ສ້າງອັດຕະໂນມັດຈາກຊື່ ແລະ ລາຍລະອຽດທຸກພາສາ (apps.catalog.search)",
+    )
 
     def name_for(self, lang):
         return _pick_lang(lang, self.name, self.name_th, self.name_en)
@@ -117,6 +150,18 @@ class Product(models.Model):
         return _pick_lang(lang, self.description, self.description_th, self.description_en)
 
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "stock_qty" in update_fields:
+            # A manual correction of the available count (admin) moves the
+            # physical count with it; the earmarked part is untouched.
+            self.on_hand_qty = self.stock_qty + self.allocated_qty
+            if update_fields is not None:
+                update_fields = kwargs["update_fields"] = {*update_fields, "on_hand_qty"}
+        reindex = update_fields is None or bool(_SEARCH_FIELDS.intersection(update_fields))
+        if reindex:
+            self.search_tokens = product_search_tokens(self)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "search_tokens"}
         if not self.slug:
             base = slugify(self.name) or "product"
             slug = base
@@ -126,18 +171,51 @@ class Product(models.Model):
                 n += 1
             self.slug = slug
         super().save(*args, **kwargs)
+        bump_catalog_version()
+        if reindex:
+            refresh_product(self)
+
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        result = super().delete(*args, **kwargs)
+        bump_catalog_version()
+        forget_product(pk)
+        return result
 
     @property
     def display_image(self):
         if self.image_url:
             return self.image_url
         if self.image:
-            return self.image.url
+            from config.media import versioned_media_url
+
+            return versioned_media_url(self.image.name, self.image.url)
         return ""
 
     class Meta:
         verbose_name = "ສິນຄ້າ"
         verbose_name_plural = "ສິນຄ້າ"
+        indexes = [
+            # Shop and POS lists: active products in keyset order
+            # (apps.catalog.pagination.ORDERINGS). Partial rather than
+            # (is_active, …): SQLite compiles the filter to a bare
+            # ``WHERE is_active``, which only a matching condition can use
+            models.Index(fields=["name", "id"], name="catalog_prod_active_name_idx", condition=models.Q(is_active=True)),
+            models.Index(
+                fields=["-created_at", "-id"], name="catalog_prod_active_new_idx", condition=models.Q(is_active=True),
+            ),
+        ]
 
     def __str__(self):
         return self.name
+
+
+class CacheVersion(models.Model):
+    """Invalidation counter of apps.catalog.cache, kept here when the cache
+    alias is private to each worker."""
+
+    name = models.CharField(max_length=40, primary_key=True)
+    version = models.PositiveBigIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
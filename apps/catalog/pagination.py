@@ -0,0 +1,111 @@
+"""Cursor (keyset) pagination for the shop grid and the POS product list.
+
+Pages are fetched with ``WHERE (sort_key, id) > (last_sort_key, last_id)``
+instead of OFFSET, so page 50 costs the same as page 1 and rows inserted
+while a customer scrolls never shift or duplicate cards. Cursors are opaque
+URL-safe strings; a tampered or stale cursor just restarts at page one.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+# sort name → (field, direction) pairs; the last one must be unique
+ORDERINGS = {
+    "name": (("name", "asc"), ("id", "asc")),
+    "newest": (("created_at", "desc"), ("id", "desc")),
+}
+DEFAULT_ORDERING = "name"
+
+
+@dataclass
+class Page:
+    items: list = field(default_factory=list)
+    next_cursor: str = ""
+
+    @property
+    def has_next(self) -> bool:
+        return bool(self.next_cursor)
+
+
+def _encode(values: list) -> str:
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def normalize_ordering(value) -> str:
+    return value if value in ORDERINGS else DEFAULT_ORDERING
+
+
+def _parse_keys(values, spec):
+    if values is None or len(values) != len(spec):
+        return None
+    parsed = []
+    for value, (name, _) in zip(values, spec):
+        if name == "created_at":
+            try:
+                value = parse_datetime(value) if isinstance(value, str) else None
+            except ValueError:
+                value = None
+        elif name == "id" and not (isinstance(value, int) and not isinstance(value, bool)):
+            value = None
+        elif name != "id" and not isinstance(value, str):
+            value = None
+        if value is None:
+            return None
+        parsed.append(value)
+    return parsed
+
+
+def keyset_page(queryset, ordering: str, cursor: str, page_size: int) -> Page:
+    """One page of ``queryset`` in ``ordering`` starting after ``cursor``."""
+    spec = ORDERINGS[normalize_ordering(ordering)]
+    queryset = queryset.order_by(*(f"-{f}" if d == "desc" else f for f, d in spec))
+
+    parsed = _parse_keys(_decode(cursor), spec)
+    if parsed is not None:
+        after = Q()
+        for i, (name, direction) in enumerate(spec):
+            lookup = "lt" if direction == "desc" else "gt"
+            step = Q(**{f"{name}__{lookup}": parsed[i]})
+            for j in range(i):
+                step &= Q(**{spec[j][0]: parsed[j]})
+            after |= step
+        queryset = queryset.filter(after)
+
+    rows = list(queryset[: page_size + 1])
+    items = rows[:page_size]
+    next_cursor = ""
+    if len(rows) > page_size:
+        last = items[-1]
+        next_cursor = _encode([getattr(last, name) for name, _ in spec])
+    return Page(items=items, next_cursor=next_cursor)
+
+
+def list_page(sequence: list, cursor: str, page_size: int) -> Page:
+    """Page through an already-ranked list (search results) by position."""
+    values = _decode(cursor)
+    start = values[0] if values and isinstance(values[0], int) and values[0] > 0 else 0
+    items = sequence[start:start + page_size]
+    end = start + page_size
+    return Page(items=items, next_cursor=_encode([end]) if end < len(sequence) else "")
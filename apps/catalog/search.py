@@ -0,0 +1,282 @@
+"""Product search for /shop/ — one token index over every language field.
+
+Lao and Thai are written without spaces between words, so word splitting
+would need a dictionary. Instead the text is cut into grapheme clusters
+(a base letter plus its vowel/tone marks, with leading vowels such as ເ/เ
+glued to the consonant they precede) and indexed as cluster bigrams.
+Searching "ມັດຊາ" then means "contains these bigrams", which matches the
+way customers type partial names. Latin-script text is indexed as plain
+lower-case words and the last query word is matched as a prefix.
+
+Tokens are precomputed into ``Product.search_tokens`` on save (names on the
+first line, descriptions on the second) so both backends read one column:
+
+- PostgreSQL: a GIN expression index over a weighted ``tsvector`` of that
+  column (migration 0007), queried with ``to_tsquery`` and ranked with
+  ``ts_rank``.
+- Anything else (SQLite in local dev): an in-process inverted index built
+  once per worker and patched incrementally when a Product is saved. The
+  "search" counter of apps.catalog.cache tells each worker when another
+  one changed a product, so it is seen across workers whatever the cache
+  alias is.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import re
+import threading
+import unicodedata
+
+from django.db import connection, transaction
+
+from .cache import bump, version
+
+# Thai U+0E00–0E7F, Lao U+0E80–0EFF
+_SEA_RANGE = "฀-໿"
+_SEA_RUN = re.compile(f"[{_SEA_RANGE}]+")
+_WORD = re.compile(f"[^\\W_{_SEA_RANGE}]+")
+_LEADING_VOWELS = set("เแโใไເແໂໃໄ")
+
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 1
+
+# Keep in sync with the index expression in migrations/0007.
+SEARCH_VECTOR_SQL = (
+    "(setweight(to_tsvector('simple', split_part(\"catalog_product\".\"search_tokens\", chr(10), 1)), 'A')"
+    " || setweight(to_tsvector('simple', split_part(\"catalog_product\".\"search_tokens\", chr(10), 2)), 'B'))"
+)
+
+
+def _clusters(run: str) -> list[str]:
+    clusters = []
+    pending = ""
+    for ch in run:
+        if ch in _LEADING_VOWELS:
+            pending += ch
+        elif unicodedata.category(ch) == "Mn" and clusters and not pending:
+            clusters[-1] += ch
+        else:
+            clusters.append(pending + ch)
+            pending = ""
+    if pending:
+        clusters.append(pending)
+    return clusters
+
+
+def _sea_token(text: str) -> str:
+    # Lao/Thai tokens are hashed to short ASCII so PostgreSQL's text parser
+    # (which splits on combining marks) keeps each one intact.
+    return "s" + hashlib.blake2b(text.encode(), digest_size=5).hexdigest()
+
+
+def tokenize(text: str) -> list[str]:
+    """Index-form tokens for ``text`` (order preserved, duplicates kept)."""
+    if not text:
+        return []
+    text = unicodedata.normalize("NFC", text).casefold()
+    tokens = []
+    for run in _SEA_RUN.findall(text):
+        clusters = _clusters(run)
+        if len(clusters) == 1:
+            tokens.append(_sea_token(clusters[0]))
+        for a, b in zip(clusters, clusters[1:]):
+            tokens.append(_sea_token(a + b))
+    tokens.extend(_WORD.findall(_SEA_RUN.sub(" ", text)))
+    return tokens
+
+
+def build_search_tokens(names, descriptions) -> str:
+    name_tokens = " ".join(t for text in names for t in tokenize(text))
+    desc_tokens = " ".join(t for text in descriptions for t in tokenize(text))
+    return f"{name_tokens}\n{desc_tokens}"
+
+
+def product_search_tokens(product) -> str:
+    return build_search_tokens(
+        (product.name, product.name_th, product.name_en),
+        (product.description, product.description_th, product.description_en),
+    )
+
+
+def _query_terms(q: str) -> list[tuple[str, bool]]:
+    """(token, is_prefix) pairs for a user query."""
+    tokens = list(dict.fromkeys(tokenize(q)))
+    words = set(_WORD.findall(_SEA_RUN.sub(" ", unicodedata.normalize("NFC", q).casefold())))
+    last_word = next((t for t in reversed(tokens) if t in words), None)
+    return [(t, t == last_word) for t in tokens]
+
+
+class InvertedIndex:
+    """token → {product_id: weight}, plus a sorted vocabulary for prefix
+    lookups. Only active products are indexed."""
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, int]] = {}
+        self.doc_tokens: dict[int, set[str]] = {}
+        self.vocabulary: list[str] = []
+
+    def add(self, pid: int, search_tokens: str) -> None:
+        self.remove(pid)
+        names, _, descriptions = (search_tokens or "").partition("\n")
+        weights: dict[str, int] = {}
+        for token in names.split():
+            weights[token] = weights.get(token, 0) + NAME_WEIGHT
+        for token in descriptions.split():
+            weights[token] = weights.get(token, 0) + DESCRIPTION_WEIGHT
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                bisect.insort(self.vocabulary, token)
+            posting[pid] = weight
+        self.doc_tokens[pid] = set(weights)
+
+    def remove(self, pid: int) -> None:
+        for token in self.doc_tokens.pop(pid, ()):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(pid, None)
+            if not posting:
+                del self.postings[token]
+                i = bisect.bisect_left(self.vocabulary, token)
+                if i < len(self.vocabulary) and self.vocabulary[i] == token:
+                    del self.vocabulary[i]
+
+    def _matches(self, token: str, prefix: bool) -> dict[int, int]:
+        if not prefix:
+            return self.postings.get(token, {})
+        merged: dict[int, int] = {}
+        i = bisect.bisect_left(self.vocabulary, token)
+        while i < len(self.vocabulary) and self.vocabulary[i].startswith(token):
+            for pid, weight in self.postings[self.vocabulary[i]].items():
+                merged[pid] = max(merged.get(pid, 0), weight)
+            i += 1
+        return merged
+
+    def search(self, terms) -> list[int]:
+        if not terms:
+            return []
+        per_term = [self._matches(token, prefix) for token, prefix in terms]
+        candidates = set.intersection(*(set(m) for m in per_term))
+        if not candidates:
+            # No product has every term — fall back to "any term", ranked
+            candidates = set().union(*(set(m) for m in per_term))
+        scores = {pid: sum(m.get(pid, 0) for m in per_term) for pid in candidates}
+        return sorted(scores, key=lambda pid: (-scores[pid], pid))
+
+
+# In-process index state (non-PostgreSQL backends). The "search" counter
+# tells a worker that another worker saved a product since it built its copy.
+SEARCH = "search"
+_index: InvertedIndex | None = None
+_index_version = None
+_index_lock = threading.Lock()
+
+
+def _bump_search_version():
+    return bump(SEARCH)
+
+
+def _get_index() -> InvertedIndex:
+    global _index, _index_version
+    from .models import Product
+
+    current = version(SEARCH)
+    with _index_lock:
+        if _index is None or _index_version != current:
+            index = InvertedIndex()
+            rows = Product.objects.filter(is_active=True).values_list("id", "search_tokens")
+            for pid, tokens in rows.iterator(chunk_size=2000):
+                index.add(pid, tokens)
+            _index, _index_version = index, current
+        return _index
+
+
+def _apply_product_change(pid: int, tokens: str | None) -> None:
+    global _index_version
+    new_version = _bump_search_version()
+    with _index_lock:
+        if _index is None:
+            return
+        if tokens is None:
+            _index.remove(pid)
+        else:
+            _index.add(pid, tokens)
+        # Only claim the new version if nobody else bumped in between;
+        # otherwise the next search rebuilds from the database.
+        if new_version is not None and _index_version == new_version - 1:
+            _index_version = new_version
+        else:
+            _index_version = None
+
+
+def refresh_product(product) -> None:
+    """Patch the in-process index after ``product`` is committed."""
+    if connection.vendor == "postgresql":
+        return
+    pid = product.pk
+    tokens = product.search_tokens if product.is_active else None
+    transaction.on_commit(lambda: _apply_product_change(pid, tokens), robust=True)
+
+
+def forget_product(pid: int) -> None:
+    if connection.vendor == "postgresql":
+        return
+    transaction.on_commit(lambda: _apply_product_change(pid, None), robust=True)
+
+
+def invalidate_index() -> None:
+    """Force every worker to rebuild (bulk edits that skip Product.save)."""
+    if connection.vendor == "postgresql":
+        return
+    transaction.on_commit(_bump_search_version, robust=True)
+
+
+def _pg_tsquery(terms, joiner: str) -> str:
+    return f" {joiner} ".join(f"{token}:*" if prefix else token for token, prefix in terms)
+
+
+def _pg_search(terms, queryset) -> list[int]:
+    from django.db.models import BooleanField, FloatField
+    from django.db.models.expressions import RawSQL
+
+    for joiner in ("&", "|"):
+        tsquery = _pg_tsquery(terms, joiner)
+        ids = list(
+            queryset.filter(
+                RawSQL(f"{SEARCH_VECTOR_SQL} @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+            )
+            .annotate(
+                search_rank=RawSQL(
+                    f"ts_rank({SEARCH_VECTOR_SQL}, to_tsquery('simple', %s))", [tsquery], output_field=FloatField()
+                )
+            )
+            .order_by("-search_rank", "id")
+            .values_list("id", flat=True)
+        )
+        if ids:
+            return ids
+    return []
+
+
+def search_product_ids(q: str, queryset=None) -> list[int]:
+    """Ids of active products matching ``q``, best match first."""
+    from .models import Product
+
+    terms = _query_terms(q or "")
+    if not terms:
+        return []
+    if queryset is None:
+        queryset = Product.objects.filter(is_active=True)
+    if connection.vendor == "postgresql":
+        return _pg_search(terms, queryset)
+    ranked = _get_index().search(terms)
+    if queryset.query.where and ranked:
+        # The index covers all active products; apply extra filters (e.g.
+        # category) with one id lookup so callers get exact result sets.
+        allowed = set(queryset.filter(id__in=ranked).values_list("id", flat=True))
+        ranked = [pid for pid in ranked if pid in allowed]
+    return ranked
@@ -10,22 +10,41 @@ Stock timeline:
 - Checkout (web or POS) only CHECKS availability — it does not remove stock
   yet, except POS "buy now" which is staff-entered directly with no later
   confirmation step, so it deducts immediately.
+- Every sale that removes stock goes through take_stock(), which checks and
+  decrements all cart lines at once under row locks taken in product-id
+  order, with a conditional UPDATE as the final guard. check_stock() is only
+  a preview for the UI and can be stale by the time the sale commits.
 - Web "buy now" orders only lose stock once staff approves the payment
   slip (see apps.sales.staff_views.verify_slip).
 - Reservations never touch stock at creation (they may be pure backorders).
   When new stock arrives, the newest pending reservations are earmarked
-  first (stock_qty is reserved, but the physical batch is untouched).
+  first, or the oldest with RESERVATION_ALLOCATION_POLICY = "oldest"
+  (stock_qty is reserved, but the physical batch is untouched).
   The earmark is only turned into a real batch deduction once staff marks
   the reservation complete (customer picked up + paid the rest), and is
   released back to the pool if staff cancels it instead.
+
+Every function here keeps Product's three counters in step:
+stock_qty (available to sell), allocated_qty (earmarked for reservations)
+and on_hand_qty (physically in the shop = the two together).
+`manage.py reconcile_stock` recomputes them if they ever drift.
 """
 
 from __future__ import annotations
 
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import reduce
+from operator import or_
+
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Case, F, Q, When
 from django.db.models.functions import Greatest
 
+from config.metrics import STOCK_SECONDS
+
+from .cache import bump_catalog_version
 from .models import Product
 
 
@@ -44,76 +63,379 @@ def check_stock(cart_items) -> list:
     return insufficient
 
 
-@transaction.atomic
-def _consume_inventory_batches(product_id: int, qty: int) -> None:
-    """Remove `qty` units from the physical stock batches (oldest first)
-    so the Inventory (ສາງສິນຄ້າ) list staff/admin see visibly drops."""
+@dataclass
+class StockLine:
+    """Outcome of one cart line in take_stock()."""
+
+    product_id: int
+    requested: int
+    available: int
+    taken: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.taken >= self.requested
+
+    @property
+    def shortfall(self) -> int:
+        return max(self.requested - self.taken, 0)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, lines: list[StockLine]):
+        self.lines = lines
+        self.short = [line for line in lines if line.available < line.requested]
+        super().__init__(
+            "insufficient stock for product(s) " + ", ".join(str(line.product_id) for line in self.short)
+        )
+
+
+def _merge_lines(lines) -> dict[int, int]:
+    merged: dict[int, int] = {}
+    for product_id, qty in lines:
+        if qty > 0:
+            merged[int(product_id)] = merged.get(int(product_id), 0) + int(qty)
+    return merged
+
+
+class _LostRace(Exception):
+    def __init__(self, lines):
+        self.lines = lines
+
+
+def _take_once(wanted: dict[int, int], strict: bool) -> list[StockLine]:
+    """One locked check-and-decrement attempt. Raises _LostRace when the
+    guarded UPDATE matched fewer rows than expected (stock moved under us)."""
+    ids = sorted(wanted)
+    # Lock rows in id order so two carts sharing SKUs cannot deadlock
+    available = dict(
+        Product.objects.select_for_update()
+        .filter(id__in=ids)
+        .order_by("id")
+        .values_list("id", "stock_qty")
+    )
+    results = []
+    for pid in ids:
+        have = available.get(pid, 0)
+        results.append(StockLine(pid, wanted[pid], have, min(wanted[pid], have)))
+
+    if strict and any(line.available < line.requested for line in results):
+        raise InsufficientStock(results)
+
+    takes = {line.product_id: line.taken for line in results if line.taken > 0}
+    if not takes:
+        return results
+    # One statement for the whole cart. The stock_qty >= take guard is what
+    # stops oversell where select_for_update is a no-op (SQLite).
+    updated = (
+        Product.objects.filter(reduce(or_, (Q(id=pid, stock_qty__gte=take) for pid, take in takes.items())))
+        .update(
+            stock_qty=Case(*(When(id=pid, then=F("stock_qty") - take) for pid, take in takes.items())),
+            on_hand_qty=Case(
+                *(When(id=pid, then=Greatest(F("on_hand_qty") - take, 0)) for pid, take in takes.items())
+            ),
+        )
+    )
+    if updated != len(takes):
+        raise _LostRace(results)
+    return results
+
+
+@STOCK_SECONDS.timed(operation="take")
+def take_stock(lines, *, strict: bool = True, attempts: int = 3) -> list[StockLine]:
+    """Atomically remove stock for a whole sale.
+
+    ``lines`` is an iterable of ``(product_id, qty)``; duplicate products
+    are summed. With ``strict=True`` either every line is fully taken or
+    nothing changes and InsufficientStock is raised. With ``strict=False``
+    each line takes what is available and reports its shortfall (used when
+    staff completes a reservation that was never restocked in the system).
+
+    Physical batches are consumed for the full requested quantity, as
+    deduct_stock() always did."""
+    wanted = _merge_lines(lines)
+    if not wanted:
+        return []
+    lost = None
+    for _ in range(attempts):
+        try:
+            with transaction.atomic():
+                results = _take_once(wanted, strict)
+                consume_inventory_batches(wanted.items())
+        except _LostRace as exc:
+            lost = exc
+            continue
+        bump_catalog_version()
+        return results
+    raise InsufficientStock(lost.lines)
+
+
+def _batch_order(policy: str) -> list:
+    # FEFO: soonest expiry first, undated batches last, then FIFO
+    fifo = [F("created_at").asc(), F("id").asc()]
+    if policy == "fefo":
+        return [F("expiry_date").asc(nulls_last=True), *fifo]
+    return fifo
+
+
+def batches_to_take(wanted: dict[int, int], policy: str | None = None):
+    """``(id, product_id, quantity, before)`` of the batches that cover
+    ``wanted`` ({product id: qty}), in consumption order; ``before`` is the
+    quantity of the product's earlier batches. Also EXPLAINed by
+    config.query_plans."""
+    from django.conf import settings
+    from django.db.models import Sum, Window
+    from django.db.models.expressions import RowRange
+
     from apps.inventory.models import Inventory
 
-    remaining = qty
-    batches = (
-        Inventory.objects.filter(product_id=product_id, quantity__gt=0)
-        .order_by("created_at")
+    policy = policy or getattr(settings, "STOCK_CONSUMPTION_POLICY", "fifo")
+    # running total of the product's batches, in consumption order
+    running = Window(
+        Sum("quantity"),
+        partition_by=[F("product_id")],
+        order_by=_batch_order(policy),
+        frame=RowRange(start=None, end=0),
+    )
+    need = Case(*(When(product_id=pid, then=qty) for pid, qty in wanted.items()))
+    return (
+        Inventory.objects.filter(product_id__in=wanted, quantity__gt=0)
+        .annotate(before=running - F("quantity"))
+        .filter(before__lt=need)
+        .values_list("id", "product_id", "quantity", "before")
     )
-    for batch in batches:
-        if remaining <= 0:
-            break
-        take = min(batch.quantity, remaining)
-        Inventory.objects.filter(pk=batch.pk).update(quantity=F("quantity") - take)
-        remaining -= take
 
 
+@STOCK_SECONDS.timed(operation="consume_batches")
 @transaction.atomic
-def deduct_stock(product_id: int, qty: int) -> None:
+def consume_inventory_batches(lines, policy: str | None = None) -> int:
+    """Remove units from the physical stock batches so the Inventory
+    (ສາງສິນຄ້າ) list staff/admin see visibly drops.
+
+    ``lines`` is an iterable of ``(product_id, qty)``. Batches are taken
+    oldest first ("fifo") or soonest-expiring first ("fefo"; default from
+    settings.STOCK_CONSUMPTION_POLICY). However many lines and batches are
+    involved this is two queries: a running-total window over each
+    product's batches picks the ones needed, and one CASE UPDATE applies
+    the takes. Returns the number of batches touched."""
+    from apps.inventory.models import Inventory
+
+    wanted = _merge_lines(lines)
+    if not wanted:
+        return 0
+
+    takes = {}
+    for batch_id, pid, quantity, before in batches_to_take(wanted, policy):
+        take = min(quantity, wanted[pid] - before)
+        if take > 0:
+            takes[batch_id] = take
+    if takes:
+        Inventory.objects.filter(id__in=takes).update(
+            quantity=Case(*(When(id=batch_id, then=F("quantity") - take) for batch_id, take in takes.items()))
+        )
+    return len(takes)
+
+
+def deduct_stock(product_id: int, qty: int) -> StockLine | None:
     """A sale is finally confirmed (staff approved a slip, POS sale, or a
     reservation completed that was never pre-allocated). Removes the sold
     units from both the available pool and the underlying batches.
 
     Clamped at 0 — stock_qty is a PositiveIntegerField (DB check
     constraint), and a reservation can be marked complete by staff even
-    if it was never actually restocked in the system."""
-    Product.objects.filter(pk=product_id).update(
-        stock_qty=Greatest(F("stock_qty") - qty, 0)
-    )
-    _consume_inventory_batches(product_id, qty)
+    if it was never actually restocked in the system. The returned line
+    reports any shortfall so callers can tell staff instead of hiding it."""
+    results = take_stock([(product_id, qty)], strict=False)
+    return results[0] if results else None
 
 
+@STOCK_SECONDS.timed(operation="consume_allocated")
 @transaction.atomic
 def consume_allocated_stock(product_id: int, qty: int) -> None:
     """A reservation that was already earmarked (stock_ready=True) is now
     being picked up. The available-pool portion was already removed when
-    it became stock_ready — only the physical batch needs updating now."""
-    _consume_inventory_batches(product_id, qty)
+    it became stock_ready — only the physical count and batch change now."""
+    Product.objects.filter(pk=product_id).update(
+        allocated_qty=Greatest(F("allocated_qty") - qty, 0),
+        on_hand_qty=Greatest(F("on_hand_qty") - qty, 0),
+    )
+    consume_inventory_batches([(product_id, qty)])
 
 
+@STOCK_SECONDS.timed(operation="release")
 @transaction.atomic
 def release_stock(product_id: int, qty: int) -> None:
     """Reverse an earmark — used when a stock_ready reservation is
     cancelled, so the units become available again."""
-    Product.objects.filter(pk=product_id).update(stock_qty=F("stock_qty") + qty)
+    Product.objects.filter(pk=product_id).update(
+        stock_qty=F("stock_qty") + qty,
+        allocated_qty=Greatest(F("allocated_qty") - qty, 0),
+    )
+    bump_catalog_version()
+
+
+_RESERVATION_ORDER = {
+    "newest": ("-res_date", "-id"),
+    "oldest": ("res_date", "id"),
+}
+
+_receipts = threading.local()
+
+
+@contextmanager
+def deferred_receipts():
+    """Collect receive_stock() calls made inside the block (e.g. one per
+    ImportDetail row saved by an admin formset) and apply them as a single
+    receive_stock_bulk() when the block exits."""
+    if getattr(_receipts, "pending", None) is not None:
+        yield  # already deferring — the outermost block flushes
+        return
+    _receipts.pending = []
+    try:
+        yield
+        pending = _receipts.pending
+    finally:
+        _receipts.pending = None
+    receive_stock_bulk(pending)
 
 
-@transaction.atomic
 def receive_stock(product_id: int, qty: int) -> None:
     """Called when new stock physically arrives (an Inventory/ImportDetail
     record is created). Adds to the available pool, then earmarks it for
-    the most recent pending reservations first."""
+    pending reservations (see receive_stock_bulk)."""
+    pending = getattr(_receipts, "pending", None)
+    if pending is not None:
+        pending.append((product_id, qty))
+        return
+    receive_stock_bulk([(product_id, qty)])
+
+
+@STOCK_SECONDS.timed(operation="receive")
+@transaction.atomic
+def receive_stock_bulk(lines, policy: str | None = None) -> int:
+    """Receive a whole shipment: ``lines`` is an iterable of
+    ``(product_id, qty)``.
+
+    Each product's new units go to its pending reservations in ``policy``
+    order — "newest" first (the shop's long-standing rule) or "oldest"
+    first for first-come-first-served; default from
+    settings.RESERVATION_ALLOCATION_POLICY. A reservation bigger than what
+    is left is skipped so smaller ones behind it can still be served.
+    Whatever is not earmarked stays in stock_qty.
+
+    The allocation is computed in memory and written with one UPDATE for
+    the reservations and one for the products, regardless of shipment
+    size. Returns the number of reservations made stock_ready."""
+    from django.conf import settings
+
     from apps.sales.models import Reserved
 
-    product = Product.objects.select_for_update().get(pk=product_id)
-    product.stock_qty += qty
-    product.save(update_fields=["stock_qty"])
+    received = _merge_lines(lines)
+    if not received:
+        return 0
+    policy = policy or getattr(settings, "RESERVATION_ALLOCATION_POLICY", "newest")
+    ordering = _RESERVATION_ORDER.get(policy, _RESERVATION_ORDER["newest"])
 
-    pending = Reserved.objects.filter(
-        product_id=product_id, status=Reserved.Status.RESERVED, stock_ready=False,
-    ).order_by("-res_date")
+    ids = sorted(received)
+    # Same lock order as take_stock() so a sale and a receipt cannot deadlock
+    pool = dict(
+        Product.objects.select_for_update()
+        .filter(id__in=ids)
+        .order_by("id")
+        .values_list("id", "stock_qty")
+    )
+    for pid in ids:
+        pool[pid] = pool.get(pid, 0) + received[pid]
 
-    for reservation in pending:
-        if product.stock_qty <= 0:
-            break
-        if product.stock_qty >= reservation.quantity:
-            product.stock_qty -= reservation.quantity
-            reservation.stock_ready = True
-            reservation.save(update_fields=["stock_ready"])
+    pending = (
+        Reserved.objects.filter(product_id__in=ids, status=Reserved.Status.RESERVED, stock_ready=False)
+        .order_by(*ordering)
+        .values_list("id", "product_id", "quantity")
+    )
+    ready = []
+    earmarked = dict.fromkeys(ids, 0)
+    for reservation_id, pid, quantity in pending.iterator(chunk_size=2000):
+        if pool[pid] >= quantity:
+            pool[pid] -= quantity
+            earmarked[pid] += quantity
+            ready.append(reservation_id)
+
+    for start in range(0, len(ready), 500):
+        Reserved.objects.filter(id__in=ready[start:start + 500]).update(stock_ready=True)
+    Product.objects.filter(id__in=ids).update(
+        stock_qty=Case(*(When(id=pid, then=pool[pid]) for pid in ids)),
+        on_hand_qty=Case(*(When(id=pid, then=F("on_hand_qty") + received[pid]) for pid in ids)),
+        allocated_qty=Case(*(When(id=pid, then=F("allocated_qty") + earmarked[pid]) for pid in ids)),
+    )
+    bump_catalog_version()
+    return len(ready)
+
+
+@dataclass
+class StockDrift:
+    """One product whose stored counters disagree with the records."""
+
+    product_id: int
+    name: str
+    stored: tuple[int, int, int]  # (on_hand, allocated, available)
+    expected: tuple[int, int, int]
+    batches: int  # units left in Inventory batches (informational)
+    pending: int  # units in orders waiting for slip approval
+
+
+def stock_drift(product_ids=None) -> list[StockDrift]:
+    """Recompute the counters from Reserved / Inventory / OrderItem in a
+    handful of grouped queries and return the products that drifted.
+
+    stock_qty (available) stays the authority — it is what staff correct
+    by hand in the admin. allocated_qty is the sum of earmarked, not yet
+    collected reservations; on_hand_qty is available + allocated. The
+    Inventory batch total and pending-order demand are reported alongside
+    so staff can spot products whose batches or open orders look wrong,
+    but they do not drive the fix (ImportDetail receipts add stock without
+    creating a batch)."""
+    from django.db.models import Sum
 
-    product.save(update_fields=["stock_qty"])
+    from apps.inventory.models import Inventory
+    from apps.sales.models import Order, OrderItem, Reserved
+
+    def totals(queryset, field="quantity"):
+        if product_ids is not None:
+            queryset = queryset.filter(product_id__in=product_ids)
+        return dict(queryset.values("product_id").annotate(total=Sum(field)).values_list("product_id", "total"))
+
+    allocated = totals(
+        Reserved.objects.filter(
+            stock_ready=True, status__in=[Reserved.Status.RESERVED, Reserved.Status.PAID],
+        )
+    )
+    batches = totals(Inventory.objects.filter(quantity__gt=0))
+    pending = totals(OrderItem.objects.filter(order__status=Order.Status.PENDING))
+
+    products = Product.objects.order_by("id")
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    drift = []
+    for pid, name, available, on_hand, earmarked in products.values_list(
+        "id", "name", "stock_qty", "on_hand_qty", "allocated_qty"
+    ).iterator(chunk_size=2000):
+        want_allocated = allocated.get(pid) or 0
+        stored = (on_hand, earmarked, available)
+        expected = (available + want_allocated, want_allocated, available)
+        if stored != expected:
+            drift.append(StockDrift(pid, name, stored, expected, batches.get(pid) or 0, pending.get(pid) or 0))
+    return drift
+
+
+@transaction.atomic
+def fix_stock_drift(drift: list[StockDrift]) -> int:
+    """Write the expected counters for ``drift`` (from stock_drift())."""
+    if not drift:
+        return 0
+    rows = [
+        Product(id=d.product_id, on_hand_qty=d.expected[0], allocated_qty=d.expected[1])
+        for d in drift
+    ]
+    Product.objects.bulk_update(rows, ["on_hand_qty", "allocated_qty"], batch_size=500)
+    bump_catalog_version()
+    return len(rows)
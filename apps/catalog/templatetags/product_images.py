@@ -0,0 +1,57 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+
+from apps.catalog.images import available_formats, inspect, local_source, rendition_widths
+
+register = template.Library()
+
+# Shop grid: 2 columns on phones, 3 on tablets, 4 on desktop
+CARD_SIZES = "(max-width: 575px) 50vw, (max-width: 991px) 33vw, 300px"
+
+
+def _srcset(source, widths, ext):
+    return ", ".join(
+        f"{reverse('product_image', args=[source.digest, w, ext])} {w}w" for w in widths
+    )
+
+
+@register.simple_tag
+def product_picture(product, alt="", sizes=CARD_SIZES, css_class="", eager=False, img_id=""):
+    """<picture> with AVIF/WebP/JPEG srcsets for local product photos; a
+    plain <img> for remote image URLs."""
+    loading = "eager" if eager else "lazy"
+    path = local_source(product)
+    source = inspect(path) if path else None
+    if source is None:
+        return format_html(
+            '<img src="{}" alt="{}"{}{} loading="{}" decoding="async">',
+            product.display_image,
+            alt,
+            format_html(' class="{}"', css_class) if css_class else "",
+            format_html(' id="{}"', img_id) if img_id else "",
+            loading,
+        )
+
+    widths = rendition_widths(source)
+    formats = available_formats()
+    fallback_width = next((w for w in widths if w >= 480), widths[-1])
+    height = round(source.height * fallback_width / source.width)
+    sources = format_html_join(
+        "",
+        '<source type="{}" srcset="{}" sizes="{}">',
+        ((f"image/{ext}", _srcset(source, widths, ext), sizes) for ext in formats if ext != "jpg"),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" alt="{}" width="{}" height="{}"{}{} loading="{}" decoding="async"></picture>',
+        sources,
+        reverse("product_image", args=[source.digest, fallback_width, "jpg"]),
+        _srcset(source, widths, "jpg"),
+        sizes,
+        alt,
+        fallback_width,
+        height,
+        format_html(' class="{}"', css_class) if css_class else "",
+        format_html(' id="{}"', img_id) if img_id else "",
+        loading,
+    )
@@ -1,3 +1,411 @@
-from django.test import TestCase
+import random
+import threading
+import time
 
-# Create your tests here.
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.inventory.models import Inventory
+
+from .cache import _local, cached, catalog_version, reset_catalog_cache
+from .models import CacheVersion, Category, Product
+
+
+def shared_catalog_cache(test):
+    """Settings override giving the catalog a cache all workers would share
+    (FileBasedCache), so the version counter lives there."""
+    import tempfile
+
+    from django.conf import settings
+
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    catalog = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": tmp.name}
+    return test.settings(CACHES={**settings.CACHES, "catalog": catalog}, CATALOG_CACHE_ALIAS="catalog")
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        reset_catalog_cache()
+        self.client = Client(HTTP_HOST="127.0.0.1")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category = Category.objects.create(name="Matcha")
+            self.product = Product.objects.create(
+                category=self.category, name="Ceremonial", price=120000, stock_qty=5,
+            )
+
+    def test_version_bumps_on_product_save(self):
+        before = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(catalog_version(), before + 1)
+
+    def test_cached_value_reused_until_bump(self):
+        calls = []
+
+        def build():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(cached("t", build), 1)
+        self.assertEqual(cached("t", build), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertEqual(cached("t", build), 2)
+
+    def test_shop_grid_served_without_queries_when_warm(self):
+        with shared_catalog_cache(self):
+            reset_catalog_cache()
+            self.client.get(reverse("store_shop"))
+            with self.assertNumQueries(0):
+                response = self.client.get(reverse("store_shop"))
+        self.assertContains(response, "Ceremonial")
+
+    def test_per_process_cache_reads_version_once_per_request(self):
+        self.client.get(reverse("store_shop"))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("store_shop"))
+        self.assertContains(response, "Ceremonial")
+
+    def test_bump_in_another_worker_is_seen(self):
+        self.assertEqual(cached("t", lambda: "old"), "old")
+        # What _bump_now does in another process: only the row moves on
+        CacheVersion.objects.filter(name="catalog").update(version=catalog_version() + 1)
+        self.assertEqual(cached("t", lambda: "new"), "new")
+
+    def test_local_tier_is_bounded(self):
+        with self.settings(CATALOG_CACHE_MAX_LOCAL=2):
+            cached("a", lambda: 1)
+            cached("b", lambda: 2)
+            cached("a", lambda: 1)
+            cached("c", lambda: 3)
+        self.assertEqual(list(_local), ["a", "c"])
+
+    def test_search_and_later_pages_are_not_cached(self):
+        self.client.get(reverse("store_shop"), {"q": "ceremonial"})
+        self.client.get(reverse("store_shop"), {"after": "x"})
+        self.assertEqual(list(_local), ["categories"])
+
+    def test_stock_change_invalidates_shop(self):
+        from .stock import deduct_stock
+
+        self.client.get(reverse("store_shop"))
+        with self.captureOnCommitCallbacks(execute=True):
+            deduct_stock(self.product.id, 5)
+        response = self.client.get(reverse("store_shop"))
+        self.assertContains(response, "mz-stock-badge--out")
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        reset_catalog_cache()
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name="Tea")
+            self.lao = Product.objects.create(
+                category=category, name="ມັດຊະ ພຣີມຽມ", name_en="Premium Matcha", price=1,
+            )
+            self.desc_only = Product.objects.create(
+                category=category, name="Chasen", description_en="Bamboo whisk for matcha", price=1,
+            )
+            self.thai = Product.objects.create(category=category, name="Cup", name_th="ถ้วยชาเขียว", price=1)
+
+    def test_tokenizer_keeps_marks_with_consonant(self):
+        from .search import _clusters
+
+        self.assertEqual(_clusters("ມັດ"), ["ມັ", "ດ"])
+        self.assertEqual(_clusters("เขียว"), ["เขี", "ย", "ว"])
+
+    def test_name_match_ranks_above_description(self):
+        from .search import search_product_ids
+
+        self.assertEqual(search_product_ids("matcha"), [self.lao.id, self.desc_only.id])
+
+    def test_partial_lao_and_thai_queries(self):
+        from .search import search_product_ids
+
+        self.assertEqual(search_product_ids("ມັດຊະ"), [self.lao.id])
+        self.assertEqual(search_product_ids("ชาเขียว"), [self.thai.id])
+
+    def test_english_prefix(self):
+        from .search import search_product_ids
+
+        self.assertEqual(search_product_ids("whi"), [self.desc_only.id])
+
+    def test_index_refreshes_on_save(self):
+        from .search import search_product_ids
+
+        search_product_ids("matcha")  # build the in-process index
+        with self.captureOnCommitCallbacks(execute=True):
+            self.thai.name_en = "Matcha bowl"
+            self.thai.save()
+        self.assertIn(self.thai.id, search_product_ids("matcha"))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lao.is_active = False
+            self.lao.save()
+        self.assertNotIn(self.lao.id, search_product_ids("matcha"))
+
+    def test_index_sees_change_from_another_worker(self):
+        from .search import SEARCH, search_product_ids
+
+        search_product_ids("matcha")  # build the in-process index
+        # Another worker's save: the row and the counter move, this
+        # process's index is not patched
+        Product.objects.filter(pk=self.lao.pk).update(is_active=False)
+        CacheVersion.objects.update_or_create(name=SEARCH, defaults={"version": 99})
+        self.assertNotIn(self.lao.id, search_product_ids("matcha"))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        reset_catalog_cache()
+        category = Category.objects.create(name="Bulk")
+        # Duplicate names force the id tie-breaker to matter
+        for i in range(7):
+            Product.objects.create(category=category, name=f"Item {i % 3}", price=1)
+
+    def _walk(self, ordering):
+        from .pagination import keyset_page
+
+        seen, cursor = [], ""
+        while True:
+            page = keyset_page(Product.objects.all(), ordering, cursor, 3)
+            seen.extend(p.id for p in page.items)
+            if not page.has_next:
+                return seen
+            cursor = page.next_cursor
+
+    def test_pages_cover_every_row_once(self):
+        by_name = list(Product.objects.order_by("name", "id").values_list("id", flat=True))
+        newest = list(Product.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(self._walk("name"), by_name)
+        self.assertEqual(self._walk("newest"), newest)
+
+    def test_garbage_cursor_restarts(self):
+        from .pagination import keyset_page
+
+        page = keyset_page(Product.objects.all(), "name", "not-a-cursor", 3)
+        self.assertEqual(len(page.items), 3)
+
+    def test_shop_fragment_returns_next_page(self):
+        client = Client(HTTP_HOST="127.0.0.1")
+        with self.settings(SHOP_PAGE_SIZE=4):
+            first = client.get(reverse("store_shop"))
+            self.assertEqual(len(first.context["products"]), 4)
+            more = client.get(reverse("store_shop_more") + "?" + first.context["next_query"])
+        self.assertEqual(len(more.context["products"]), 3)
+        self.assertNotContains(more, "data-infinite-next")
+
+
+class ProductImageTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        from django.test import override_settings
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(PRODUCT_IMAGE_CACHE_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_catalog_cache()
+        self.client = Client(HTTP_HOST="127.0.0.1")
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(name="Matcha")
+            self.product = Product.objects.create(
+                category=category, name="Ceremonial", price=120000, stock_qty=5,
+                image_url="/static/img/products/matcha-ceremonial-50g.jpg",
+            )
+
+    def test_picture_tag_emits_srcset(self):
+        from django.template import Context, Template
+
+        html = Template("{% load product_images %}{% product_picture p alt='x' %}").render(Context({"p": self.product}))
+        self.assertIn("<picture>", html)
+        self.assertIn('type="image/webp"', html)
+        self.assertRegex(html, r'srcset="/img/[0-9a-f]{20}/160\.jpg 160w, ')
+        self.assertIn('loading="lazy"', html)
+
+    def test_remote_image_stays_plain_img(self):
+        from .templatetags.product_images import product_picture
+
+        self.product.image_url = "https://cdn.example.com/a.jpg"
+        html = product_picture(self.product)
+        self.assertNotIn("<picture>", html)
+        self.assertIn('src="https://cdn.example.com/a.jpg"', html)
+
+    def test_rendition_generated_and_cached_forever(self):
+        import io
+
+        from PIL import Image
+
+        from .images import inspect, local_source
+
+        source = inspect(local_source(self.product))
+        response = self.client.get(reverse("product_image", args=[source.digest, 320, "webp"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("immutable", response["Cache-Control"])
+        with Image.open(io.BytesIO(b"".join(response.streaming_content))) as image:
+            self.assertEqual(image.width, 320)
+
+    def test_jpeg_rendition_flattens_transparency_onto_white(self):
+        import io
+        import tempfile
+        from pathlib import Path
+
+        from PIL import Image
+
+        from .images import inspect
+
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / "cutout.png"
+        Image.new("RGBA", (400, 200), (0, 0, 0, 0)).save(path)
+        source = inspect(path)
+        response = self.client.get(reverse("product_image", args=[source.digest, 320, "jpg"]))
+        self.assertEqual(response.status_code, 200)
+        with Image.open(io.BytesIO(b"".join(response.streaming_content))) as image:
+            self.assertEqual(image.mode, "RGB")
+            self.assertGreater(min(image.getpixel((10, 10))), 245)
+
+    def test_unknown_rendition_is_404(self):
+        self.assertEqual(self.client.get(reverse("product_image", args=["0" * 20, 320, "webp"])).status_code, 404)
+        self.assertEqual(self.client.get("/img/not-a-digest/320.webp").status_code, 404)
+
+    def test_shop_grid_uses_renditions(self):
+        response = self.client.get(reverse("store_shop"))
+        self.assertContains(response, "<picture>")
+        self.assertNotContains(response, 'src="/static/img/products/matcha-ceremonial-50g.jpg"')
+
+
+class TakeStockTests(TestCase):
+    def setUp(self):
+        reset_catalog_cache()
+        category = Category.objects.create(name="Tea")
+        self.a = Product.objects.create(category=category, name="A", price=1, stock_qty=5)
+        self.b = Product.objects.create(category=category, name="B", price=1, stock_qty=1)
+
+    def test_strict_is_all_or_nothing(self):
+        from .stock import InsufficientStock, take_stock
+
+        with self.assertRaises(InsufficientStock) as ctx:
+            take_stock([(self.a.id, 2), (self.b.id, 2)])
+        self.assertEqual([line.product_id for line in ctx.exception.short], [self.b.id])
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual((self.a.stock_qty, self.b.stock_qty), (5, 1))
+
+        take_stock([(self.a.id, 2), (self.b.id, 1), (self.a.id, 1)])
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual((self.a.stock_qty, self.b.stock_qty), (2, 0))
+
+    def test_lenient_reports_shortfall(self):
+        from .stock import deduct_stock
+
+        line = deduct_stock(self.b.id, 3)
+        self.assertEqual((line.taken, line.shortfall), (1, 2))
+        self.b.refresh_from_db()
+        self.assertEqual(self.b.stock_qty, 0)
+
+
+class BatchConsumptionTests(TestCase):
+    def setUp(self):
+        from datetime import date, timedelta
+
+        reset_catalog_cache()
+        category = Category.objects.create(name="Milk")
+        self.products = [
+            Product.objects.create(category=category, name=f"P{i}", price=1) for i in range(3)
+        ]
+        today = date.today()
+        self.batches = {}
+        for product in self.products:
+            # received oldest → newest, but the newest expires first
+            self.batches[product.id] = [
+                Inventory.objects.create(product=product, quantity=4, expiry_date=today + timedelta(days=30)),
+                Inventory.objects.create(product=product, quantity=4, expiry_date=None),
+                Inventory.objects.create(product=product, quantity=4, expiry_date=today + timedelta(days=2)),
+            ]
+
+    def _left(self, product):
+        return [b.quantity for b in Inventory.objects.filter(product=product).order_by("id")]
+
+    def test_fifo_spills_into_next_batch(self):
+        from .stock import consume_inventory_batches
+
+        with self.assertNumQueries(4):  # window select + one update, in a savepoint
+            consume_inventory_batches([(p.id, 6) for p in self.products], policy="fifo")
+        for product in self.products:
+            self.assertEqual(self._left(product), [0, 2, 4])
+
+    def test_fefo_takes_soonest_expiry_first(self):
+        from .stock import consume_inventory_batches
+
+        consume_inventory_batches([(self.products[0].id, 6)], policy="fefo")
+        self.assertEqual(self._left(self.products[0]), [2, 4, 0])
+
+    def test_query_count_independent_of_lines(self):
+        from .stock import take_stock
+
+        with CaptureQueriesContext(connection) as one:
+            take_stock([(self.products[0].id, 1)])
+        with CaptureQueriesContext(connection) as three:
+            take_stock([(p.id, 5) for p in self.products])
+        self.assertEqual(len(one.captured_queries), len(three.captured_queries))
+
+
+class TakeStockConcurrencyTests(TransactionTestCase):
+    """Many buyers racing for the same SKU must never sell more than exists."""
+
+    def test_no_oversell_under_contention(self, initial=10, buyers=25):
+        # SQLite's shared-cache test database answers concurrent writers
+        # with "database table is locked" instead of waiting; a buyer who
+        # hits that simply tries again, like a customer pressing retry.
+        # Only InsufficientStock counts as a refused sale. The catalog
+        # version lives in a cache here so its row does not add writers.
+        from .stock import InsufficientStock, take_stock
+
+        self.enterContext(shared_catalog_cache(self))
+        category = Category.objects.create(name="Hot")
+        product = Product.objects.create(category=category, name="Drop", price=1, stock_qty=initial)
+        sold, refused, errors = [], [], []
+        start = threading.Barrier(buyers)
+
+        def buy():
+            try:
+                start.wait()
+                deadline = time.monotonic() + 60
+                backoff = 0.002
+                while time.monotonic() < deadline:
+                    try:
+                        take_stock([(product.id, 1)])
+                    except InsufficientStock:
+                        refused.append(1)
+                    except OperationalError as exc:
+                        if "locked" not in str(exc):
+                            raise
+                        # jittered and growing, so no buyer is starved
+                        time.sleep(random.uniform(0, backoff))
+                        backoff = min(backoff * 2, 0.1)
+                        continue
+                    else:
+                        sold.append(1)
+                    return
+                errors.append("still locked after 60s")
+            except Exception as exc:
+                errors.append(repr(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(buyers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        product.refresh_from_db()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(sold), initial)
+        self.assertEqual(len(refused), buyers - initial)
+        self.assertEqual(product.stock_qty, 0)
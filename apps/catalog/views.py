@@ -0,0 +1,22 @@
+import re
+
+from django.http import FileResponse, Http404
+from django.views.decorators.http import require_GET
+
+from .images import FORMATS, build_rendition
+
+_DIGEST = re.compile(r"^[0-9a-f]{20}$")
+
+
+@require_GET
+def product_image(request, digest, width, ext):
+    """A product photo rendition (see apps.catalog.images), generated on
+    first request. URLs are content-addressed, so caches may keep them forever."""
+    if not _DIGEST.match(digest):
+        raise Http404
+    path = build_rendition(digest, width, ext)
+    if path is None:
+        raise Http404
+    response = FileResponse(open(path, "rb"), content_type=FORMATS[ext][1])
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
@@ -51,6 +51,13 @@ class ImportsAdmin(ModelAdmin):
         }),
     )
 
+    def save_formset(self, request, form, formset, change):
+        # Receive every line of the import in one pass instead of per row
+        from apps.catalog.stock import deferred_receipts
+
+        with deferred_receipts():
+            super().save_formset(request, form, formset, change)
+
 
 @admin.register(Inventory)
 class InventoryAdmin(ModelAdmin):
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:55
+
+from django.db import migrations, models
+
+from config.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0005_alter_importdetail_options_alter_imports_options_and_more'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('quantity__gt', 0)), fields=['product', 'created_at', 'id'], include=('quantity', 'expiry_date'), name='inventory_open_batch_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='inventory',
+            index=models.Index(fields=['-created_at'], name='inventory_created_idx'),
+        ),
+    ]
@@ -114,6 +114,18 @@ class Inventory(models.Model):
     class Meta:
         verbose_name = "ສະຕັອກໃນສາງ"
         verbose_name_plural = "ສະຕັອກໃນສາງ"
+        indexes = [
+            # _consume_inventory_batches(): non-empty batches per product in
+            # FIFO order. INCLUDE makes it covering on PostgreSQL; other
+            # databases build it without the extra columns
+            models.Index(
+                fields=["product", "created_at", "id"],
+                name="inventory_open_batch_idx",
+                condition=models.Q(quantity__gt=0),
+                include=["quantity", "expiry_date"],
+            ),
+            models.Index(fields=["-created_at"], name="inventory_created_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
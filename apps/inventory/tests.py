@@ -1,3 +1,112 @@
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.catalog.cache import reset_catalog_cache
+from apps.catalog.models import Category, Product
+from apps.catalog.stock import deferred_receipts, receive_stock_bulk
+from apps.sales.models import Order, Reserved
+from apps.store.models import Customer
+
+from .models import Inventory
+
+
+class ReservationFixtureMixin:
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        reset_catalog_cache()
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        self.customer = Customer.objects.create(user=user, cus_name="Noy", cus_last="", address="", cus_tel="020")
+        category = Category.objects.create(name="Matcha")
+        self.products = [Product.objects.create(category=category, name=f"P{i}", price=1) for i in range(3)]
+
+    def _reserve(self, product, *quantities):
+        order = Order.objects.create(customer=self.customer, status=Order.Status.RESERVED)
+        now = timezone.now()
+        return [
+            Reserved.objects.create(order=order, product=product, quantity=q, expire_at=now + timedelta(days=3))
+            for q in quantities
+        ]
+
+    def _ready(self, reservations):
+        return [Reserved.objects.get(pk=r.pk).stock_ready for r in reservations]
+
+
+class ReceiveStockTests(ReservationFixtureMixin, TestCase):
+    def test_newest_first_skips_too_large(self):
+        product = self.products[0]
+        reservations = self._reserve(product, 2, 5, 2)
+        receive_stock_bulk([(product.id, 5)], policy="newest")
+        self.assertEqual(self._ready(reservations), [True, False, True])
+        product.refresh_from_db()
+        self.assertEqual(product.stock_qty, 1)
+
+    def test_oldest_first(self):
+        product = self.products[0]
+        reservations = self._reserve(product, 3, 3)
+        receive_stock_bulk([(product.id, 4)], policy="oldest")
+        self.assertEqual(self._ready(reservations), [True, False])
+
+    def test_queries_do_not_grow_with_shipment(self):
+        for product in self.products:
+            self._reserve(product, 1, 1)
+        with CaptureQueriesContext(connection) as one:
+            receive_stock_bulk([(self.products[0].id, 1)])
+        with CaptureQueriesContext(connection) as many:
+            receive_stock_bulk([(p.id, 5) for p in self.products])
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+
+    def test_deferred_receipts_apply_once(self):
+        product = self.products[1]
+        with deferred_receipts():
+            Inventory.objects.create(product=product, quantity=2)
+            Inventory.objects.create(product=product, quantity=3)
+            product.refresh_from_db()
+            self.assertEqual(product.stock_qty, 0)
+        product.refresh_from_db()
+        self.assertEqual(product.stock_qty, 5)
+
+
+class StockCounterTests(ReservationFixtureMixin, TestCase):
+    def _counters(self, product):
+        product.refresh_from_db()
+        return product.on_hand_qty, product.allocated_qty, product.stock_qty
+
+    def test_counters_follow_stock_lifecycle(self):
+        from apps.catalog.stock import consume_allocated_stock, release_stock, take_stock
+
+        product = self.products[0]
+        self._reserve(product, 2, 3)
+        receive_stock_bulk([(product.id, 10)])
+        self.assertEqual(self._counters(product), (10, 5, 5))
+        take_stock([(product.id, 4)])
+        self.assertEqual(self._counters(product), (6, 5, 1))
+        consume_allocated_stock(product.id, 3)
+        self.assertEqual(self._counters(product), (3, 2, 1))
+        release_stock(product.id, 2)
+        self.assertEqual(self._counters(product), (3, 0, 3))
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        from io import StringIO
+
+        from django.core.management import call_command
+
+        product = self.products[0]
+        self._reserve(product, 2)
+        receive_stock_bulk([(product.id, 5)])
+        Product.objects.filter(pk=product.pk).update(on_hand_qty=0, allocated_qty=9)
+
+        out = StringIO()
+        call_command("reconcile_stock", stdout=out)
+        self.assertIn("1 product(s) drifted", out.getvalue())
+        self.assertEqual(self._counters(product), (0, 9, 3))
 
-# Create your tests here.
+        call_command("reconcile_stock", "--fix", stdout=StringIO())
+        self.assertEqual(self._counters(product), (5, 2, 3))
+        out = StringIO()
+        call_command("reconcile_stock", stdout=out)
+        self.assertIn("match", out.getvalue())
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from unfold.admin import ModelAdmin, TabularInline
-from .models import Order, OrderItem, Bill, Payment, Reserved
+from .models import Order, OrderItem, Bill, Payment, Reserved, SlipUploadJob, DailySalesRollup
 
 
 class OrderItemInline(TabularInline):
@@ -11,8 +11,29 @@ class OrderItemInline(TabularInline):
     verbose_name_plural = "ລາຍການສິນຄ້າໃນອໍເດີ"
 
 
+class ExportActionsMixin:
+    """Streamed CSV/JSON download of the selected rows (apps.sales.exports)."""
+
+    export_name = ""
+    actions = ["export_csv", "export_json"]
+
+    def _export(self, queryset, fmt):
+        from .exports import EXPORTS, export_response
+
+        return export_response(EXPORTS[self.export_name], queryset, fmt)
+
+    @admin.action(description="ສົ່ງອອກເປັນ CSV")
+    def export_csv(self, request, queryset):
+        return self._export(queryset, "csv")
+
+    @admin.action(description="ສົ່ງອອກເປັນ JSON")
+    def export_json(self, request, queryset):
+        return self._export(queryset, "json")
+
+
 @admin.register(Order)
-class OrderAdmin(ModelAdmin):
+class OrderAdmin(ExportActionsMixin, ModelAdmin):
+    export_name = "orders"
     list_display = ("id", "order_date", "customer", "employee", "status")
     search_fields = ("customer__cus_name", "employee__emp_name", "id")
     list_filter = ("status",)
@@ -24,9 +45,17 @@ class OrderAdmin(ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        from .rollup import record_order
+
+        super().save_model(request, obj, form, change)
+        if not change:
+            record_order(obj)
+
 
 @admin.register(Bill)
-class BillAdmin(ModelAdmin):
+class BillAdmin(ExportActionsMixin, ModelAdmin):
+    export_name = "bills"
     list_display = ("id", "order", "bill_date", "total_amount", "paid_amount", "balance_due", "status")
     list_filter = ("status",)
     fieldsets = (
@@ -36,11 +65,21 @@ class BillAdmin(ModelAdmin):
         }),
     )
 
+    def save_model(self, request, obj, form, change):
+        from .rollup import record_bill_change
+
+        old_status, old_total = Bill.Status.PENDING, None
+        if change:
+            old_status, old_total = Bill.objects.filter(pk=obj.pk).values_list("status", "total_amount").get()
+        super().save_model(request, obj, form, change)
+        record_bill_change(obj, old_status, old_total)
+
 
 @admin.register(Payment)
-class PaymentAdmin(ModelAdmin):
-    list_display = ("id", "bill", "pay_amount", "pay_with", "pay_date", "slip_preview")
-    list_filter = ("pay_with",)
+class PaymentAdmin(ExportActionsMixin, ModelAdmin):
+    export_name = "payments"
+    list_display = ("id", "bill", "pay_amount", "pay_with", "pay_date", "slip_status", "slip_preview")
+    list_filter = ("pay_with", "slip_status")
     fieldsets = (
         ("ການຊຳລະ", {
             "fields": ("bill", "employee", "pay_amount", "pay_with", "slip_url"),
@@ -65,3 +104,32 @@ class ReservedAdmin(ModelAdmin):
             "description": "ຈອງ = ຈ່າຍມັດຈຳກ່ອນ · ຕິກ 'ສິນຄ້າພ້ອມ' ເມື່ອຈັດສິນຄ້າໃຫ້ແລ້ວ",
         }),
     )
+
+
+@admin.register(SlipUploadJob)
+class SlipUploadJobAdmin(ModelAdmin):
+    list_display = ("id", "payment", "status", "attempts", "next_attempt_at", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = ("payment", "spool_path", "object_path", "content_type", "attempts", "last_error", "created_at", "finished_at")
+    actions = ["retry_now"]
+
+    @admin.action(description="ລອງອັບໂຫຼດໃໝ່ດຽວນີ້")
+    def retry_now(self, request, queryset):
+        from django.utils import timezone
+
+        jobs = queryset.exclude(status=SlipUploadJob.Status.DONE)
+        Payment.objects.filter(slip_job__in=jobs).update(slip_status=Payment.SlipStatus.UPLOADING)
+        count = jobs.update(status=SlipUploadJob.Status.PENDING, attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"ຈະລອງອັບໂຫຼດໃໝ່ {count} ລາຍການ")
+
+
+@admin.register(DailySalesRollup)
+class DailySalesRollupAdmin(ModelAdmin):
+    list_display = ("day", "channel", "employee", "product", "orders", "paid_orders", "units", "revenue")
+    list_filter = ("channel", "day")
+    date_hierarchy = "day"
+    readonly_fields = ("day", "channel", "employee", "product", "orders", "paid_orders", "units", "revenue")
+
+    def has_add_permission(self, request):
+        # Written by apps.sales.rollup / `manage.py rebuild_sales_rollup`
+        return False
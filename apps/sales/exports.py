@@ -0,0 +1,231 @@
+"""Streaming CSV/JSON exports of orders, bills and payments.
+
+Used by the OrderAdmin/BillAdmin/PaymentAdmin export actions and by
+`manage.py export_sales`. Rows are read in primary-key pages of CHUNK
+(``id > last id``, each page through .iterator(chunk_size=CHUNK)), so
+memory stays flat and no cursor has to outlive a statement — this also
+works on the transaction pooler, where server-side cursors are off.
+Order exports fetch the lines of each page in one extra query.
+
+Every row is flat and already joined: customer, employee and bill
+columns sit next to the order/payment; an order carries its lines as
+``items`` (a list in JSON, "name×qty@price; …" in CSV).
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Bill, Order, OrderItem, Payment
+
+CHUNK = 2000
+FORMATS = ("csv", "json")
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "json": "application/json; charset=utf-8"}
+
+
+@dataclass(frozen=True)
+class Export:
+    name: str
+    model: type
+    date_field: str
+    # output column -> values() lookup
+    fields: dict
+    # path from the model to Order (for channel/customer filters)
+    order_path: str
+    with_items: bool = False
+
+    @property
+    def columns(self) -> list[str]:
+        extra = ["channel"] + (["units", "items"] if self.with_items else [])
+        return list(self.fields) + extra
+
+    def queryset(self, start: date | None = None, end: date | None = None, status: str = "", channel: str = ""):
+        """All rows in local days start..end (inclusive) matching the filters."""
+        qs = self.model.objects.all()
+        tz = timezone.get_current_timezone()
+        if start:
+            qs = qs.filter(**{f"{self.date_field}__gte": datetime.combine(start, time.min, tzinfo=tz)})
+        if end:
+            qs = qs.filter(**{f"{self.date_field}__lt": datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz)})
+        if status:
+            qs = qs.filter(status=status) if self.model is not Payment else qs.filter(bill__status=status)
+        if channel:
+            qs = qs.filter(**{f"{self.order_path}customer__isnull": channel == "POS"})
+        return qs
+
+
+def _prefix(path: str, fields: dict) -> dict:
+    return {column: path + lookup for column, lookup in fields.items()}
+
+
+_CUSTOMER = {"customer": "customer__cus_name", "customer_last": "customer__cus_last", "customer_tel": "customer__cus_tel"}
+_EMPLOYEE = {"employee": "employee__emp_name"}
+_BILL = {"bill_total": "total_amount", "bill_paid": "paid_amount", "bill_balance_due": "balance_due", "bill_status": "status"}
+
+EXPORTS = {
+    "orders": Export(
+        "orders",
+        Order,
+        "order_date",
+        {
+            "order_id": "id",
+            "order_date": "order_date",
+            "status": "status",
+            **_CUSTOMER,
+            **_EMPLOYEE,
+            **_prefix("bill__", {"bill_id": "id", **_BILL}),
+        },
+        order_path="",
+        with_items=True,
+    ),
+    "bills": Export(
+        "bills",
+        Bill,
+        "bill_date",
+        {
+            "bill_id": "id",
+            "bill_date": "bill_date",
+            **_BILL,
+            "order_id": "order_id",
+            "order_date": "order__order_date",
+            "order_status": "order__status",
+            **_prefix("order__", {**_CUSTOMER, **_EMPLOYEE}),
+        },
+        order_path="order__",
+    ),
+    "payments": Export(
+        "payments",
+        Payment,
+        "pay_date",
+        {
+            "payment_id": "id",
+            "pay_date": "pay_date",
+            "pay_amount": "pay_amount",
+            "pay_with": "pay_with",
+            "slip_status": "slip_status",
+            "slip_url": "slip_url",
+            "received_by": "employee__emp_name",
+            "bill_id": "bill_id",
+            **_prefix("bill__", _BILL),
+            "order_id": "bill__order_id",
+            **_prefix("bill__order__", {**_CUSTOMER, **_EMPLOYEE}),
+        },
+        order_path="bill__order__",
+    ),
+}
+
+
+def _customer_lookup(export: Export) -> str:
+    return export.fields["customer"].replace("cus_name", "id")
+
+
+def rows(export: Export, queryset, after_id: int = 0) -> Iterator[dict]:
+    """Export rows for ``queryset`` in id order, from ``after_id`` on."""
+    lookups = dict(export.fields, _pk="pk", _customer_id=_customer_lookup(export))
+    last = after_id
+    while True:
+        page = [
+            dict(zip(lookups, values))
+            for values in queryset.filter(pk__gt=last)
+            .order_by("pk")
+            .values_list(*lookups.values())[:CHUNK]
+            .iterator(chunk_size=CHUNK)
+        ]
+        if not page:
+            return
+        last = page[-1]["_pk"]
+        items = _items([row["order_id"] for row in page]) if export.with_items else {}
+        for row in page:
+            del row["_pk"]
+            row["channel"] = "WEB" if row.pop("_customer_id") else "POS"
+            if export.with_items:
+                lines = items.get(row["order_id"], [])
+                row["units"] = sum(line["qty"] for line in lines)
+                row["items"] = lines
+            yield row
+        if len(page) < CHUNK:
+            return
+
+
+def _items(order_ids) -> dict[int, list[dict]]:
+    lines: dict[int, list[dict]] = {}
+    for order_id, name, qty, price, subtotal in (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by("order_id", "id")
+        .values_list("order_id", "product__name", "quantity", "price", "subtotal")
+        .iterator(chunk_size=CHUNK)
+    ):
+        lines.setdefault(order_id, []).append({"product": name, "qty": qty, "price": price, "subtotal": subtotal})
+    return lines
+
+
+class _Echo:
+    """csv.writer target that hands each line back instead of buffering."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(header: Iterable[str], records: Iterable[Iterable]) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens Lao text as UTF-8
+    yield "\ufeff" + writer.writerow(header)
+    for record in records:
+        yield writer.writerow(record)
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return "; ".join(f"{line['product']}×{line['qty']}@{line['price']}" for line in value)
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat(timespec="seconds")
+    return "" if value is None else value
+
+
+def render(export: Export, records: Iterable[dict], fmt: str) -> Iterator[str]:
+    """Text chunks of ``records`` as CSV, or as one JSON array."""
+    if fmt == "csv":
+        columns = export.columns
+        yield from csv_lines(columns, ([_csv_value(r[c]) for c in columns] for r in records))
+        return
+    yield "["
+    first = True
+    for record in records:
+        yield ("\n" if first else ",\n") + json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False)
+        first = False
+    yield "\n]\n"
+
+
+def streaming_response(chunks: Iterable[str], fmt: str, filename: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_response(export: Export, queryset, fmt: str) -> StreamingHttpResponse:
+    stamp = timezone.localtime().strftime("%Y%m%d-%H%M")
+    return streaming_response(render(export, rows(export, queryset), fmt), fmt, f"{export.name}_{stamp}.{fmt}")
+
+
+def windows(start: date, end: date, size: str) -> Iterator[tuple[date, date]]:
+    """Split start..end into consecutive day/week/month windows."""
+    current = start
+    while current <= end:
+        if size == "day":
+            last = current
+        elif size == "week":
+            last = current + timedelta(days=6 - current.weekday())
+        else:
+            nxt = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+            last = nxt - timedelta(days=1)
+        last = min(last, end)
+        yield current, last
+        current = last + timedelta(days=1)
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django import forms
+from django.utils import timezone
+
+from .analytics import ReportRange
+
+
+class ReportForm(forms.Form):
+    """Query-string filters for the staff sales report (GET)."""
+
+    start = forms.DateField(label="ຈາກວັນທີ", widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
+    end = forms.DateField(label="ຫາວັນທີ", widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
+    bucket = forms.ChoiceField(
+        label="ຈັດກຸ່ມຕາມ",
+        choices=[("hour", "ຊົ່ວໂມງ"), ("day", "ວັນ"), ("week", "ອາທິດ"), ("month", "ເດືອນ")],
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+    channel = forms.ChoiceField(
+        label="ຊ່ອງທາງ",
+        required=False,
+        choices=[("", "ທັງໝົດ"), ("WEB", "ເວັບ"), ("POS", "ໜ້າຮ້ານ (POS)")],
+        widget=forms.Select(attrs={"class": "form-select"}),
+    )
+
+    def __init__(self, data=None, **kwargs):
+        today = timezone.localdate()
+        defaults = {"start": today - timedelta(days=29), "end": today, "bucket": "day", "channel": ""}
+        if data is not None:
+            data = {**defaults, **{k: v for k, v in data.items() if v or k == "channel"}}
+        super().__init__(data, initial=defaults, **kwargs)
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get("start"), cleaned.get("end")
+        if start and end and start > end:
+            raise forms.ValidationError("ວັນທີເລີ່ມຕ້ອງບໍ່ຫຼັງວັນທີສິ້ນສຸດ")
+        return cleaned
+
+    def report_range(self) -> ReportRange:
+        data = self.cleaned_data
+        return ReportRange(data["start"], data["end"], data["bucket"], data.get("channel") or "")
@@ -0,0 +1,73 @@
+import os
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.sales.exports import EXPORTS, FORMATS, render, rows, windows
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream orders, bills or payments as CSV/JSON. With --out and --window each "
+        "day/week/month goes to its own file; files already written are skipped, so "
+        "an interrupted export picks up where it stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(EXPORTS))
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--from", dest="start", help="First local day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="end", help="Last local day, YYYY-MM-DD (inclusive, default today)")
+        parser.add_argument("--status", default="", help="Only this order/bill status (bill status for payments)")
+        parser.add_argument("--channel", choices=("WEB", "POS"), default="")
+        parser.add_argument("--after-id", type=int, default=0, help="Resume a single export after this id")
+        parser.add_argument("--out", help="Directory to write into (default: stdout)")
+        parser.add_argument("--window", choices=("day", "week", "month"), help="One file per window (needs --out and --from)")
+
+    def handle(self, *args, **options):
+        export = EXPORTS[options["kind"]]
+        fmt = options["format"]
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) if options["end"] else None
+        except ValueError as exc:
+            raise CommandError(f"Bad date: {exc}")
+        filters = {"status": options["status"], "channel": options["channel"]}
+
+        if not options["window"]:
+            records = rows(export, export.queryset(start, end, **filters), after_id=options["after_id"])
+            if options["out"]:
+                os.makedirs(options["out"], exist_ok=True)
+                name = f"{export.name}_{start or 'all'}_{end or 'now'}.{fmt}"
+                self._write(os.path.join(options["out"], name), render(export, records, fmt))
+                self.stdout.write(f"{name}: written")
+            else:
+                for chunk in render(export, records, fmt):
+                    self.stdout.write(chunk, ending="")
+            return
+
+        if not (options["out"] and start):
+            raise CommandError("--window needs --out and --from")
+        end = end or timezone.localdate()
+        os.makedirs(options["out"], exist_ok=True)
+        for first, last in windows(start, end, options["window"]):
+            name = f"{export.name}_{first}_{last}.{fmt}"
+            path = os.path.join(options["out"], name)
+            # A window still in progress (ends today or later) is always redone
+            if os.path.exists(path) and last < timezone.localdate():
+                self.stdout.write(f"{name}: exists, skipped")
+                continue
+            records = rows(export, export.queryset(first, last, **filters))
+            self._write(path, render(export, records, fmt))
+            self.stdout.write(f"{name}: written")
+
+    @staticmethod
+    def _write(path, chunks):
+        # Write to .part and rename, so a crash never leaves a file that
+        # looks finished
+        part = path + ".part"
+        with open(part, "w", encoding="utf-8", newline="") as fh:
+            for chunk in chunks:
+                fh.write(chunk)
+        os.replace(part, path)
@@ -0,0 +1,45 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.sales.slip_uploads import process_due_jobs
+
+logger = logging.getLogger("apps.sales.slip_uploads")
+# Longest pause after repeated failed passes (e.g. the database is down)
+MAX_BACKOFF = 60.0
+
+
+class Command(BaseCommand):
+    help = "Push spooled payment slips to storage (runs until stopped; --once for a single pass)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Process what is due now, then exit")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when idle")
+        parser.add_argument("--batch", type=int, default=10, help="Jobs claimed per pass")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            done = process_due_jobs(options["batch"])
+            self.stdout.write(f"Processed {done} slip upload(s)")
+            return
+
+        self.stdout.write("Slip upload worker started")
+        backoff = options["interval"]
+        try:
+            while True:
+                try:
+                    close_old_connections()
+                    busy = process_due_jobs(options["batch"])
+                except Exception:
+                    # Keep the worker alive: nothing restarts it if it exits
+                    logger.exception("slip upload pass failed; retrying in %.0fs", backoff)
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF)
+                    continue
+                backoff = options["interval"]
+                if not busy:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Slip upload worker stopped")
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.sales.models import DailySalesRollup
+from apps.sales.rollup import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily sales rollup from orders and bills (all days, or --from/--to)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", help="First local day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="end", help="Last local day, YYYY-MM-DD (inclusive)")
+        parser.add_argument("--if-empty", action="store_true", help="Only when the rollup has no rows yet (first deploy)")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) if options["end"] else None
+        except ValueError as exc:
+            raise CommandError(f"Bad date: {exc}")
+        if start and end and start > end:
+            raise CommandError("--from is after --to")
+        if options["if_empty"] and DailySalesRollup.objects.exists():
+            self.stdout.write("Sales rollup already populated")
+            return
+        rows = rebuild(start, end)
+        self.stdout.write(f"Rebuilt sales rollup: {rows} row(s)")
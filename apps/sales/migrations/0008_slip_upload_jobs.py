@@ -0,0 +1,47 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:28
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_slips_ready(apps, schema_editor):
+    Payment = apps.get_model("sales", "Payment")
+    Payment.objects.exclude(slip_url__isnull=True).exclude(slip_url="").update(slip_status="READY")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0007_alter_bill_options_alter_order_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='slip_status',
+            field=models.CharField(choices=[('NONE', 'ບໍ່ມີສະລິບ'), ('UPLOADING', 'ກຳລັງອັບໂຫຼດ'), ('READY', 'ພ້ອມກວດ'), ('FAILED', 'ອັບໂຫຼດບໍ່ສຳເລັດ')], default='NONE', help_text='ກຳລັງອັບໂຫຼດ = ລະບົບກຳລັງສົ່ງຮູບໄປບ່ອນເກັບ, ລິ້ງຈະຂຶ້ນເອງ', max_length=20, verbose_name='ສະຖານະສະລິບ'),
+        ),
+        migrations.CreateModel(
+            name='SlipUploadJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spool_path', models.CharField(max_length=500, verbose_name='ໄຟລ໌ຊົ່ວຄາວ')),
+                ('object_path', models.CharField(max_length=300, verbose_name='ບ່ອນເກັບປາຍທາງ')),
+                ('content_type', models.CharField(default='image/jpeg', max_length=100, verbose_name='ປະເພດໄຟລ໌')),
+                ('status', models.CharField(choices=[('PENDING', 'ລໍຖ້າ'), ('DONE', 'ສຳເລັດ'), ('FAILED', 'ລົ້ມເຫຼວ')], default='PENDING', max_length=20, verbose_name='ສະຖານະ')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='ຈຳນວນຄັ້ງທີ່ລອງ')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='ລອງຄັ້ງຕໍ່ໄປ')),
+                ('last_error', models.TextField(blank=True, verbose_name='ຂໍ້ຜິດພາດລ່າສຸດ')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='ວັນທີສ້າງ')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='ວັນທີສຳເລັດ')),
+                ('payment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='slip_job', to='sales.payment', verbose_name='ການຊຳລະ')),
+            ],
+            options={
+                'verbose_name': 'ງານອັບໂຫຼດສະລິບ',
+                'verbose_name_plural': 'ງານອັບໂຫຼດສະລິບ',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='sales_slipjob_due_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_slips_ready, migrations.RunPython.noop),
+    ]
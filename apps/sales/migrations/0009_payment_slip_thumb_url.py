@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0008_slip_upload_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='slip_thumb_url',
+            field=models.CharField(blank=True, help_text='ຮູບຫຍໍ້ສຳລັບລາຍການໃນໜ້າ Staff — ສ້າງອັດຕະໂນມັດ', max_length=500, null=True, verbose_name='ລິ້ງຮູບສະລິບຂະໜາດນ້ອຍ'),
+        ),
+    ]
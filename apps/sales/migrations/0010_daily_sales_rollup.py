@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:48
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0008_product_stock_counters'),
+        ('sales', '0009_payment_slip_thumb_url'),
+        ('store', '0006_saved_cart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='ວັນທີ')),
+                ('channel', models.CharField(choices=[('WEB', 'ເວັບ'), ('POS', 'ໜ້າຮ້ານ (POS)')], max_length=10, verbose_name='ຊ່ອງທາງ')),
+                ('orders', models.IntegerField(default=0, verbose_name='ອໍເດີ')),
+                ('paid_orders', models.IntegerField(default=0, verbose_name='ອໍເດີທີ່ຊຳລະຄົບ')),
+                ('units', models.IntegerField(default=0, verbose_name='ຈຳນວນຂາຍ')),
+                ('revenue', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='ຍອດຂາຍ (ກີບ)')),
+                ('employee', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='store.employee', verbose_name='ພະນັກງານ')),
+                ('product', models.ForeignKey(blank=True, help_text='ວ່າງ = ຍອດລວມລະດັບອໍເດີ', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product', verbose_name='ສິນຄ້າ')),
+            ],
+            options={
+                'verbose_name': 'ສະຫຼຸບຍອດຂາຍລາຍວັນ',
+                'verbose_name_plural': 'ສະຫຼຸບຍອດຂາຍລາຍວັນ',
+                'indexes': [models.Index(fields=['day', 'channel'], name='sales_rollup_day_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:55
+
+from django.db import migrations, models
+
+from config.migration_operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('sales', '0010_daily_sales_rollup'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='bill',
+            index=models.Index(fields=['status', 'bill_date'], name='sales_bill_status_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='bill',
+            index=models.Index(fields=['bill_date'], name='sales_bill_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['status', '-order_date'], name='sales_order_status_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='order',
+            index=models.Index(fields=['order_date'], name='sales_order_date_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='reserved',
+            index=models.Index(condition=models.Q(('status', 'RESERVED'), ('stock_ready', False)), fields=['product', 'res_date', 'id'], name='sales_reserved_waiting_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='reserved',
+            index=models.Index(fields=['-res_date'], name='sales_reserved_date_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from decimal import Decimal
 from django.db import models
+from django.utils import timezone
 from apps.store.models import Customer, Employee
 from apps.catalog.models import Product
 
@@ -41,6 +42,12 @@ class Order(models.Model):
     class Meta:
         verbose_name = "ອໍເດີ"
         verbose_name_plural = "ອໍເດີ"
+        indexes = [
+            # staff_slips: PENDING orders, newest first
+            models.Index(fields=["status", "-order_date"], name="sales_order_status_date_idx"),
+            # reports/exports/rollup rebuild by date range
+            models.Index(fields=["order_date"], name="sales_order_date_idx"),
+        ]
 
     def __str__(self):
         return f"Order #{self.id}"
@@ -77,6 +84,10 @@ class Bill(models.Model):
     class Meta:
         verbose_name = "ບິນ"
         verbose_name_plural = "ບິນ"
+        indexes = [
+            models.Index(fields=["status", "bill_date"], name="sales_bill_status_date_idx"),
+            models.Index(fields=["bill_date"], name="sales_bill_date_idx"),
+        ]
 
     def __str__(self):
         return f"Bill #{self.id} for {self.order}"
@@ -88,6 +99,12 @@ class Payment(models.Model):
         TRANSFER = "TRANSFER", "ໂອນ"
         QR = "QR", "QR"
 
+    class SlipStatus(models.TextChoices):
+        NONE = "NONE", "ບໍ່ມີສະລິບ"
+        UPLOADING = "UPLOADING", "ກຳລັງອັບໂຫຼດ"
+        READY = "READY", "ພ້ອມກວດ"
+        FAILED = "FAILED", "ອັບໂຫຼດບໍ່ສຳເລັດ"
+
     bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name="payments", verbose_name="ບິນ")
     employee = models.ForeignKey(
         Employee,
@@ -107,6 +124,20 @@ class Payment(models.Model):
         blank=True,
         help_text="ລິ້ງຮູບໂອນເງິນທີ່ລູກຄ້າອັບໂຫຼດ — ພະນັກງານກວດໃນໜ້າ Staff",
     )
+    slip_thumb_url = models.CharField(
+        "ລິ້ງຮູບສະລິບຂະໜາດນ້ອຍ",
+        max_length=500,
+        null=True,
+        blank=True,
+        help_text="ຮູບຫຍໍ້ສຳລັບລາຍການໃນໜ້າ Staff — ສ້າງອັດຕະໂນມັດ",
+    )
+    slip_status = models.CharField(
+        "ສະຖານະສະລິບ",
+        max_length=20,
+        choices=SlipStatus.choices,
+        default=SlipStatus.NONE,
+        help_text="ກຳລັງອັບໂຫຼດ = ລະບົບກຳລັງສົ່ງຮູບໄປບ່ອນເກັບ, ລິ້ງຈະຂຶ້ນເອງ",
+    )
 
     class Meta:
         verbose_name = "ການຊຳລະເງິນ"
@@ -116,6 +147,35 @@ class Payment(models.Model):
         return f"Payment #{self.id} for {self.bill}"
 
 
+class SlipUploadJob(models.Model):
+    """A slip spooled to local disk, waiting to be pushed to storage by
+    `manage.py process_slip_uploads` (see apps.sales.slip_uploads)."""
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "ລໍຖ້າ"
+        DONE = "DONE", "ສຳເລັດ"
+        FAILED = "FAILED", "ລົ້ມເຫຼວ"
+
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name="slip_job", verbose_name="ການຊຳລະ")
+    spool_path = models.CharField("ໄຟລ໌ຊົ່ວຄາວ", max_length=500)
+    object_path = models.CharField("ບ່ອນເກັບປາຍທາງ", max_length=300)
+    content_type = models.CharField("ປະເພດໄຟລ໌", max_length=100, default="image/jpeg")
+    status = models.CharField("ສະຖານະ", max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField("ຈຳນວນຄັ້ງທີ່ລອງ", default=0)
+    next_attempt_at = models.DateTimeField("ລອງຄັ້ງຕໍ່ໄປ", default=timezone.now)
+    last_error = models.TextField("ຂໍ້ຜິດພາດລ່າສຸດ", blank=True)
+    created_at = models.DateTimeField("ວັນທີສ້າງ", auto_now_add=True)
+    finished_at = models.DateTimeField("ວັນທີສຳເລັດ", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "ງານອັບໂຫຼດສະລິບ"
+        verbose_name_plural = "ງານອັບໂຫຼດສະລິບ"
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="sales_slipjob_due_idx")]
+
+    def __str__(self):
+        return f"Slip upload #{self.id} for {self.payment}"
+
+
 class Reserved(models.Model):
     class Status(models.TextChoices):
         RESERVED = "RESERVED", "ຈອງ"
@@ -152,6 +212,61 @@ class Reserved(models.Model):
     class Meta:
         verbose_name = "ການຈອງສິນຄ້າ"
         verbose_name_plural = "ການຈອງສິນຄ້າ"
+        indexes = [
+            # receive_stock_bulk(): reservations still waiting for stock,
+            # per product in allocation order (partial: done ones never match)
+            models.Index(
+                fields=["product", "res_date", "id"],
+                name="sales_reserved_waiting_idx",
+                condition=models.Q(status="RESERVED", stock_ready=False),
+            ),
+            # staff_reserved: newest first
+            models.Index(fields=["-res_date"], name="sales_reserved_date_idx"),
+        ]
 
     def __str__(self):
         return f"Reservation #{self.id} for {self.product.name}"
+
+
+class DailySalesRollup(models.Model):
+    """Running per-day sales totals kept by apps.sales.rollup so dashboards
+    never scan Order/Bill. A row with no product holds the order-level
+    figures (orders, paid orders, bill revenue); rows with a product hold
+    that product's units and revenue on paid bills. Rows for the same key
+    may repeat — always SUM."""
+
+    class Channel(models.TextChoices):
+        WEB = "WEB", "ເວັບ"
+        POS = "POS", "ໜ້າຮ້ານ (POS)"
+
+    day = models.DateField("ວັນທີ")
+    channel = models.CharField("ຊ່ອງທາງ", max_length=10, choices=Channel.choices)
+    employee = models.ForeignKey(
+        Employee,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="ພະນັກງານ",
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="ສິນຄ້າ",
+        help_text="ວ່າງ = ຍອດລວມລະດັບອໍເດີ",
+    )
+    orders = models.IntegerField("ອໍເດີ", default=0)
+    paid_orders = models.IntegerField("ອໍເດີທີ່ຊຳລະຄົບ", default=0)
+    units = models.IntegerField("ຈຳນວນຂາຍ", default=0)
+    revenue = models.DecimalField("ຍອດຂາຍ (ກີບ)", max_digits=14, decimal_places=2, default=Decimal("0.00"))
+
+    class Meta:
+        verbose_name = "ສະຫຼຸບຍອດຂາຍລາຍວັນ"
+        verbose_name_plural = "ສະຫຼຸບຍອດຂາຍລາຍວັນ"
+        indexes = [models.Index(fields=["day", "channel"], name="sales_rollup_day_idx")]
+
+    def __str__(self):
+        return f"{self.day} {self.channel}"
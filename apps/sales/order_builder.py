@@ -0,0 +1,118 @@
+"""Turn a priced cart into Order + OrderItem (+ Reserved) + Bill rows.
+
+Shared by web checkout (apps.store.views.store_checkout), POS "buy now"
+and POS reservations. Totals are computed once in Python and every line
+table is written with a single bulk_create, so an order costs the same
+four INSERTs whether it has one line or fifty (plus the fixed-size
+apps.sales.rollup bump) — the surrounding transaction (and any stock row
+locks it holds) stays short.
+
+Cart items are the line dicts from apps.store.cart_pricing.price_cart():
+``{"product", "qty", "unit_price", "line_total", ...}``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Callable
+
+from .models import Bill, Order, OrderItem, Reserved
+from .rollup import record_order, record_paid
+
+CENT = Decimal("0.01")
+
+
+@dataclass
+class BuiltOrder:
+    order: Order
+    bill: Bill
+    items: list[OrderItem] = field(default_factory=list)
+    reservations: list[Reserved] = field(default_factory=list)
+
+    @property
+    def total(self) -> Decimal:
+        return self.bill.total_amount
+
+
+def cart_total(cart_items) -> Decimal:
+    return sum((item["line_total"] for item in cart_items), Decimal("0"))
+
+
+def proportional_deposit(deposit: Decimal, total: Decimal) -> Callable[[Decimal], Decimal]:
+    """Split a deposit across lines by their share of the order total."""
+
+    def split(line_total: Decimal) -> Decimal:
+        return (deposit * line_total / total).quantize(CENT) if total > 0 else Decimal("0")
+
+    return split
+
+
+def rate_deposit(rate: Decimal) -> Callable[[Decimal], Decimal]:
+    """Each line's deposit is a fixed share of its own total."""
+
+    def split(line_total: Decimal) -> Decimal:
+        return (line_total * rate).quantize(CENT)
+
+    return split
+
+
+def build_order(
+    cart_items,
+    *,
+    status: str,
+    customer=None,
+    employee=None,
+    paid_amount: Decimal = Decimal("0"),
+    balance_due: Decimal | None = None,
+    bill_status: str = Bill.Status.PENDING,
+    reserve_until=None,
+    line_deposit: Callable[[Decimal], Decimal] | None = None,
+) -> BuiltOrder:
+    """Create the order rows for ``cart_items``. Call inside a transaction.
+
+    With ``reserve_until`` set every line also gets a Reserved row expiring
+    then; ``line_deposit(line_total)`` gives each line's deposit (default
+    nothing paid up front). ``balance_due`` defaults to total − paid."""
+    cart_items = list(cart_items)
+    total = cart_total(cart_items)
+
+    order = Order.objects.create(customer=customer, employee=employee, status=status)
+    items = OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=item["product"],
+            quantity=item["qty"],
+            price=item["unit_price"],
+            subtotal=item["line_total"],
+        )
+        for item in cart_items
+    ])
+
+    reservations = []
+    if reserve_until is not None:
+        deposits = [line_deposit(item["line_total"]) if line_deposit else Decimal("0") for item in cart_items]
+        reservations = Reserved.objects.bulk_create([
+            Reserved(
+                order=order,
+                product=item["product"],
+                quantity=item["qty"],
+                deposit_amount=deposit,
+                remain_amount=(item["line_total"] - deposit).quantize(CENT),
+                status=Reserved.Status.RESERVED,
+                expire_at=reserve_until,
+            )
+            for item, deposit in zip(cart_items, deposits)
+        ])
+
+    bill = Bill.objects.create(
+        order=order,
+        total_amount=total,
+        paid_amount=paid_amount,
+        balance_due=total - paid_amount if balance_due is None else balance_due,
+        status=bill_status,
+    )
+    record_order(order)
+    if bill_status == Bill.Status.PAID:
+        record_paid(bill, [(item.product_id, item.quantity, item.subtotal) for item in items])
+    return BuiltOrder(order=order, bill=bill, items=items, reservations=reservations)
@@ -0,0 +1,201 @@
+"""Daily sales rollup behind the staff and admin dashboards.
+
+DailySalesRollup keeps running totals per local day × channel (web/POS) ×
+employee, plus one row per product sold. The write paths bump it as they
+go:
+
+- record_order(order)        — build_order(), OrderAdmin; counts the order
+                               on its order_date day;
+- record_paid(bill)          — build_order() for POS sales, and
+  record_bill_change()       — every place a bill moves in or out of PAID
+                               (slip approval, reservation pickup, web
+                               payment, BillAdmin); revenue lands on the
+                               bill_date day, like the old dashboard.
+
+A bump is three statements at most whatever the number of lines (select
+the rows, one UPDATE with ``F() + delta``, one INSERT for new keys), and
+runs inside the caller's transaction so a rolled-back checkout leaves no
+trace. Two first sales racing on the same key can create twin rows —
+readers always SUM, and `manage.py rebuild_sales_rollup` folds them back
+together (and repairs anything edited outside these paths, e.g. deleted
+orders).
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Bill, DailySalesRollup, Order, OrderItem
+
+Channel = DailySalesRollup.Channel
+FIELDS = ("orders", "paid_orders", "units", "revenue")
+
+
+def channel_of(order) -> str:
+    # Web orders always carry the customer; the POS never does
+    return Channel.WEB if order.customer_id else Channel.POS
+
+
+def _bump(day: date, channel: str, employee_id, deltas: dict) -> None:
+    """Add ``deltas`` ({product id or None: {field: delta}}) to the rows
+    for (day, channel, employee)."""
+    deltas = {pid: d for pid, d in deltas.items() if any(d.values())}
+    if not deltas:
+        return
+    products = Q(product_id__in=[pid for pid in deltas if pid is not None])
+    if None in deltas:
+        products |= Q(product__isnull=True)
+    existing = {
+        row.product_id: row
+        for row in DailySalesRollup.objects.filter(products, day=day, channel=channel, employee_id=employee_id)
+    }
+    changed, fields, new = [], set(), []
+    for pid, delta in deltas.items():
+        row = existing.get(pid)
+        if row is None:
+            new.append(DailySalesRollup(day=day, channel=channel, employee_id=employee_id, product_id=pid, **delta))
+            continue
+        for name, value in delta.items():
+            if value:
+                setattr(row, name, F(name) + value)
+                fields.add(name)
+        changed.append(row)
+    if changed:
+        DailySalesRollup.objects.bulk_update(changed, sorted(fields))
+    if new:
+        DailySalesRollup.objects.bulk_create(new)
+
+
+def record_order(order: Order, sign: int = 1) -> None:
+    _bump(
+        timezone.localdate(order.order_date),
+        channel_of(order),
+        order.employee_id,
+        {None: {"orders": sign}},
+    )
+
+
+def record_paid(bill: Bill, lines=None, sign: int = 1) -> None:
+    """Count ``bill`` as paid (``sign=-1`` takes it back). ``lines`` are
+    (product id, qty, subtotal); read from the order when not given."""
+    order = bill.order
+    if lines is None:
+        lines = (
+            OrderItem.objects.filter(order_id=order.id)
+            .values_list("product_id")
+            .annotate(Sum("quantity"), Sum("subtotal"))
+        )
+    deltas = {None: {"paid_orders": sign, "revenue": sign * bill.total_amount}}
+    for product_id, qty, subtotal in lines:
+        delta = deltas.setdefault(product_id, {"units": 0, "revenue": Decimal("0")})
+        delta["units"] += sign * qty
+        delta["revenue"] += sign * subtotal
+    _bump(timezone.localdate(bill.bill_date), channel_of(order), order.employee_id, deltas)
+
+
+def record_bill_change(bill: Bill, old_status: str, old_total: Decimal | None = None) -> None:
+    """Call after saving ``bill`` whose status/total were ``old_*``."""
+    was_paid = old_status == Bill.Status.PAID
+    is_paid = bill.status == Bill.Status.PAID
+    if was_paid != is_paid:
+        record_paid(bill, sign=1 if is_paid else -1)
+    elif is_paid and old_total is not None and old_total != bill.total_amount:
+        order = bill.order
+        _bump(
+            timezone.localdate(bill.bill_date),
+            channel_of(order),
+            order.employee_id,
+            {None: {"revenue": bill.total_amount - old_total}},
+        )
+
+
+def today_totals() -> dict:
+    """{"orders", "revenue"} for today, every channel — one indexed query."""
+    totals = DailySalesRollup.objects.filter(day=timezone.localdate(), product__isnull=True).aggregate(
+        orders=Sum("orders"), revenue=Sum("revenue"),
+    )
+    return {"orders": totals["orders"] or 0, "revenue": totals["revenue"] or Decimal("0")}
+
+
+def _channel(customer_field: str):
+    return Case(
+        When(**{f"{customer_field}__isnull": False}, then=Value(Channel.WEB)),
+        default=Value(Channel.POS),
+    )
+
+
+def _between(field: str, start: date | None, end: date | None) -> Q:
+    """``field`` (a datetime) within local days start..end inclusive."""
+    q = Q()
+    tz = timezone.get_current_timezone()
+    if start:
+        q &= Q(**{f"{field}__gte": datetime.combine(start, time.min, tzinfo=tz)})
+    if end:
+        q &= Q(**{f"{field}__lt": datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz)})
+    return q
+
+
+def rebuild(start: date | None = None, end: date | None = None) -> int:
+    """Recompute the rollup for local days start..end (None = open ended)
+    from Order/Bill/OrderItem. Returns the number of rows written."""
+    rows: dict[tuple, dict] = {}
+
+    def add(key, values):
+        row = rows.setdefault(key, dict.fromkeys(FIELDS, 0))
+        for name, value in values.items():
+            row[name] += value or 0
+
+    orders = (
+        Order.objects.filter(_between("order_date", start, end))
+        .annotate(day=TruncDate("order_date"), channel=_channel("customer"))
+        .values("day", "channel", "employee_id")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    for r in orders:
+        add((r["day"], r["channel"], r["employee_id"], None), {"orders": r["n"]})
+
+    bills = (
+        Bill.objects.filter(_between("bill_date", start, end), status=Bill.Status.PAID)
+        .annotate(day=TruncDate("bill_date"), channel=_channel("order__customer"))
+        .values("day", "channel", "order__employee_id")
+        .annotate(n=Count("id"), total=Sum("total_amount"))
+        .order_by()
+    )
+    for r in bills:
+        add((r["day"], r["channel"], r["order__employee_id"], None), {"paid_orders": r["n"], "revenue": r["total"]})
+
+    items = (
+        OrderItem.objects.filter(_between("order__bill__bill_date", start, end), order__bill__status=Bill.Status.PAID)
+        .annotate(day=TruncDate("order__bill__bill_date"), channel=_channel("order__customer"))
+        .values("day", "channel", "order__employee_id", "product_id")
+        .annotate(qty=Sum("quantity"), total=Sum("subtotal"))
+        .order_by()
+    )
+    for r in items:
+        add(
+            (r["day"], r["channel"], r["order__employee_id"], r["product_id"]),
+            {"units": r["qty"], "revenue": r["total"]},
+        )
+
+    with transaction.atomic():
+        stale = DailySalesRollup.objects.all()
+        if start:
+            stale = stale.filter(day__gte=start)
+        if end:
+            stale = stale.filter(day__lte=end)
+        stale.delete()
+        DailySalesRollup.objects.bulk_create(
+            [
+                DailySalesRollup(day=day, channel=channel, employee_id=employee_id, product_id=product_id, **values)
+                for (day, channel, employee_id, product_id), values in rows.items()
+            ],
+            batch_size=1000,
+        )
+    return len(rows)
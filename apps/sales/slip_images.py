@@ -0,0 +1,79 @@
+"""Shrink payment-slip photos before they reach storage.
+
+Customers upload raw phone photos (often 3–8 MB) but staff only need to
+read a bank-app screenshot. process_slip() turns one upload into:
+
+- a full-size variant: rotated upright per EXIF, EXIF/GPS stripped,
+  longest side capped at SLIP_MAX_DIMENSION, re-encoded as WebP (JPEG if
+  Pillow lacks WebP) at SLIP_IMAGE_QUALITY;
+- a thumbnail for the staff slip list (SLIP_THUMB_DIMENSION).
+
+Runs in the slip upload worker (apps.sales.slip_uploads), never in the
+request.
+"""
+
+from __future__ import annotations
+
+import io
+from dataclasses import dataclass
+
+from django.conf import settings
+
+
+class SlipImageError(Exception):
+    """The upload is not an image Pillow can read."""
+
+
+@dataclass
+class SlipVariant:
+    data: bytes
+    content_type: str
+    ext: str
+
+
+def output_format() -> tuple[str, str, str]:
+    """(Pillow format, content type, extension) for processed slips."""
+    from PIL import features
+
+    wanted = getattr(settings, "SLIP_IMAGE_FORMAT", "WEBP").upper()
+    if wanted == "WEBP" and features.check("webp"):
+        return "WEBP", "image/webp", "webp"
+    return "JPEG", "image/jpeg", "jpg"
+
+
+def _encode(image, max_side: int, quality: int) -> SlipVariant:
+    fmt, content_type, ext = output_format()
+    image = image.copy()
+    image.thumbnail((max_side, max_side))
+    out = io.BytesIO()
+    # No exif= argument: the re-encoded file carries no metadata
+    options = {"quality": quality, "method": 4} if fmt == "WEBP" else {"quality": quality, "optimize": True, "progressive": True}
+    image.save(out, fmt, **options)
+    return SlipVariant(out.getvalue(), content_type, ext)
+
+
+def process_slip(data: bytes) -> tuple[SlipVariant, SlipVariant]:
+    """Return (full, thumbnail) variants of an uploaded slip."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            source.load()
+            image = ImageOps.exif_transpose(source)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as exc:
+        raise SlipImageError(str(exc)) from exc
+
+    if image.mode not in ("RGB", "L"):
+        # Screenshots are often RGBA/P; flatten onto white for JPEG/WebP
+        background = Image.new("RGB", image.size, "white")
+        rgba = image.convert("RGBA")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+
+    full = _encode(
+        image,
+        getattr(settings, "SLIP_MAX_DIMENSION", 1600),
+        getattr(settings, "SLIP_IMAGE_QUALITY", 80),
+    )
+    thumb = _encode(image, getattr(settings, "SLIP_THUMB_DIMENSION", 320), 70)
+    return full, thumb
@@ -0,0 +1,178 @@
+"""Payment slips are pushed to storage off the request thread.
+
+store_confirm_payment creates the Payment straight away with
+slip_status=UPLOADING and queues a SlipUploadJob in the same transaction;
+the image is written to a local spool directory once that commits. `manage.py process_slip_uploads`
+(started next to gunicorn by scripts/render_start.sh) picks due jobs,
+shrinks the image (apps.sales.slip_images), uploads it with a thumbnail,
+fills in Payment.slip_url / slip_thumb_url and marks the slip READY.
+
+- Object paths are derived from the payment id, and storage is written
+  with upsert, so a retry after a half-finished attempt overwrites the
+  same object instead of leaving duplicates.
+- Failures are retried with exponential backoff up to
+  SLIP_UPLOAD_MAX_ATTEMPTS, then the payment is marked FAILED for staff.
+- A claimed job is leased (next_attempt_at pushed forward) so two workers
+  never upload the same slip at once.
+- Unexpected errors (database, network errors urlopen does not wrap) are
+  retried like failed uploads; the worker loop logs and backs off instead
+  of exiting, since nothing restarts it.
+"""
+
+from __future__ import annotations
+
+import logging
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.store.slip_storage import SlipUploadError, put_slip_object, slip_extension
+
+from .models import Payment, SlipUploadJob
+from .slip_images import SlipImageError, SlipVariant, process_slip
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed job is hidden from other workers while it uploads
+LEASE = timedelta(minutes=5)
+
+
+def spool_dir() -> Path:
+    path = Path(getattr(settings, "SLIP_SPOOL_DIR", Path(settings.BASE_DIR) / "var" / "slip_spool"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def enqueue_slip(payment: Payment, uploaded_file) -> SlipUploadJob:
+    """Queue ``uploaded_file`` for ``payment``. Call inside the transaction
+    that created the payment.
+
+    The file is only spooled once that transaction commits, so a
+    rolled-back submit leaves nothing on disk, and the job only becomes
+    due once the file is written. Should the process die in between, the
+    job comes due after LEASE, finds no file and marks the slip FAILED."""
+    ext = slip_extension(uploaded_file.name)
+    spool_path = spool_dir() / f"{uuid.uuid4().hex}.{ext}"
+
+    payment.slip_status = Payment.SlipStatus.UPLOADING
+    payment.save(update_fields=["slip_status"])
+    job = SlipUploadJob.objects.create(
+        payment=payment,
+        spool_path=str(spool_path),
+        object_path=f"order_{payment.bill.order_id}/payment_{payment.id}.{ext}",
+        content_type=getattr(uploaded_file, "content_type", None) or "image/jpeg",
+        next_attempt_at=timezone.now() + LEASE,
+    )
+    # Read now: the upload may be closed by the time an outer transaction commits
+    data = b"".join(uploaded_file.chunks())
+    transaction.on_commit(lambda: _spool(job.pk, data, spool_path))
+    return job
+
+
+def _spool(job_id: int, data: bytes, spool_path: Path) -> None:
+    try:
+        spool_path.write_bytes(data)
+    except OSError:
+        # The payment is already committed; the job fails visibly after LEASE
+        logger.exception("slip upload #%s: could not spool %s", job_id, spool_path)
+        return
+    SlipUploadJob.objects.filter(pk=job_id).update(next_attempt_at=timezone.now())
+
+
+def retry_delay(attempts: int) -> timedelta:
+    base = getattr(settings, "SLIP_UPLOAD_RETRY_BASE", 5)
+    cap = getattr(settings, "SLIP_UPLOAD_RETRY_MAX", 900)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+
+def claim_due_jobs(limit: int = 10) -> list[SlipUploadJob]:
+    now = timezone.now()
+    with transaction.atomic():
+        due = SlipUploadJob.objects.filter(status=SlipUploadJob.Status.PENDING, next_attempt_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        jobs = list(due.order_by("next_attempt_at", "id")[:limit])
+        if jobs:
+            SlipUploadJob.objects.filter(id__in=[job.id for job in jobs]).update(next_attempt_at=now + LEASE)
+    return jobs
+
+
+def _fail(job: SlipUploadJob, error: str, *, permanent: bool) -> None:
+    job.attempts += 1
+    job.last_error = error[:2000]
+    max_attempts = getattr(settings, "SLIP_UPLOAD_MAX_ATTEMPTS", 8)
+    if permanent or job.attempts >= max_attempts:
+        job.status = SlipUploadJob.Status.FAILED
+        job.finished_at = timezone.now()
+        with transaction.atomic():
+            job.save(update_fields=["attempts", "last_error", "status", "finished_at"])
+            Payment.objects.filter(pk=job.payment_id).update(slip_status=Payment.SlipStatus.FAILED)
+        logger.error("slip upload #%s gave up after %s attempt(s): %s", job.id, job.attempts, error)
+        return
+    job.next_attempt_at = timezone.now() + retry_delay(job.attempts)
+    job.save(update_fields=["attempts", "last_error", "next_attempt_at"])
+    logger.warning("slip upload #%s failed (attempt %s), retrying: %s", job.id, job.attempts, error)
+
+
+def run_job(job: SlipUploadJob) -> bool:
+    """Upload one claimed job. Returns True when the slip is now READY.
+
+    Any unexpected error (database, a network error urlopen does not wrap)
+    is retried with backoff like a failed upload."""
+    try:
+        return _upload(job)
+    except Exception as exc:
+        logger.exception("slip upload #%s: unexpected error", job.id)
+        _fail(job, f"{type(exc).__name__}: {exc}", permanent=False)
+        return False
+
+
+def _upload(job: SlipUploadJob) -> bool:
+    try:
+        data = Path(job.spool_path).read_bytes()
+    except FileNotFoundError:
+        _fail(job, f"spool file missing: {job.spool_path}", permanent=True)
+        return False
+    try:
+        full, thumb = process_slip(data)
+    except SlipImageError as exc:
+        # Not something Pillow can read (e.g. HEIC) — keep the original
+        logger.warning("slip upload #%s: storing original, could not process image: %s", job.id, exc)
+        full, thumb = SlipVariant(data, job.content_type, ""), None
+
+    stem = job.object_path.rsplit(".", 1)[0]
+    try:
+        url = put_slip_object(full.data, f"{stem}.{full.ext}" if full.ext else job.object_path, full.content_type)
+        thumb_url = put_slip_object(thumb.data, f"{stem}_thumb.{thumb.ext}", thumb.content_type) if thumb else None
+    except SlipUploadError as exc:
+        _fail(job, str(exc), permanent=False)
+        return False
+
+    with transaction.atomic():
+        Payment.objects.filter(pk=job.payment_id).update(
+            slip_url=url, slip_thumb_url=thumb_url, slip_status=Payment.SlipStatus.READY,
+        )
+        job.attempts += 1
+        job.status = SlipUploadJob.Status.DONE
+        job.finished_at = timezone.now()
+        job.last_error = ""
+        job.save(update_fields=["attempts", "status", "finished_at", "last_error"])
+    Path(job.spool_path).unlink(missing_ok=True)
+    return True
+
+
+def process_due_jobs(limit: int = 10) -> int:
+    """Run every job that is due now (up to ``limit``); returns how many ran."""
+    jobs = claim_due_jobs(limit)
+    for job in jobs:
+        try:
+            run_job(job)
+        except Exception:
+            # Could not even record the failure; the lease runs out and
+            # the job is claimed again
+            logger.exception("slip upload #%s: could not record the outcome", job.id)
+    return len(jobs)
@@ -1,27 +1,21 @@
-from django.utils.timezone import now
-from django.db.models import Sum
-from .models import Order, Bill
+from .models import Order
+from .rollup import today_totals
 from apps.catalog.models import Product
 
 def get_staff_dashboard_stats():
-    today = now().date()
-    
-    # 1. Total sales today
-    today_bills = Bill.objects.filter(bill_date__date=today, status="PAID")
-    total_sales = today_bills.aggregate(Sum("total_amount"))["total_amount__sum"] or 0
-    
-    # 2. Total orders today
-    total_orders = Order.objects.filter(order_date__date=today).count()
+    # 1+2. Sales and orders today — from the daily rollup, not a scan of
+    # Order/Bill (see apps.sales.rollup)
+    today = today_totals()
     
     # 3. Active products
     active_products = Product.objects.filter(is_active=True).count()
     
-    # 4. Recent orders
-    recent_orders = Order.objects.select_related("employee", "customer").order_by("-order_date")[:5]
+    # 4. Recent orders (newest id = newest order; walks the primary key)
+    recent_orders = Order.objects.select_related("employee", "customer", "bill").order_by("-id")[:5]
 
     return {
-        "stat_today_sales": int(total_sales),
-        "stat_today_orders": total_orders,
+        "stat_today_sales": int(today["revenue"]),
+        "stat_today_orders": today["orders"],
         "stat_active_products": active_products,
         "recent_orders": recent_orders,
     }
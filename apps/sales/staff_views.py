@@ -3,6 +3,31 @@ from django.shortcuts import redirect, render
 from django.urls import reverse
 from urllib.parse import urlencode
 
+from config.metrics import SLIPS
+from config.query_budget import query_budget
+
+
+def _slip_payments_prefetch(lookup):
+    """Prefetch of a bill's slip payments, newest first, into
+    ``bill.slip_payments`` — templates read ``.slip_payments.0`` instead of
+    ``payments.first`` (which always re-queries)."""
+    from django.db.models import Prefetch
+    from .models import Payment
+
+    slips = Payment.objects.filter(_has_slip()).order_by("-pay_date", "-id")
+    return Prefetch(lookup, queryset=slips, to_attr="slip_payments")
+
+
+def _has_slip(prefix=""):
+    """Payments that carry a slip: uploaded (slip_url set) or still being
+    pushed to storage / failed to upload (see apps.sales.slip_uploads)."""
+    from django.db.models import Q
+    from .models import Payment
+
+    return Q(**{f"{prefix}slip_status__in": [Payment.SlipStatus.UPLOADING, Payment.SlipStatus.FAILED]}) | (
+        Q(**{f"{prefix}slip_url__isnull": False}) & ~Q(**{f"{prefix}slip_url": ""})
+    )
+
 
 def staff_login(request):
     """Redirect to admin login since store_login is removed."""
@@ -12,6 +37,7 @@ def staff_login(request):
 
 
 @login_required(login_url="/admin/login/")
+@query_budget(10)
 def staff_dashboard(request):
     from django.contrib.auth import logout
 
@@ -34,16 +60,20 @@ def staff_logout(request):
     return redirect("/pos/")
 
 @login_required(login_url="/admin/login/")
+@query_budget(8)
 def staff_slips(request):
     from .models import Order
     if not request.user.is_staff and not hasattr(request.user, "employee_profile"):
         return redirect("/admin/login/")
         
-    # Get orders that are PENDING and have a bill with a payment that has a slip_url
-    pending_orders = Order.objects.filter(
-        status="PENDING",
-        bill__payments__slip_url__isnull=False
-    ).exclude(bill__payments__slip_url="").distinct().order_by("-order_date")
+    # Get orders that are PENDING and have a bill with a payment that has a slip
+    pending_orders = (
+        Order.objects.filter(_has_slip("bill__payments__"), status="PENDING")
+        .distinct()
+        .select_related("customer", "bill")
+        .prefetch_related(_slip_payments_prefetch("bill__payments"))
+        .order_by("-order_date")
+    )
     
     return render(request, "staff/slips.html", {
         "staff_section": "slips",
@@ -54,39 +84,60 @@ def staff_slips(request):
 def verify_slip(request, order_id):
     from decimal import Decimal
     from .models import Order, Bill
+    from .rollup import record_bill_change
     from django.contrib import messages
     
     if not request.user.is_staff and not hasattr(request.user, "employee_profile"):
         return redirect("/admin/login/")
         
     if request.method == "POST":
-        order = Order.objects.get(id=order_id)
+        from django.db import transaction
+        from apps.catalog.stock import InsufficientStock, take_stock
+
         action = request.POST.get("action")
-        
-        if action == "approve":
-            order.status = Order.Status.COMPLETED
-            order.save()
-            if hasattr(order, "bill"):
-                bill = order.bill
-                bill.status = Bill.Status.PAID
-                bill.paid_amount = bill.total_amount
-                bill.balance_due = Decimal("0")
-                bill.save()
-
-            from apps.catalog.stock import deduct_stock
-            for item in order.items.all():
-                deduct_stock(item.product_id, item.quantity)
-
-            messages.success(request, f"ອະນຸມັດອໍເດີ #{order.id} ແລ້ວ — ຕັດສະຕັອກ ແລະ ໝາຍວ່າຊຳລະຄົບ")
-        elif action == "reject":
-            order.status = Order.Status.CANCELLED
-            order.save()
-            messages.warning(request, f"ປະຕິເສດສະລິບອໍເດີ #{order.id} ແລ້ວ")
+        with transaction.atomic():
+            # Row lock + status check: a double click or two staff approving
+            # the same slip must not deduct stock twice.
+            order = Order.objects.select_for_update().get(id=order_id)
+            if order.status != Order.Status.PENDING:
+                messages.info(request, f"ອໍເດີ #{order.id} ຖືກດຳເນີນການແລ້ວ")
+                return redirect("staff_slips")
+
+            if action == "approve":
+                items = list(order.items.select_related("product"))
+                try:
+                    take_stock([(item.product_id, item.quantity) for item in items])
+                except InsufficientStock as exc:
+                    short_ids = {line.product_id for line in exc.short}
+                    names = ", ".join(i.product.name for i in items if i.product_id in short_ids)
+                    messages.error(request, f"ອະນຸມັດບໍ່ໄດ້ — ສິນຄ້າບໍ່ພຽງພໍ: {names}")
+                    SLIPS.inc(event="short_stock")
+                    return redirect("staff_slips")
+
+                order.status = Order.Status.COMPLETED
+                order.save()
+                if hasattr(order, "bill"):
+                    bill = order.bill
+                    old_status = bill.status
+                    bill.status = Bill.Status.PAID
+                    bill.paid_amount = bill.total_amount
+                    bill.balance_due = Decimal("0")
+                    bill.save()
+                    record_bill_change(bill, old_status)
+
+                SLIPS.inc(event="approved")
+                messages.success(request, f"ອະນຸມັດອໍເດີ #{order.id} ແລ້ວ — ຕັດສະຕັອກ ແລະ ໝາຍວ່າຊຳລະຄົບ")
+            elif action == "reject":
+                order.status = Order.Status.CANCELLED
+                order.save()
+                SLIPS.inc(event="rejected")
+                messages.warning(request, f"ປະຕິເສດສະລິບອໍເດີ #{order.id} ແລ້ວ")
             
     return redirect("staff_slips")
 
 
 @login_required(login_url="/admin/login/")
+@query_budget(8)
 def staff_inventory(request):
     """Read-only stock view for staff — they can see quantities but all
     editing (adding new stock batches, correcting numbers) stays in the
@@ -112,6 +163,7 @@ def staff_inventory(request):
 
 
 @login_required(login_url="/admin/login/")
+@query_budget(8)
 def staff_reserved(request):
     from django.utils import timezone
     from .models import Reserved
@@ -120,7 +172,10 @@ def staff_reserved(request):
         return redirect("/admin/login/")
 
     reservations = (
-        Reserved.objects.select_related("order", "product", "order__customer", "order__employee")
+        Reserved.objects.select_related(
+            "order", "product", "order__customer", "order__employee", "order__bill",
+        )
+        .prefetch_related(_slip_payments_prefetch("order__bill__payments"))
         .order_by("-res_date")
     )
     return render(request, "staff/reserved.html", {
@@ -136,48 +191,91 @@ def staff_reserved_action(request, reserved_id):
     from django.shortcuts import get_object_or_404
     from django.contrib import messages
     from .models import Reserved, Order, Bill
+    from .rollup import record_bill_change
 
     if not request.user.is_staff and not hasattr(request.user, "employee_profile"):
         return redirect("/admin/login/")
 
-    reserved = get_object_or_404(Reserved, id=reserved_id)
-
     if request.method == "POST":
+        from django.db import transaction
+
         action = request.POST.get("action")
-        order = reserved.order
+        with transaction.atomic():
+            reserved = get_object_or_404(Reserved.objects.select_for_update(), id=reserved_id)
+            if reserved.status != Reserved.Status.RESERVED:
+                messages.info(request, f"ຈອງ #{reserved.id} ຖືກດຳເນີນການແລ້ວ")
+                return redirect("staff_reserved")
+            order = reserved.order
+
+            if action == "complete":
+                reserved.status = Reserved.Status.COMPLETED
+                reserved.remain_amount = Decimal("0")
+                reserved.save()
+
+                from apps.catalog.stock import consume_allocated_stock, take_stock
+                if reserved.stock_ready:
+                    consume_allocated_stock(reserved.product_id, reserved.quantity)
+                else:
+                    line = take_stock([(reserved.product_id, reserved.quantity)], strict=False)[0]
+                    if line.shortfall:
+                        messages.warning(
+                            request,
+                            f"ສະຕັອກໃນລະບົບບໍ່ພໍ {line.shortfall} ຊິ້ນ — ກະລຸນາກວດ ແລະ ເພີ່ມສະຕັອກໃນ Admin",
+                        )
+
+                if not order.reservations.exclude(status=Reserved.Status.COMPLETED).exists():
+                    order.status = Order.Status.COMPLETED
+                    order.save()
+                    if hasattr(order, "bill"):
+                        bill = order.bill
+                        old_status = bill.status
+                        bill.paid_amount = bill.total_amount
+                        bill.balance_due = Decimal("0")
+                        bill.status = Bill.Status.PAID
+                        bill.save()
+                        record_bill_change(bill, old_status)
+                messages.success(request, f"ຈອງ #{reserved.id} ສຳເລັດແລ້ວ — ລູກຄ້າຮັບເຄື່ອງ ແລະ ຊຳລະຄົບ")
+
+            elif action == "cancel":
+                reserved.status = Reserved.Status.CANCELLED
+                if reserved.stock_ready:
+                    from apps.catalog.stock import release_stock
+                    release_stock(reserved.product_id, reserved.quantity)
+                    reserved.stock_ready = False
+                reserved.save()
+                if not order.reservations.exclude(status=Reserved.Status.CANCELLED).exists():
+                    order.status = Order.Status.CANCELLED
+                    order.save()
+                messages.warning(request, f"ຍົກເລີກການຈອງ #{reserved.id}")
 
-        if action == "complete":
-            reserved.status = Reserved.Status.COMPLETED
-            reserved.remain_amount = Decimal("0")
-            reserved.save()
+    return redirect("staff_reserved")
 
-            from apps.catalog.stock import deduct_stock, consume_allocated_stock
-            if reserved.stock_ready:
-                consume_allocated_stock(reserved.product_id, reserved.quantity)
-            else:
-                deduct_stock(reserved.product_id, reserved.quantity)
 
-            if not order.reservations.exclude(status=Reserved.Status.COMPLETED).exists():
-                order.status = Order.Status.COMPLETED
-                order.save()
-                if hasattr(order, "bill"):
-                    bill = order.bill
-                    bill.paid_amount = bill.total_amount
-                    bill.balance_due = Decimal("0")
-                    bill.status = Bill.Status.PAID
-                    bill.save()
-            messages.success(request, f"ຈອງ #{reserved.id} ສຳເລັດແລ້ວ — ລູກຄ້າຮັບເຄື່ອງ ແລະ ຊຳລະຄົບ")
-
-        elif action == "cancel":
-            reserved.status = Reserved.Status.CANCELLED
-            if reserved.stock_ready:
-                from apps.catalog.stock import release_stock
-                release_stock(reserved.product_id, reserved.quantity)
-                reserved.stock_ready = False
-            reserved.save()
-            if not order.reservations.exclude(status=Reserved.Status.CANCELLED).exists():
-                order.status = Order.Status.CANCELLED
-                order.save()
-            messages.warning(request, f"ຍົກເລີກການຈອງ #{reserved.id}")
+@login_required(login_url="/admin/login/")
+@query_budget(12)
+def staff_reports(request):
+    """Sales report for any date range; ``?format=csv`` streams the
+    bucketed series instead (see apps.sales.analytics)."""
+    from .analytics import PAGE_MAX_BUCKETS, csv_response, series, summary, top_products
+    from .forms import ReportForm
 
-    return redirect("staff_reserved")
+    if not request.user.is_staff and not hasattr(request.user, "employee_profile"):
+        return redirect("/admin/login/")
+
+    form = ReportForm(request.GET)
+    context = {"staff_section": "reports", "form": form}
+    if form.is_valid():
+        rng = form.report_range()
+        if request.GET.get("format") == "csv":
+            return csv_response(rng)
+        context.update({
+            "range": rng,
+            "summary": summary(rng),
+            "top_products": top_products(rng),
+            "csv_query": urlencode({**request.GET.dict(), "format": "csv"}),
+        })
+        if rng.bucket_count <= PAGE_MAX_BUCKETS:
+            context["series"] = list(series(rng))
+        else:
+            context["series_too_long"] = PAGE_MAX_BUCKETS
+    return render(request, "staff/reports.html", context)
@@ -1,3 +1,548 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.catalog.models import Category, Product
+from apps.store.models import Customer
+from config.query_budget import QueryBudgetTestMixin
+
+from .models import Bill, Order, OrderItem, Payment, Reserved
+
+
+class StaffListQueryTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.staff = User.objects.create_user("staff", "staff@example.com", "pw", is_staff=True)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+        self.client.force_login(self.staff)
+        self.product = Product.objects.create(
+            category=Category.objects.create(name="Matcha"), name="Ceremonial", price=100,
+        )
+        self.customer_user = User.objects.create_user("cus", "cus@example.com", "pw")
+        self.customer = Customer.objects.create(
+            user=self.customer_user, cus_name="Noy", cus_last="", address="", cus_tel="020",
+        )
+
+    def _add_orders(self, n, reserve=False):
+        for _ in range(n):
+            order = Order.objects.create(
+                customer=self.customer,
+                status=Order.Status.RESERVED if reserve else Order.Status.PENDING,
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=1, price=100, subtotal=100)
+            bill = Bill.objects.create(order=order, total_amount=100, balance_due=100)
+            Payment.objects.create(bill=bill, pay_amount=Decimal("100"), slip_url="https://x/slip.jpg")
+            Payment.objects.create(bill=bill, pay_amount=Decimal("0"), slip_url="https://x/new.jpg")
+            if reserve:
+                Reserved.objects.create(
+                    order=order, product=self.product, quantity=1,
+                    expire_at=timezone.now() + timedelta(days=3),
+                )
+
+    def test_slips_queries_constant(self):
+        self.assertConstantQueries(lambda: self.client.get(reverse("staff_slips")), self._add_orders)
+
+    def test_slips_shows_latest_slip(self):
+        self._add_orders(1)
+        response = self.client.get(reverse("staff_slips"))
+        self.assertContains(response, "https://x/new.jpg")
+
+    def test_reserved_queries_constant(self):
+        self.assertConstantQueries(
+            lambda: self.client.get(reverse("staff_reserved")),
+            lambda n: self._add_orders(n, reserve=True),
+        )
+
+    def test_dashboard_within_budget(self):
+        self._add_orders(5)
+        with self.assertQueryBudget(10):
+            self.client.get(reverse("staff_dashboard"))
+
+    def test_account_orders_queries_constant(self):
+        customer_client = Client(HTTP_HOST="127.0.0.1")
+        customer_client.force_login(self.customer_user)
+        self.assertConstantQueries(
+            lambda: customer_client.get(reverse("store_account_orders")), self._add_orders,
+        )
+
+    def test_declared_budgets_hold(self):
+        self._add_orders(5, reserve=True)
+        with self.settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_RAISE=True):
+            for name in ("staff_dashboard", "staff_slips", "staff_reserved", "staff_inventory", "pos"):
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200, name)
+
+
+class OrderBuilderTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Matcha")
+        self.products = [
+            Product.objects.create(category=category, name=f"P{i}", price=100, stock_qty=5) for i in range(12)
+        ]
+        self.staff = get_user_model().objects.create_user("till", "till@example.com", "pw", is_staff=True)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+        self.client.force_login(self.staff)
+
+    def _cart(self, n, qty=1):
+        return [
+            {"product": p, "qty": qty, "unit_price": p.price, "line_total": p.price * qty}
+            for p in self.products[:n]
+        ]
+
+    def test_queries_independent_of_line_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .order_builder import build_order
+
+        expire = timezone.now() + timedelta(days=3)
+        counts = []
+        for n in (1, 12):
+            with CaptureQueriesContext(connection) as ctx:
+                build_order(self._cart(n), status=Order.Status.RESERVED, reserve_until=expire)
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_reservation_deposits_and_bill(self):
+        from .order_builder import build_order, proportional_deposit
+
+        built = build_order(
+            self._cart(2, qty=2),
+            status=Order.Status.RESERVED,
+            paid_amount=Decimal("100"),
+            reserve_until=timezone.now() + timedelta(days=3),
+            line_deposit=proportional_deposit(Decimal("100"), Decimal("400")),
+        )
+        self.assertEqual(built.bill.total_amount, Decimal("400"))
+        self.assertEqual(built.bill.balance_due, Decimal("300"))
+        self.assertEqual(
+            sorted((r.deposit_amount, r.remain_amount) for r in built.order.reservations.all()),
+            [(Decimal("50"), Decimal("150"))] * 2,
+        )
+
+    def _fill_pos_cart(self, lines):
+        self.client.get(reverse("clear_cart"))
+        for product, qty in lines:
+            for _ in range(qty):
+                self.client.get(reverse("add_to_cart", args=[product.id]))
+
+    def test_pos_checkout_rolls_back_when_short(self):
+        self._fill_pos_cart([(self.products[0], 2), (self.products[1], 9)])
+        self.client.post(reverse("pos_checkout"))
+        self.assertFalse(Order.objects.exists())
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock_qty, 5)
+
+        self._fill_pos_cart([(self.products[0], 2), (self.products[1], 5)])
+        self.client.post(reverse("pos_checkout"))
+        order = Order.objects.get()
+        self.assertEqual(order.status, Order.Status.COMPLETED)
+        self.assertEqual(order.bill.status, Bill.Status.PAID)
+        self.assertEqual(order.items.count(), 2)
+
+
+class FakeSlipStorage:
+    """Minimal stand-in for the Supabase Storage upload endpoint, served
+    from a thread on localhost. ``fail_next`` makes the next N uploads 503."""
+
+    def __init__(self):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        storage = self
+        self.objects = {}
+        self.requests = 0
+        self.fail_next = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                storage.requests += 1
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if storage.fail_next:
+                    storage.fail_next -= 1
+                    self.send_response(503)
+                else:
+                    storage.objects[self.path.split("/storage/v1/object/", 1)[1]] = body
+                    self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SlipUploadPipelineTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        self.storage = FakeSlipStorage()
+        self.addCleanup(self.storage.close)
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.spool_dir = spool.name
+        overrides = self.settings(
+            SUPABASE_URL=self.storage.url, SUPABASE_SERVICE_KEY="test-key", SLIP_SPOOL_DIR=spool.name,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        customer = Customer.objects.create(user=user, cus_name="Noy", cus_last="", address="", cus_tel="020")
+        self.order = Order.objects.create(customer=customer)
+        Bill.objects.create(order=self.order, total_amount=100, balance_due=100)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+        self.client.force_login(user)
+
+    def _post_slip(self, content=b"fake-jpeg-bytes"):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        slip = SimpleUploadedFile("slip.JPG", content, content_type="image/jpeg")
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                reverse("store_confirm_payment", args=[self.order.id]),
+                {"slip_image": slip, "paid_amount": "100"},
+            )
+
+    def test_request_returns_before_upload(self):
+        self._post_slip()
+        payment = Payment.objects.get(bill__order=self.order)
+        self.assertEqual(payment.slip_status, Payment.SlipStatus.UPLOADING)
+        self.assertIsNone(payment.slip_url)
+        self.assertEqual(self.storage.requests, 0)
+        self.order.bill.refresh_from_db()
+        self.assertEqual(self.order.bill.status, Bill.Status.PAID)
+
+    def test_worker_retries_then_fills_in_url(self):
+        from pathlib import Path
+
+        from .models import SlipUploadJob
+        from .slip_uploads import process_due_jobs
+
+        self._post_slip()
+        job = SlipUploadJob.objects.get()
+        self.storage.fail_next = 1
+
+        with self.assertLogs("apps.sales.slip_uploads", "WARNING"):
+            self.assertEqual(process_due_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (SlipUploadJob.Status.PENDING, 1))
+        self.assertGreater(job.next_attempt_at, timezone.now())
+        self.assertEqual(process_due_jobs(), 0)  # backing off
+
+        SlipUploadJob.objects.update(next_attempt_at=timezone.now())
+        with self.assertLogs("apps.sales.slip_uploads", "WARNING"):  # not a real image: stored as is
+            process_due_jobs()
+        payment = Payment.objects.get()
+        object_path = f"order_{self.order.id}/payment_{payment.id}.jpg"
+        self.assertEqual(payment.slip_status, Payment.SlipStatus.READY)
+        self.assertEqual(payment.slip_url, f"{self.storage.url}/storage/v1/object/public/slips/{object_path}")
+        self.assertEqual(self.storage.objects[f"slips/{object_path}"], b"fake-jpeg-bytes")
+        self.assertFalse(Path(job.spool_path).exists())
+
+    def test_gives_up_after_max_attempts(self):
+        from .models import SlipUploadJob
+        from .slip_uploads import process_due_jobs
+
+        self._post_slip()
+        self.storage.fail_next = 10
+        with self.settings(SLIP_UPLOAD_MAX_ATTEMPTS=2), self.assertLogs("apps.sales.slip_uploads", "WARNING"):
+            for _ in range(2):
+                SlipUploadJob.objects.update(next_attempt_at=timezone.now())
+                process_due_jobs()
+        self.assertEqual(SlipUploadJob.objects.get().status, SlipUploadJob.Status.FAILED)
+        self.assertEqual(Payment.objects.get().slip_status, Payment.SlipStatus.FAILED)
+
+    def test_unexpected_error_is_retried(self):
+        from unittest import mock
+
+        from . import slip_uploads
+        from .models import SlipUploadJob
+
+        self._post_slip()
+        with mock.patch.object(slip_uploads, "put_slip_object", side_effect=ConnectionResetError("reset")), \
+                self.assertLogs("apps.sales.slip_uploads", "ERROR"):
+            self.assertEqual(slip_uploads.process_due_jobs(), 1)
+        job = SlipUploadJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (SlipUploadJob.Status.PENDING, 1))
+        self.assertIn("ConnectionResetError", job.last_error)
+
+    def test_rolled_back_submit_leaves_no_spool_file(self):
+        from pathlib import Path
+
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.db import transaction
+
+        from .slip_uploads import enqueue_slip
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                payment = Payment.objects.create(bill=self.order.bill, pay_amount=100)
+                enqueue_slip(payment, SimpleUploadedFile("slip.jpg", b"x"))
+                raise RuntimeError("checkout failed")
+        self.assertEqual(list(Path(self.spool_dir).iterdir()), [])
+
+    def test_worker_loop_survives_errors(self):
+        from unittest import mock
+
+        from django.core.management import call_command
+        from django.db import OperationalError
+
+        from .management.commands import process_slip_uploads as command
+
+        passes = mock.Mock(side_effect=[OperationalError("server closed the connection"), 0, KeyboardInterrupt])
+        with mock.patch.object(command, "process_due_jobs", passes), mock.patch.object(command.time, "sleep"), \
+                self.assertLogs("apps.sales.slip_uploads", "ERROR"):
+            call_command("process_slip_uploads", stdout=__import__("io").StringIO())
+        self.assertEqual(passes.call_count, 3)
+
+    def test_photo_is_shrunk_and_thumbnailed(self):
+        import io
+
+        from PIL import Image
+
+        from .slip_uploads import process_due_jobs
+
+        photo = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation: rotate 90° clockwise
+        exif[0x010F] = "PhoneMaker"
+        Image.new("RGB", (4000, 3000), "green").save(photo, "JPEG", quality=95, exif=exif)
+        self._post_slip(photo.getvalue())
+        process_due_jobs()
+
+        payment = Payment.objects.get()
+        self.assertTrue(payment.slip_url.endswith(f"payment_{payment.id}.webp"))
+        self.assertTrue(payment.slip_thumb_url.endswith(f"payment_{payment.id}_thumb.webp"))
+        full = self.storage.objects[f"slips/order_{self.order.id}/payment_{payment.id}.webp"]
+        thumb = self.storage.objects[f"slips/order_{self.order.id}/payment_{payment.id}_thumb.webp"]
+        with Image.open(io.BytesIO(full)) as image:
+            self.assertEqual(image.size, (1200, 1600))  # upright, longest side capped
+            self.assertFalse(image.getexif())
+        with Image.open(io.BytesIO(thumb)) as image:
+            self.assertEqual(max(image.size), 320)
+        self.assertLess(len(full), len(photo.getvalue()))
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Matcha")
+        self.products = [
+            Product.objects.create(category=category, name=f"P{i}", price=100, stock_qty=10) for i in range(2)
+        ]
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        self.customer = Customer.objects.create(user=user, cus_name="Noy", cus_last="", address="", cus_tel="020")
+
+    def _cart(self, qty=1):
+        return [
+            {"product": p, "qty": qty, "unit_price": p.price, "line_total": p.price * qty} for p in self.products
+        ]
+
+    def _snapshot(self):
+        from django.db.models import Sum
+
+        from .models import DailySalesRollup
+
+        return sorted(
+            DailySalesRollup.objects.values("day", "channel", "employee_id", "product_id")
+            .annotate(Sum("orders"), Sum("paid_orders"), Sum("units"), Sum("revenue"))
+            .order_by()
+            .values_list("channel", "product_id", "orders__sum", "paid_orders__sum", "units__sum", "revenue__sum"),
+            key=str,
+        )
+
+    def test_incremental_matches_rebuild(self):
+        from .order_builder import build_order
+        from .rollup import rebuild, record_bill_change, today_totals
+
+        build_order(self._cart(2), status=Order.Status.COMPLETED, paid_amount=400, bill_status=Bill.Status.PAID)
+        build_order(self._cart(2), status=Order.Status.COMPLETED, paid_amount=400, bill_status=Bill.Status.PAID)
+        web = build_order(self._cart(), status=Order.Status.PENDING, customer=self.customer)
+        build_order(self._cart(), status=Order.Status.PENDING, customer=self.customer)  # never paid
+
+        bill = web.bill
+        bill.status = Bill.Status.PAID
+        bill.save()
+        record_bill_change(bill, Bill.Status.PENDING)
+        bill.status = Bill.Status.PAID  # already paid: no double count
+        record_bill_change(bill, Bill.Status.PAID)
+
+        self.assertEqual(today_totals(), {"orders": 4, "revenue": Decimal("1000")})
+        incremental = self._snapshot()
+        self.assertIn(("POS", self.products[0].id, 0, 0, 4, Decimal("400")), incremental)
+
+        rebuild()
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_dashboard_reads_rollup(self):
+        from .order_builder import build_order
+
+        build_order(self._cart(), status=Order.Status.COMPLETED, paid_amount=200, bill_status=Bill.Status.PAID)
+        Bill.objects.update(total_amount=999)  # not read by the dashboard
+
+        staff = get_user_model().objects.create_user("staff", "staff@example.com", "pw", is_staff=True)
+        client = Client(HTTP_HOST="127.0.0.1")
+        client.force_login(staff)
+        response = client.get(reverse("staff_dashboard"))
+        self.assertEqual(response.context["stat_today_sales"], 200)
+        self.assertEqual(response.context["stat_today_orders"], 1)
+
+
+class SalesAnalyticsTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Matcha")
+        self.products = [Product.objects.create(category=category, name=f"P{i}", price=100) for i in range(2)]
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        self.customer = Customer.objects.create(user=user, cus_name="Noy", cus_last="", address="", cus_tel="020")
+        self.staff = get_user_model().objects.create_user("staff", "staff@example.com", "pw", is_staff=True)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+        self.client.force_login(self.staff)
+
+    def _order(self, when, qty=1, paid=True, customer=None, reserve=False):
+        from .order_builder import build_order, proportional_deposit
+
+        cart = [{"product": p, "qty": qty, "unit_price": p.price, "line_total": p.price * qty} for p in self.products]
+        total = Decimal(200 * qty)
+        built = build_order(
+            cart,
+            status=Order.Status.RESERVED if reserve else Order.Status.COMPLETED,
+            customer=customer,
+            paid_amount=total if paid else Decimal("0"),
+            bill_status=Bill.Status.PAID if paid else Bill.Status.PENDING,
+            reserve_until=when + timedelta(days=3) if reserve else None,
+            line_deposit=proportional_deposit(total / 2, total) if reserve else None,
+        )
+        Bill.objects.filter(pk=built.bill.pk).update(bill_date=when)
+        return built
+
+    def test_summary_series_and_top_products(self):
+        from .analytics import ReportRange, series, summary, top_products
+
+        today = timezone.localdate()
+        morning = timezone.localtime().replace(hour=9, minute=0, second=0, microsecond=0)
+        self._order(morning)                      # 200
+        self._order(morning + timedelta(minutes=5), qty=2)  # 400
+        self._order(morning + timedelta(hours=3), paid=False, customer=self.customer, reserve=True)
+        self._order(morning - timedelta(days=40))  # outside the range
+
+        rng = ReportRange(today - timedelta(days=6), today, "hour")
+        totals = summary(rng)
+        self.assertEqual((totals["orders"], totals["paid_orders"], totals["units"]), (3, 2, 6))
+        self.assertEqual(totals["revenue"], Decimal("600"))
+        self.assertEqual(totals["avg_order_value"], Decimal("300"))
+        self.assertEqual((totals["deposit"], totals["balance"]), (Decimal("100"), Decimal("100")))
+
+        rows = list(series(rng))
+        self.assertEqual([(r["orders"], r["units"], r["revenue"]) for r in rows], [(2, 6, Decimal("600")), (1, 0, 0)])
+        self.assertEqual(summary(ReportRange(rng.start, rng.end, "day", "WEB"))["orders"], 1)
+        self.assertEqual([p["units"] for p in top_products(rng)], [3, 3])
+
+    def test_page_and_csv(self):
+        today = timezone.localdate()
+        self._order(timezone.now())
+        with self.assertQueryBudget(12):
+            response = self.client.get(reverse("staff_reports"))
+        self.assertContains(response, "P0")
+
+        response = self.client.get(reverse("staff_reports"), {"start": today, "end": today, "format": "csv"})
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual(lines[0].split(",")[:4], ["bucket", "orders", "paid_orders", "revenue"])
+        bucket, orders, paid, revenue = lines[1].split(",")[:4]
+        self.assertEqual((bucket, orders, paid, Decimal(revenue)), (today.isoformat(), "1", "1", Decimal("200")))
+
+        response = self.client.get(reverse("staff_reports"), {"start": today, "end": today - timedelta(days=1)})
+        self.assertNotIn("summary", response.context)
+
+
+class SalesExportTests(TestCase):
+    def setUp(self):
+        from apps.store.models import Employee
+
+        category = Category.objects.create(name="Matcha")
+        self.product = Product.objects.create(category=category, name="ມັດຊາ", price=100)
+        User = get_user_model()
+        customer_user = User.objects.create_user("cus", "cus@example.com", "pw")
+        self.customer = Customer.objects.create(
+            user=customer_user, cus_name="Noy", cus_last="", address="", cus_tel="020",
+        )
+        self.employee = Employee.objects.create(
+            user=User.objects.create_user("till", "till@example.com", "pw"),
+            emp_name="Kham", emp_last="", emp_address="", emp_gender="", emp_tel="",
+        )
+        self.admin = User.objects.create_superuser("boss", "boss@example.com", "pw")
+
+    def _orders(self, n, **kwargs):
+        from .order_builder import build_order
+
+        cart = [{"product": self.product, "qty": 2, "unit_price": self.product.price, "line_total": 200}]
+        return [build_order(cart, status=Order.Status.PENDING, **kwargs) for _ in range(n)]
+
+    def test_rows_are_joined_and_paged(self):
+        from unittest import mock
+
+        from . import exports
+
+        self._orders(3, customer=self.customer)
+        self._orders(2, employee=self.employee)
+        export = exports.EXPORTS["orders"]
+        with mock.patch.object(exports, "CHUNK", 2), self.assertNumQueries(6):  # 3 pages, each + its lines
+            records = list(exports.rows(export, export.queryset()))
+        self.assertEqual([r["channel"] for r in records], ["WEB"] * 3 + ["POS"] * 2)
+        self.assertEqual((records[0]["customer"], records[0]["units"]), ("Noy", 2))
+        self.assertEqual(records[0]["items"][0]["product"], "ມັດຊາ")
+        self.assertEqual(records[-1]["employee"], "Kham")
+        self.assertEqual(len(list(exports.rows(export, export.queryset(channel="POS")))), 2)
+
+    def test_admin_actions_stream(self):
+        import json
+
+        built = self._orders(2, customer=self.customer)
+        Payment.objects.create(bill=built[0].bill, pay_amount=Decimal("200"))
+        client = Client(HTTP_HOST="127.0.0.1")
+        client.force_login(self.admin)
+
+        for model, action, count in ((Order, "export_csv", 2), (Bill, "export_json", 2), (Payment, "export_csv", 1)):
+            response = client.post(
+                reverse(f"admin:sales_{model._meta.model_name}_changelist"),
+                {"action": action, "_selected_action": list(model.objects.values_list("pk", flat=True))},
+            )
+            self.assertTrue(response.streaming, model)
+            body = b"".join(response.streaming_content).decode("utf-8-sig")
+            if action == "export_json":
+                self.assertEqual(len(json.loads(body)), count)
+            else:
+                self.assertEqual(len(body.strip().splitlines()), count + 1, model)
+            if model is Order:
+                self.assertIn("ມັດຊາ×2@100", body)
+
+    def test_command_windows_resume(self):
+        import io
+        import tempfile
+        from pathlib import Path
+
+        from django.core.management import call_command
+
+        self._orders(2, customer=self.customer)
+        Order.objects.filter(pk=Order.objects.order_by("pk")[0].pk).update(order_date=timezone.now() - timedelta(days=3))
+        args = ["export_sales", "orders", "--from", str(timezone.localdate() - timedelta(days=3)), "--window", "day"]
+        with tempfile.TemporaryDirectory() as out:
+            call_command(*args, "--out", out, stdout=io.StringIO())
+            files = sorted(Path(out).iterdir())
+            self.assertEqual(len(files), 4)
+            self.assertEqual(len(files[0].read_text(encoding="utf-8-sig").splitlines()), 2)
+            self.assertEqual(len(files[-1].read_text(encoding="utf-8-sig").splitlines()), 2)
+
+            files[0].write_text("kept")
+            call_command(*args, "--out", out, stdout=io.StringIO())
+            self.assertEqual(files[0].read_text(), "kept")  # finished window skipped
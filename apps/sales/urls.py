@@ -4,6 +4,7 @@ from . import views, staff_views
 urlpatterns = [
     # POS
     path('pos/', views.pos_view, name='pos'),
+    path('pos/products/', views.pos_products_more, name='pos_products_more'),
     path('pos/add/<int:product_id>/', views.add_to_cart, name='add_to_cart'),
     path('pos/remove/<int:product_id>/', views.remove_from_cart, name='remove_from_cart'),
     path('pos/clear/', views.clear_cart, name='clear_cart'),
@@ -20,4 +21,5 @@ urlpatterns = [
     path('staff/reserved/', staff_views.staff_reserved, name='staff_reserved'),
     path('staff/reserved/<int:reserved_id>/action/', staff_views.staff_reserved_action, name='staff_reserved_action'),
     path('staff/inventory/', staff_views.staff_inventory, name='staff_inventory'),
+    path('staff/reports/', staff_views.staff_reports, name='staff_reports'),
 ]
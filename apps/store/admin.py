@@ -1,6 +1,6 @@
 from django.contrib import admin
 from unfold.admin import ModelAdmin
-from .models import Employee, Customer
+from .models import Employee, Customer, OutboxMessage, SavedCart
 
 
 @admin.register(Employee)
@@ -32,3 +32,19 @@ class CustomerAdmin(ModelAdmin):
             "classes": ("collapse",),
         }),
     )
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(ModelAdmin):
+    list_display = ("id", "channel", "subject", "status", "attempts", "created_at", "sent_at", "latency_ms")
+    list_filter = ("channel", "status")
+    search_fields = ("subject",)
+    readonly_fields = ("attempts", "last_error", "created_at", "sent_at", "latency_ms")
+
+
+@admin.register(SavedCart)
+class SavedCartAdmin(ModelAdmin):
+    list_display = ("user", "name", "data", "updated_at")
+    list_filter = ("name",)
+    search_fields = ("user__username", "user__email")
+    readonly_fields = ("user", "name", "data", "updated_at")
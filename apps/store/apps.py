@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.store'
+
+    def ready(self):
+        from django.contrib.auth.signals import user_logged_in
+
+        from .cart_store import merge_cookie_cart
+
+        user_logged_in.connect(merge_cookie_cart, dispatch_uid="store_merge_cookie_cart")
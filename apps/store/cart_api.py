@@ -0,0 +1,123 @@
+"""JSON cart API used by static/js/cart.js for the shop cart and the POS.
+
+    GET  /cart/api/<cart>/                 summary
+    POST /cart/api/<cart>/add/             product_id, qty (default 1, may be negative)
+    POST /cart/api/<cart>/set/             product_id, qty
+    POST /cart/api/<cart>/remove/          product_id
+    POST /cart/api/<cart>/clear/
+
+<cart> is "store" or "pos" (POS needs a logged-in user). Every answer
+carries the whole priced cart plus ``changed`` — the lines whose qty
+moved in this call (qty 0 = removed). With ``?partial=1`` the cart panel
+is re-rendered server-side and returned as ``html`` so the page can swap
+it in without a reload. The classic redirecting cart URLs still work
+without JS.
+"""
+
+import json
+
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_http_methods
+
+from apps.store.templatetags.mz_extras import kip
+
+from .cart_pricing import price_cart
+from .cart_store import get_cart
+
+CARTS = ("store", "pos")
+ACTIONS = ("add", "set", "remove", "clear")
+
+
+def _panel_html(request, name, items, total):
+    if name == "pos":
+        return render_to_string("_pos_cart.html", {"cart_items": items, "total": total}, request=request)
+    return render_to_string("store/_cart_panel.html", {"items": items, "total": total}, request=request)
+
+
+def _error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+@require_http_methods(["GET", "POST"])
+def cart_api(request, name, action=""):
+    if name not in CARTS:
+        return _error("unknown cart", 404)
+    if name == "pos" and not request.user.is_authenticated:
+        return _error("login required", 403)
+
+    cart = get_cart(request, name)
+    before = cart.lines
+    if action:
+        if request.method != "POST" or action not in ACTIONS:
+            return _error("unknown action", 405 if action in ACTIONS else 404)
+        if request.content_type == "application/json":
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                return _error("invalid JSON")
+            if not isinstance(data, dict):
+                return _error("JSON object required")
+        else:
+            data = request.POST
+        product_id = _int(data.get("product_id"))
+        if action != "clear" and product_id is None:
+            return _error("product_id required")
+
+        if action == "add":
+            cart.add(product_id, _int(data.get("qty"), 1))
+        elif action == "set":
+            qty = _int(data.get("qty"))
+            if qty is None:
+                return _error("qty required")
+            cart.set(product_id, qty)
+        elif action == "remove":
+            cart.remove(product_id)
+        else:
+            cart.clear()
+
+    items, total = price_cart(request, name)
+    if action in ("add", "set") and cart.qty(product_id) and all(i["product"].id != product_id for i in items):
+        # Unknown or inactive product: undo, nothing to price
+        cart.set(product_id, before.get(product_id, 0))
+        return _error("product not available", 404)
+
+    after = cart.lines
+    priced = {i["product"].id: i for i in items}
+    changed = [
+        {
+            "product_id": pid,
+            "qty": after.get(pid, 0),
+            "line_total": priced[pid]["line_total"] if pid in priced else 0,
+        }
+        for pid in sorted(set(before) | set(after))
+        if before.get(pid, 0) != after.get(pid, 0)
+    ]
+    payload = {
+        "cart": name,
+        "count": sum(i["qty"] for i in items),
+        "total": total,
+        "total_display": kip(total),
+        "lines": [
+            {
+                "product_id": i["product"].id,
+                "name": i["product"].name,
+                "qty": i["qty"],
+                "unit_price": i["unit_price"],
+                "line_total": i["line_total"],
+                "in_stock": i["in_stock"],
+            }
+            for i in items
+        ],
+        "changed": changed,
+    }
+    if request.GET.get("partial"):
+        payload["html"] = _panel_html(request, name, items, total)
+    return JsonResponse(payload)
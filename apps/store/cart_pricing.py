@@ -0,0 +1,94 @@
+"""Price a cart once per request — shared by the shop, the POS, checkout
+and the cart API.
+
+price_cart(request, "store" | "pos") loads the cart's products in one
+query, then builds every line (unit price, line total, stock status) and
+the totals in a single pass. Products are memoized on the request, so a
+view that prices the cart again after a change (the cart API, checkout
+after validation) only fetches ids it has not seen yet, and an unchanged
+cart is not re-priced at all.
+
+Lines are the dicts apps.sales.order_builder and the templates already
+use: ``{"product", "qty", "unit_price", "line_total", "in_stock",
+"shortfall"}``.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from .cart_store import get_cart
+
+# Web reservations: deposit share of the order, and how long it is held
+RESERVE_DEPOSIT_RATE = Decimal("0.5")
+RESERVE_EXPIRE_DAYS = 7
+
+
+@dataclass
+class PricedCart:
+    items: list[dict] = field(default_factory=list)
+    total: Decimal = Decimal("0")
+
+    def __iter__(self):
+        # cart_items, total = price_cart(...)
+        return iter((self.items, self.total))
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def count(self) -> int:
+        return sum(item["qty"] for item in self.items)
+
+    @property
+    def deposit_preview(self) -> Decimal:
+        return (self.total * RESERVE_DEPOSIT_RATE).quantize(Decimal("1"))
+
+    @property
+    def out_of_stock(self) -> list[dict]:
+        """Lines a "buy now" order could not fill (reservations may)."""
+        return [item for item in self.items if not item["in_stock"]]
+
+
+def _products(request, ids):
+    from apps.catalog.models import Product
+
+    known = request.__dict__.setdefault("_cart_products", {})
+    missing = [pid for pid in ids if pid not in known]
+    if missing:
+        for product in Product.objects.filter(id__in=missing).select_related("category"):
+            known[product.id] = product
+        for pid in missing:
+            known.setdefault(pid, None)
+    return known
+
+
+def price_cart(request, name: str) -> PricedCart:
+    lines = get_cart(request, name).lines
+    memo = request.__dict__.setdefault("_priced_carts", {})
+    key = (name, tuple(lines.items()))
+    if key in memo:
+        return memo[key]
+
+    products = _products(request, lines)
+    priced = PricedCart()
+    for pid, qty in lines.items():
+        product = products.get(pid)
+        # The shop never sells hidden products; the POS can ring them up
+        if product is None or (name == "store" and not product.is_active):
+            continue
+        line_total = product.price * qty
+        shortfall = max(qty - product.stock_qty, 0)
+        priced.items.append({
+            "product": product,
+            "qty": qty,
+            "unit_price": product.price,
+            "line_total": line_total,
+            "in_stock": shortfall == 0,
+            "shortfall": shortfall,
+        })
+        priced.total += line_total
+    memo[key] = priced
+    return priced
+
@@ -0,0 +1,328 @@
+"""Shopping carts kept out of the session table.
+
+A cart is ``{product id: qty}``, stored in a compact versioned string
+("1:12x2.15x1"). Two backends:
+
+- anonymous shop visitors keep the cart in a signed cookie (no server state
+  at all);
+- logged-in customers and the POS keep it in a SavedCart row. When
+  CART_CACHE_ALIAS is a cache every worker shares (the "carts"
+  FileBasedCache under CART_CACHE_DIR, which never culls; redis,
+  memcached) the cart is served from there and the row is only rewritten
+  when the cached copy is older than CART_DB_SYNC_SECONDS (or the cart is
+  cleared), so clicking +/- does not write to the database every time.
+  Carts a worker changed without syncing are written back when it exits
+  (flush_pending, from gunicorn.conf.py), so a restart loses nothing; a
+  killed worker loses at most CART_DB_SYNC_SECONDS of edits. With a
+  per-process cache (LocMem) that write-behind would show each worker its
+  own cart, so every read and change goes straight to the row instead.
+
+Views call get_cart(request, "store" | "pos") and mutate the returned Cart;
+CartMiddleware saves whatever changed once, on the way out. When a visitor
+logs in their cookie cart is merged into the account's saved cart.
+Carts left in the old session keys ("store_cart"/"pos_cart") are picked up
+on first read.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from apps.catalog.cache import shared_across_workers
+from config.metrics import CART_CHANGES
+
+logger = logging.getLogger(__name__)
+
+VERSION = "1"
+COOKIE_SALT = "apps.store.cart"
+# Caps keep a tampered/legacy cart from blowing up a cookie or an order
+MAX_LINES = 50
+MAX_QTY = 999
+
+
+def encode(lines: dict[int, int]) -> str:
+    return VERSION + ":" + ".".join(f"{pid}x{qty}" for pid, qty in lines.items())
+
+
+def decode(raw: str | None) -> dict[int, int]:
+    """Parse an encoded cart; anything unreadable or from another version
+    decodes to an empty cart."""
+    if not raw or not raw.startswith(VERSION + ":"):
+        return {}
+    lines = {}
+    for part in raw[len(VERSION) + 1:].split("."):
+        pid, _, qty = part.partition("x")
+        if pid.isdigit() and qty.isdigit() and int(qty) > 0:
+            lines[int(pid)] = min(int(qty), MAX_QTY)
+    return dict(list(lines.items())[:MAX_LINES])
+
+
+class Cart:
+    """Product id → qty for one request. Mutations only mark the cart
+    dirty; CartMiddleware writes it back."""
+
+    def __init__(self, name: str, backend, lines: dict[int, int]):
+        self.name = name
+        self.backend = backend
+        self._lines = lines
+        self.dirty = False
+        self.cleared = False
+
+    @property
+    def lines(self) -> dict[int, int]:
+        return dict(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __len__(self):
+        return len(self._lines)
+
+    @property
+    def count(self) -> int:
+        return sum(self._lines.values())
+
+    def qty(self, product_id: int) -> int:
+        return self._lines.get(int(product_id), 0)
+
+    def set(self, product_id: int, qty: int) -> None:
+        product_id = int(product_id)
+        qty = min(int(qty), MAX_QTY)
+        if qty <= 0:
+            if self._lines.pop(product_id, None) is not None:
+                self._changed("remove")
+            return
+        if product_id not in self._lines and len(self._lines) >= MAX_LINES:
+            return
+        if self._lines.get(product_id) != qty:
+            change = "update" if product_id in self._lines else "add"
+            self._lines[product_id] = qty
+            self._changed(change)
+
+    def add(self, product_id: int, qty: int = 1) -> None:
+        self.set(product_id, self.qty(product_id) + qty)
+
+    def remove(self, product_id: int) -> None:
+        self.set(product_id, 0)
+
+    def merge(self, lines: dict[int, int]) -> None:
+        for product_id, qty in lines.items():
+            self.add(product_id, qty)
+
+    def clear(self) -> None:
+        if self._lines or not self.cleared:
+            if self._lines:
+                CART_CHANGES.inc(cart=self.name, change="clear")
+            self._lines = {}
+            self.dirty = True
+            self.cleared = True
+
+    def _changed(self, change: str) -> None:
+        self.dirty = True
+        CART_CHANGES.inc(cart=self.name, change=change)
+
+
+class CookieCarts:
+    """Signed cookie per cart name; nothing stored server-side."""
+
+    @staticmethod
+    def cookie_name(name: str) -> str:
+        return f"cart_{name}"
+
+    def load(self, request, name: str) -> dict[int, int]:
+        raw = request.get_signed_cookie(self.cookie_name(name), default=None, salt=COOKIE_SALT)
+        return decode(raw)
+
+    def save(self, request, response, cart: Cart) -> None:
+        cookie = self.cookie_name(cart.name)
+        if not cart:
+            if cookie in request.COOKIES:
+                response.delete_cookie(cookie, samesite="Lax")
+            return
+        response.set_signed_cookie(
+            cookie,
+            encode(cart.lines),
+            salt=COOKIE_SALT,
+            max_age=getattr(settings, "CART_COOKIE_AGE", 60 * 60 * 24 * 30),
+            secure=getattr(settings, "SESSION_COOKIE_SECURE", False),
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+class StoredCarts:
+    """SavedCart row, behind a shared cache when there is one (write-behind
+    on a timer), else read and written directly."""
+
+    def __init__(self, user):
+        self.user = user
+
+    @staticmethod
+    def cache():
+        return caches[getattr(settings, "CART_CACHE_ALIAS", "default")]
+
+    @classmethod
+    def write_behind(cls) -> bool:
+        return shared_across_workers(cls.cache())
+
+    def key(self, name: str) -> str:
+        return f"cart:{name}:{self.user.pk}"
+
+    def _row(self, name: str) -> str | None:
+        from .models import SavedCart
+
+        return SavedCart.objects.filter(user=self.user, name=name).values_list("data", flat=True).first()
+
+    def load(self, request, name: str) -> dict[int, int]:
+        if not self.write_behind():
+            return decode(self._row(name))
+        hit = self.cache().get(self.key(name))
+        if hit is not None:
+            return decode(hit[0])
+        row = self._row(name)
+        # Freshly loaded from the row, so it counts as synced now; with no
+        # row yet the first change is written straight away
+        self.cache().set(self.key(name), (row or encode({}), time.time() if row else 0), timeout=None)
+        return decode(row)
+
+    def save(self, request, response, cart: Cart) -> None:
+        from .models import SavedCart
+
+        data = encode(cart.lines)
+        now = time.time()
+        write_behind = self.write_behind()
+        hit = self.cache().get(self.key(cart.name)) if write_behind else None
+        synced_at = hit[1] if hit else 0
+        if not write_behind or cart.cleared or now - synced_at >= getattr(settings, "CART_DB_SYNC_SECONDS", 60):
+            if cart:
+                SavedCart.objects.update_or_create(
+                    user=self.user, name=cart.name, defaults={"data": data, "updated_at": timezone.now()},
+                )
+            else:
+                SavedCart.objects.filter(user=self.user, name=cart.name).delete()
+            synced_at = now
+        if write_behind:
+            self.cache().set(self.key(cart.name), (data, synced_at), timeout=None)
+            if synced_at == now:
+                _pending.discard((self.user.pk, cart.name))
+            else:
+                _pending.add((self.user.pk, cart.name))
+
+
+# (user id, cart name) of carts this process changed in the cache only
+_pending: set[tuple[int, str]] = set()
+
+
+def flush_pending() -> int:
+    """Write this process's unsynced cached carts back to their rows (worker
+    shutdown). Returns how many were written."""
+    from .models import SavedCart
+
+    written = 0
+    cache = StoredCarts.cache()
+    while _pending:
+        user_id, name = _pending.pop()
+        key = f"cart:{name}:{user_id}"
+        hit = cache.get(key)
+        if hit is None:
+            continue
+        try:
+            if decode(hit[0]):
+                SavedCart.objects.update_or_create(
+                    user_id=user_id, name=name, defaults={"data": hit[0], "updated_at": timezone.now()},
+                )
+            else:
+                SavedCart.objects.filter(user_id=user_id, name=name).delete()
+        except Exception:
+            logger.exception("could not write back cart %s", key)
+            continue
+        cache.set(key, (hit[0], time.time()), timeout=None)
+        written += 1
+    return written
+
+
+def _backend(request, name: str):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return StoredCarts(user)
+    return CookieCarts()
+
+
+def get_cart(request, name: str) -> Cart:
+    """The ``name`` cart for this request (memoized on the request)."""
+    carts = request.__dict__.setdefault("_carts", {})
+    backend = _backend(request, name)
+    cart = carts.get(name)
+    if cart is not None and type(cart.backend) is type(backend):
+        return cart
+
+    cart = Cart(name, backend, backend.load(request, name))
+    session = getattr(request, "session", None)
+    legacy_key = f"{name}_cart"
+    if session is not None and legacy_key in session:
+        legacy = session.pop(legacy_key) or {}
+        cart.merge({int(pid): int(qty) for pid, qty in legacy.items() if str(pid).isdigit() and int(qty) > 0})
+    carts[name] = cart
+    return cart
+
+
+def peek_count(request, name: str) -> int:
+    """Item count for the nav badge: the cart already loaded this request,
+    else the cookie or the shared cached copy; on a cache miss (eviction,
+    restart) or without a shared cache, the row itself."""
+    cart = getattr(request, "_carts", {}).get(name)
+    if cart is not None and type(cart.backend) is type(_backend(request, name)):
+        return cart.count
+    backend = _backend(request, name)
+    if isinstance(backend, CookieCarts) or not backend.write_behind():
+        return sum(backend.load(request, name).values())
+    hit = backend.cache().get(backend.key(name))
+    if hit is None:
+        return sum(backend.load(request, name).values())  # refills the cache
+    return sum(decode(hit[0]).values())
+
+
+def save_carts(request, response) -> None:
+    for cart in getattr(request, "_carts", {}).values():
+        if cart.dirty:
+            cart.backend.save(request, response, cart)
+            cart.dirty = False
+
+
+def merge_cookie_cart(sender, request, user, **kwargs) -> None:
+    """user_logged_in: fold the anonymous cookie cart into the account's."""
+    if request is None:
+        return
+    cookie = CookieCarts()
+    lines = cookie.load(request, "store")
+    carts = request.__dict__.setdefault("_carts", {})
+    anonymous = carts.pop("store", None)
+    if anonymous is not None and isinstance(anonymous.backend, CookieCarts):
+        lines = anonymous.lines
+    if not lines:
+        return
+    cart = get_cart(request, "store")
+    cart.merge(lines)
+    # Drop the cookie on the way out
+    emptied = Cart("store", cookie, {})
+    emptied.dirty = True
+    carts["_store_cookie"] = emptied
+
+
+class CartMiddleware:
+    """Writes carts changed during the request (cookie or cache/DB)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # A failed request (e.g. checkout rolled back) keeps the old cart
+        if response.status_code < 500:
+            save_carts(request, response)
+        return response
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from config.query_plans import analyze, check_plans, seed
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot shop/POS/staff queries and fail if any of them does not use its index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed", type=int, default=0,
+            help="Insert this many throwaway rows per table first (rolled back afterwards)",
+        )
+        parser.add_argument("--verbose-plans", action="store_true", help="Print every plan, not only failures")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options["seed"]:
+                self.stdout.write(f"Seeding {options['seed']} rows per table…")
+                seed(options["seed"])
+            analyze()
+            results = check_plans()
+            transaction.set_rollback(True)
+
+        failed = []
+        for result in results:
+            if result.ok:
+                self.stdout.write(f"ok    {result.query.label}  ({result.index})")
+            else:
+                failed.append(result)
+                self.stdout.write(f"FAIL  {result.query.label}  (wanted {' or '.join(result.query.indexes)})")
+            if options["verbose_plans"] or not result.ok:
+                self.stdout.write("      " + result.plan.replace("\n", "\n      "))
+        if failed:
+            raise CommandError(f"{len(failed)} hot quer{'y' if len(failed) == 1 else 'ies'} not using an index")
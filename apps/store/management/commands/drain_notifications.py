@@ -0,0 +1,64 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.store.models import OutboxMessage
+from apps.store.notifications import drain_outbox
+
+logger = logging.getLogger("apps.store.notifications")
+# Longest pause after repeated failed passes (e.g. the database is down)
+MAX_BACKOFF = 60.0
+
+
+class Command(BaseCommand):
+    help = "Deliver queued shop notifications (email / LINE). Runs until stopped; --once for a single pass"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Send what is due now, then exit")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds between polls when idle")
+        parser.add_argument("--stats", action="store_true", help="Show delivery latency for the last 24h and exit")
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            return self._stats()
+        if options["once"]:
+            self.stdout.write(f"Handled {drain_outbox()} notification(s)")
+            return
+
+        self.stdout.write("Notification worker started")
+        backoff = options["interval"]
+        try:
+            while True:
+                try:
+                    close_old_connections()
+                    busy = drain_outbox()
+                except Exception:
+                    # Keep the worker alive: nothing restarts it if it exits
+                    logger.exception("notification pass failed; retrying in %.0fs", backoff)
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_BACKOFF)
+                    continue
+                backoff = options["interval"]
+                if not busy:
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            self.stdout.write("Notification worker stopped")
+
+    def _stats(self):
+        since = timezone.now() - timedelta(hours=24)
+        recent = OutboxMessage.objects.filter(created_at__gte=since)
+        for row in recent.values("channel", "status").annotate(n=Count("id")).order_by("channel", "status"):
+            self.stdout.write(f"{row['channel']:<6} {row['status']:<8} {row['n']}")
+        latencies = sorted(
+            recent.filter(status=OutboxMessage.Status.SENT).values_list("latency_ms", flat=True)
+        )
+        if latencies:
+            def pct(p):
+                return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+            self.stdout.write(f"latency ms  p50={pct(0.5)}  p95={pct(0.95)}  max={latencies[-1]}")
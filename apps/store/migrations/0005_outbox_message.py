@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_alter_customer_options_alter_employee_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('EMAIL', 'ອີເມວ'), ('LINE', 'LINE Notify')], max_length=10, verbose_name='ຊ່ອງທາງ')),
+                ('subject', models.CharField(max_length=200, verbose_name='ຫົວຂໍ້')),
+                ('body', models.TextField(blank=True, verbose_name='ຂໍ້ຄວາມ')),
+                ('status', models.CharField(choices=[('PENDING', 'ລໍຖ້າສົ່ງ'), ('SENT', 'ສົ່ງແລ້ວ'), ('FAILED', 'ສົ່ງບໍ່ສຳເລັດ')], default='PENDING', max_length=10, verbose_name='ສະຖານະ')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='ຈຳນວນຄັ້ງທີ່ລອງ')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='ລອງຄັ້ງຕໍ່ໄປ')),
+                ('last_error', models.TextField(blank=True, verbose_name='ຂໍ້ຜິດພາດລ່າສຸດ')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='ວັນທີສ້າງ')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='ວັນທີສົ່ງ')),
+                ('latency_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='ໃຊ້ເວລາກ່ອນສົ່ງ (ms)')),
+            ],
+            options={
+                'verbose_name': 'ການແຈ້ງເຕືອນຮ້ານ',
+                'verbose_name_plural': 'ການແຈ້ງເຕືອນຮ້ານ',
+                'indexes': [models.Index(fields=['status', 'channel', 'next_attempt_at'], name='store_outbox_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-17 23:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_outbox_message'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedCart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='store = ເວັບ, pos = ໜ້າຮ້ານ', max_length=20, verbose_name='ກະຕ່າ')),
+                ('data', models.CharField(max_length=1000, verbose_name='ລາຍການ')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='ອັບເດດລ່າສຸດ')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_carts', to=settings.AUTH_USER_MODEL, verbose_name='ບັນຊີເຂົ້າລະບົບ')),
+            ],
+            options={
+                'verbose_name': 'ກະຕ່າທີ່ບັນທຶກ',
+                'verbose_name_plural': 'ກະຕ່າທີ່ບັນທຶກ',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='savedcart',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='store_savedcart_user_name_uniq'),
+        ),
+    ]
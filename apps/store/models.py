@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class Employee(models.Model):
@@ -46,3 +47,59 @@ class Customer(models.Model):
 
     def __str__(self):
         return f"{self.cus_name} {self.cus_last}"
+
+
+class OutboxMessage(models.Model):
+    """A shop notification waiting to be delivered by
+    `manage.py drain_notifications` (see apps.store.notifications)."""
+
+    class Channel(models.TextChoices):
+        EMAIL = "EMAIL", "ອີເມວ"
+        LINE = "LINE", "LINE Notify"
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "ລໍຖ້າສົ່ງ"
+        SENT = "SENT", "ສົ່ງແລ້ວ"
+        FAILED = "FAILED", "ສົ່ງບໍ່ສຳເລັດ"
+
+    channel = models.CharField("ຊ່ອງທາງ", max_length=10, choices=Channel.choices)
+    subject = models.CharField("ຫົວຂໍ້", max_length=200)
+    body = models.TextField("ຂໍ້ຄວາມ", blank=True)
+    status = models.CharField("ສະຖານະ", max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField("ຈຳນວນຄັ້ງທີ່ລອງ", default=0)
+    next_attempt_at = models.DateTimeField("ລອງຄັ້ງຕໍ່ໄປ", default=timezone.now)
+    last_error = models.TextField("ຂໍ້ຜິດພາດລ່າສຸດ", blank=True)
+    created_at = models.DateTimeField("ວັນທີສ້າງ", default=timezone.now)
+    sent_at = models.DateTimeField("ວັນທີສົ່ງ", null=True, blank=True)
+    latency_ms = models.PositiveIntegerField("ໃຊ້ເວລາກ່ອນສົ່ງ (ms)", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "ການແຈ້ງເຕືອນຮ້ານ"
+        verbose_name_plural = "ການແຈ້ງເຕືອນຮ້ານ"
+        indexes = [models.Index(fields=["status", "channel", "next_attempt_at"], name="store_outbox_due_idx")]
+
+    def __str__(self):
+        return f"{self.get_channel_display()}: {self.subject}"
+
+
+class SavedCart(models.Model):
+    """Durable copy of a logged-in user's (or POS till's) cart; the live
+    copy is in the cache (see apps.store.cart_store)."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="saved_carts",
+        verbose_name="ບັນຊີເຂົ້າລະບົບ",
+    )
+    name = models.CharField("ກະຕ່າ", max_length=20, help_text="store = ເວັບ, pos = ໜ້າຮ້ານ")
+    data = models.CharField("ລາຍການ", max_length=1000)
+    updated_at = models.DateTimeField("ອັບເດດລ່າສຸດ", default=timezone.now)
+
+    class Meta:
+        verbose_name = "ກະຕ່າທີ່ບັນທຶກ"
+        verbose_name_plural = "ກະຕ່າທີ່ບັນທຶກ"
+        constraints = [models.UniqueConstraint(fields=["user", "name"], name="store_savedcart_user_name_uniq")]
+
+    def __str__(self):
+        return f"{self.user} · {self.name}"
@@ -1,38 +1,151 @@
+"""Shop notifications (email + LINE Notify) through a transactional outbox.
+
+notify_shop() only inserts OutboxMessage rows, in the caller's transaction:
+an order that rolls back never pings the shop, and the request never waits
+on SMTP or LINE. `manage.py drain_notifications` delivers them:
+
+- Messages are grouped per channel. A channel is flushed once its oldest
+  message has waited NOTIFY_COALESCE_SECONDS (or NOTIFY_BATCH_SIZE pile
+  up), and a burst goes out as one digest instead of one ping per order.
+- A failed send is retried with exponential backoff; after
+  NOTIFY_MAX_ATTEMPTS the messages are marked FAILED.
+- Each delivered message records latency_ms (queued → sent).
+"""
+
 import logging
+from datetime import timedelta
 from urllib import parse, request as urlrequest
 
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db import connection, transaction
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# How long claimed messages are hidden from other drain workers
+LEASE = timedelta(minutes=2)
+
+
+def _channels() -> list[str]:
+    from .models import OutboxMessage
+
+    channels = []
+    if getattr(settings, "NOTIFY_EMAIL", "") or settings.CONTACT_EMAIL:
+        channels.append(OutboxMessage.Channel.EMAIL)
+    if getattr(settings, "LINE_NOTIFY_TOKEN", ""):
+        channels.append(OutboxMessage.Channel.LINE)
+    return channels
+
 
 def notify_shop(subject: str, body: str) -> None:
-    """ແຈ້ງຮ້ານເມື່ອມີອໍເດີ/ສລິບ/ຂໍ້ຄວາມ (email + LINE Notify ຖ້າຕັ້ງ env)."""
+    """ແຈ້ງຮ້ານເມື່ອມີອໍເດີ/ສລິບ/ຂໍ້ຄວາມ (email + LINE Notify ຖ້າຕັ້ງ env).
+
+    Queues the message; delivery happens in `manage.py drain_notifications`."""
+    from .models import OutboxMessage
+
+    OutboxMessage.objects.bulk_create([
+        OutboxMessage(channel=channel, subject=subject[:200], body=body)
+        for channel in _channels()
+    ])
+
+
+def send_email(subject: str, body: str) -> None:
     email = getattr(settings, "NOTIFY_EMAIL", "") or settings.CONTACT_EMAIL
-    if email:
-        try:
-            send_mail(
-                subject,
-                body,
-                settings.DEFAULT_FROM_EMAIL,
-                [email],
-                fail_silently=False,
-            )
-        except Exception:
-            logger.exception("shop email notify failed")
+    send_mail(subject, body, settings.DEFAULT_FROM_EMAIL, [email], fail_silently=False)
+
 
+def send_line(subject: str, body: str) -> None:
     token = getattr(settings, "LINE_NOTIFY_TOKEN", "")
-    if not token:
-        return
+    data = parse.urlencode({"message": f"{subject}\n{body}"}).encode()
+    req = urlrequest.Request(
+        "https://notify-api.line.me/api/notify",
+        data=data,
+        headers={"Authorization": f"Bearer {token}"},
+        method="POST",
+    )
+    urlrequest.urlopen(req, timeout=10)
+
+
+SENDERS = {
+    "EMAIL": send_email,
+    "LINE": send_line,
+}
+
+
+def digest(messages) -> tuple[str, str]:
+    """One subject/body for a burst of messages."""
+    if len(messages) == 1:
+        return messages[0].subject, messages[0].body
+    subject = f"{len(messages)} ການແຈ້ງເຕືອນໃໝ່: " + ", ".join(m.subject for m in messages[:3])
+    if len(messages) > 3:
+        subject += ", …"
+    body = "\n\n".join(f"• {m.subject}\n{m.body}".rstrip() for m in messages)
+    return subject[:200], body
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(10 * 2 ** max(attempts - 1, 0), 1800))
+
+
+def _claim(channel: str, now) -> list:
+    from .models import OutboxMessage
+
+    batch_size = getattr(settings, "NOTIFY_BATCH_SIZE", 20)
+    window = timedelta(seconds=getattr(settings, "NOTIFY_COALESCE_SECONDS", 10))
+    with transaction.atomic():
+        due = OutboxMessage.objects.filter(
+            channel=channel, status=OutboxMessage.Status.PENDING, next_attempt_at__lte=now,
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        messages = list(due.order_by("created_at", "id")[:batch_size])
+        # Hold a young burst back so later messages join the same digest
+        if not messages or (len(messages) < batch_size and messages[0].created_at > now - window):
+            return []
+        OutboxMessage.objects.filter(id__in=[m.id for m in messages]).update(next_attempt_at=now + LEASE)
+    return messages
+
+
+def _deliver(channel: str, messages) -> bool:
+    from .models import OutboxMessage
+
+    subject, body = digest(messages)
+    ids = [m.id for m in messages]
     try:
-        data = parse.urlencode({"message": f"{subject}\n{body}"}).encode()
-        req = urlrequest.Request(
-            "https://notify-api.line.me/api/notify",
-            data=data,
-            headers={"Authorization": f"Bearer {token}"},
-            method="POST",
+        SENDERS[channel](subject, body)
+    except Exception as exc:
+        attempts = max(m.attempts for m in messages) + 1
+        max_attempts = getattr(settings, "NOTIFY_MAX_ATTEMPTS", 6)
+        failed = attempts >= max_attempts
+        OutboxMessage.objects.filter(id__in=ids).update(
+            attempts=attempts,
+            last_error=str(exc)[:2000],
+            status=OutboxMessage.Status.FAILED if failed else OutboxMessage.Status.PENDING,
+            next_attempt_at=timezone.now() + _retry_delay(attempts),
         )
-        urlrequest.urlopen(req, timeout=10)
-    except Exception:
-        logger.exception("LINE Notify failed")
+        logger.warning("%s notify failed (attempt %s%s): %s", channel, attempts, ", giving up" if failed else "", exc)
+        return False
+
+    sent_at = timezone.now()
+    for m in messages:
+        m.status = OutboxMessage.Status.SENT
+        m.attempts += 1
+        m.sent_at = sent_at
+        m.latency_ms = max(int((sent_at - m.created_at).total_seconds() * 1000), 0)
+    OutboxMessage.objects.bulk_update(messages, ["status", "attempts", "sent_at", "latency_ms"])
+    return True
+
+
+def drain_outbox() -> int:
+    """Deliver whatever is due on every channel; returns messages handled."""
+    from .models import OutboxMessage
+
+    handled = 0
+    now = timezone.now()
+    for channel in OutboxMessage.Channel.values:
+        messages = _claim(channel, now)
+        if messages:
+            _deliver(channel, messages)
+            handled += len(messages)
+    return handled
@@ -16,22 +16,32 @@ def supabase_project_url() -> str:
     return ""
 
 
-def upload_slip_to_supabase(uploaded_file, order_no: str) -> str:
-    """Upload slip to Supabase Storage when configured. Returns public URL or ''."""
+class SlipUploadError(Exception):
+    """Storage rejected or could not be reached — safe to retry."""
+
+
+def slip_storage_configured() -> bool:
+    return bool(supabase_project_url() and (getattr(settings, "SUPABASE_SERVICE_KEY", "") or "").strip())
+
+
+def slip_extension(filename: str) -> str:
+    ext = "jpg"
+    if filename and "." in filename:
+        ext = re.sub(r"[^a-z0-9]", "", filename.rsplit(".", 1)[-1].lower())[:8] or "jpg"
+    return ext
+
+
+def put_slip_object(data: bytes, path: str, content_type: str = "image/jpeg", timeout: int = 30) -> str:
+    """PUT ``data`` at ``path`` in the slip bucket (overwriting, so retries
+    of the same path are idempotent). Returns the public URL or raises
+    SlipUploadError."""
     base_url = supabase_project_url()
     service_key = (getattr(settings, "SUPABASE_SERVICE_KEY", "") or "").strip()
     bucket = getattr(settings, "SUPABASE_SLIP_BUCKET", "slips")
     if not base_url or not service_key:
-        return ""
+        raise SlipUploadError("slip storage is not configured")
 
-    ext = "jpg"
-    if uploaded_file.name and "." in uploaded_file.name:
-        ext = uploaded_file.name.rsplit(".", 1)[-1].lower()[:8] or "jpg"
-    path = f"{order_no}/{uuid.uuid4().hex}.{ext}"
     upload_url = f"{base_url}/storage/v1/object/{bucket}/{path}"
-
-    data = uploaded_file.read()
-    content_type = getattr(uploaded_file, "content_type", None) or "image/jpeg"
     req = urlrequest.Request(
         upload_url,
         data=data,
@@ -44,12 +54,27 @@ def upload_slip_to_supabase(uploaded_file, order_no: str) -> str:
         },
     )
     try:
-        with urlrequest.urlopen(req, timeout=30) as resp:
+        with urlrequest.urlopen(req, timeout=timeout) as resp:
             if resp.status not in (200, 201):
-                return ""
-    except error.HTTPError:
-        return ""
-    except error.URLError:
-        return ""
+                raise SlipUploadError(f"storage answered HTTP {resp.status}")
+    except error.HTTPError as exc:
+        raise SlipUploadError(f"storage answered HTTP {exc.code}") from exc
+    except (error.URLError, OSError) as exc:
+        raise SlipUploadError(f"storage unreachable: {exc}") from exc
 
     return f"{base_url}/storage/v1/object/public/{bucket}/{path}"
+
+
+def upload_slip_to_supabase(uploaded_file, order_no: str) -> str:
+    """Upload slip to Supabase Storage when configured. Returns public URL or ''.
+
+    Blocking — request handlers spool slips through apps.sales.slip_uploads
+    instead; this stays for scripts and the admin shell."""
+    if not slip_storage_configured():
+        return ""
+    path = f"{order_no}/{uuid.uuid4().hex}.{slip_extension(uploaded_file.name)}"
+    content_type = getattr(uploaded_file, "content_type", None) or "image/jpeg"
+    try:
+        return put_slip_object(uploaded_file.read(), path, content_type)
+    except SlipUploadError:
+        return ""
@@ -28,3 +28,349 @@ class StoreSmokeTests(TestCase):
         response = self.client.get(reverse("staff_dashboard"))
         self.assertEqual(response.status_code, 302)
         self.assertIn("/login/", response["Location"])
+
+
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        from django.core import mail
+
+        mail.outbox = []
+        overrides = self.settings(
+            EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+            NOTIFY_EMAIL="shop@example.com",
+            LINE_NOTIFY_TOKEN="",
+            NOTIFY_COALESCE_SECONDS=10,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _age(self, seconds):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from .models import OutboxMessage
+
+        OutboxMessage.objects.update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_notify_only_queues(self):
+        from django.core import mail
+
+        from .models import OutboxMessage
+        from .notifications import notify_shop
+
+        notify_shop("ອໍເດີໃໝ່ #1", "body")
+        self.assertEqual(OutboxMessage.objects.filter(channel="EMAIL", status="PENDING").count(), 1)
+        self.assertEqual(mail.outbox, [])
+
+    def test_burst_is_coalesced_into_digest(self):
+        from django.core import mail
+
+        from .models import OutboxMessage
+        from .notifications import drain_outbox, notify_shop
+
+        for i in range(3):
+            notify_shop(f"ອໍເດີໃໝ່ #{i}", "body")
+        self.assertEqual(drain_outbox(), 0)  # still inside the coalescing window
+        self._age(30)
+        self.assertEqual(drain_outbox(), 3)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn("3", mail.outbox[0].subject)
+        sent = OutboxMessage.objects.filter(status="SENT")
+        self.assertEqual(sent.count(), 3)
+        self.assertTrue(all(m.latency_ms >= 30000 for m in sent))
+
+    def test_failure_backs_off(self):
+        from unittest import mock
+
+        from .models import OutboxMessage
+        from .notifications import SENDERS, drain_outbox, notify_shop
+
+        notify_shop("ສະລິບໃໝ່", "body")
+        self._age(30)
+        with mock.patch.dict(SENDERS, EMAIL=mock.Mock(side_effect=OSError("smtp down"))):
+            with self.assertLogs("apps.store.notifications", "WARNING"):
+                drain_outbox()
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.status, message.attempts), ("PENDING", 1))
+        self.assertEqual(drain_outbox(), 0)  # waiting out the backoff
+
+    def test_worker_loop_survives_errors(self):
+        import io
+        from unittest import mock
+
+        from django.core.management import call_command
+        from django.db import OperationalError
+
+        from .management.commands import drain_notifications as command
+
+        passes = mock.Mock(side_effect=[OperationalError("server closed the connection"), 0, KeyboardInterrupt])
+        with mock.patch.object(command, "drain_outbox", passes), mock.patch.object(command.time, "sleep"), \
+                self.assertLogs("apps.store.notifications", "ERROR"):
+            call_command("drain_notifications", stdout=io.StringIO())
+        self.assertEqual(passes.call_count, 3)
+
+    def test_checkout_queues_notification(self):
+        from django.contrib.auth import get_user_model
+
+        from apps.catalog.models import Category, Product
+
+        from .models import OutboxMessage
+
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        product = Product.objects.create(category=Category.objects.create(name="M"), name="P", price=10, stock_qty=5)
+        client = Client(HTTP_HOST="127.0.0.1")
+        client.force_login(user)
+        client.get(reverse("store_add_to_cart", args=[product.id]))
+        client.post(reverse("store_checkout"), {"order_type": "buy", "customer_name": "Noy", "phone": "020"})
+        self.assertTrue(OutboxMessage.objects.filter(subject__startswith="ອໍເດີໃໝ່").exists())
+
+
+def shared_cart_cache(test):
+    """Settings override giving carts a cache all workers would share
+    (FileBasedCache), i.e. the write-behind mode."""
+    import tempfile
+
+    from django.conf import settings
+
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    carts = {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": tmp.name}
+    return test.settings(CACHES={**settings.CACHES, "carts": carts}, CART_CACHE_ALIAS="carts")
+
+
+class CartStoreTests(TestCase):
+    def setUp(self):
+        from django.core.cache import caches
+        from django.conf import settings
+
+        from apps.catalog.models import Category, Product
+
+        caches[settings.CART_CACHE_ALIAS].clear()
+        category = Category.objects.create(name="M")
+        self.a = Product.objects.create(category=category, name="A", price=10, stock_qty=5)
+        self.b = Product.objects.create(category=category, name="B", price=20, stock_qty=5)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+
+    def test_encoding_round_trip_and_garbage(self):
+        from .cart_store import decode, encode
+
+        self.assertEqual(decode(encode({3: 2, 15: 1})), {3: 2, 15: 1})
+        self.assertEqual(decode("0:3x2"), {})
+        self.assertEqual(decode("1:3x2.bad.4x0.5x-1"), {3: 2})
+
+    def test_anonymous_cart_lives_in_signed_cookie(self):
+        from django.contrib.sessions.models import Session
+
+        with self.assertNumQueries(0):
+            self.client.get(reverse("store_add_to_cart", args=[self.a.id]))
+        self.client.get(reverse("store_add_to_cart", args=[self.a.id]))
+        self.assertIn("cart_store", self.client.cookies)
+        self.assertFalse(Session.objects.exists())
+        response = self.client.get(reverse("store_cart"))
+        self.assertEqual([(i["product"].id, i["qty"]) for i in response.context["items"]], [(self.a.id, 2)])
+
+        self.client.cookies["cart_store"] = self.client.cookies["cart_store"].value + "x"
+        self.assertEqual(self.client.get(reverse("store_cart")).context["items"], [])
+
+    def test_logged_in_clicks_do_not_write_db_every_time(self):
+        from django.contrib.auth import get_user_model
+
+        from .models import SavedCart
+
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        self.client.force_login(user)
+        shared = shared_cart_cache(self)
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self.client.get(reverse("store_add_to_cart", args=[self.a.id]))
+        self.assertEqual(SavedCart.objects.get(user=user).data, "1:%d" % self.a.id + "x1")
+        with self.settings(CART_DB_SYNC_SECONDS=3600):
+            self.client.get(reverse("store_add_to_cart", args=[self.b.id]))
+            self.client.get(reverse("store_add_to_cart", args=[self.b.id]))
+        # Still the first snapshot; the live cart is in the cache
+        self.assertEqual(SavedCart.objects.get(user=user).data, "1:%dx1" % self.a.id)
+        items = self.client.get(reverse("store_cart")).context["items"]
+        self.assertEqual({i["product"].id: i["qty"] for i in items}, {self.a.id: 1, self.b.id: 2})
+
+        self.client.get(reverse("store_clear_cart"))
+        self.assertFalse(SavedCart.objects.exists())
+
+    def test_unsynced_carts_written_back_on_exit(self):
+        from django.contrib.auth import get_user_model
+
+        from .cart_store import flush_pending
+        from .models import SavedCart
+
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        self.client.force_login(user)
+        self.enterContext(shared_cart_cache(self))
+        self.client.get(reverse("store_add_to_cart", args=[self.a.id]))
+        with self.settings(CART_DB_SYNC_SECONDS=3600):
+            self.client.get(reverse("store_add_to_cart", args=[self.b.id]))
+        self.assertEqual(SavedCart.objects.get(user=user).data, "1:%dx1" % self.a.id)
+        self.assertEqual(flush_pending(), 1)
+        self.assertEqual(SavedCart.objects.get(user=user).data, "1:%dx1.%dx1" % (self.a.id, self.b.id))
+        self.assertEqual(flush_pending(), 0)
+
+    def test_badge_after_cache_loss_reads_the_row(self):
+        from django.contrib.auth import get_user_model
+
+        from .cart_store import StoredCarts
+        from .models import SavedCart
+
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        SavedCart.objects.create(user=user, name="store", data="1:%dx3" % self.a.id)
+        self.client.force_login(user)
+        self.enterContext(shared_cart_cache(self))
+        response = self.client.get(reverse("store_about"))
+        self.assertContains(response, 'data-cart-count="store">3</span>')
+        self.assertIsNotNone(StoredCarts.cache().get(StoredCarts(user).key("store")))
+
+    def test_per_process_cache_writes_through(self):
+        from django.conf import settings
+        from django.contrib.auth import get_user_model
+        from django.core.cache import caches
+
+        from .models import SavedCart
+
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        self.client.force_login(user)
+        with self.settings(CART_DB_SYNC_SECONDS=3600):
+            self.client.get(reverse("store_add_to_cart", args=[self.a.id]))
+            self.client.get(reverse("store_add_to_cart", args=[self.b.id]))
+        self.assertEqual(SavedCart.objects.get(user=user).data, "1:%dx1.%dx1" % (self.a.id, self.b.id))
+        # A restarted (or another) worker has an empty LocMem cache
+        caches[settings.CART_CACHE_ALIAS].clear()
+        items = self.client.get(reverse("store_cart")).context["items"]
+        self.assertEqual({i["product"].id: i["qty"] for i in items}, {self.a.id: 1, self.b.id: 1})
+
+    def test_nav_badge_reads_saved_cart_once(self):
+        from django.contrib.auth import get_user_model
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .models import SavedCart
+
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        SavedCart.objects.create(user=user, name="store", data="1:%dx3" % self.a.id)
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("store_about"))
+        self.assertContains(response, 'data-cart-count="store">3</span>')
+        self.assertEqual(sum(SavedCart._meta.db_table in q["sql"] for q in queries.captured_queries), 1)
+
+    def test_cookie_cart_merged_on_login(self):
+        from django.contrib.auth import get_user_model
+
+        from .models import SavedCart
+
+        user = get_user_model().objects.create_user("cus", "cus@example.com", "pw")
+        SavedCart.objects.create(user=user, name="store", data="1:%dx1" % self.a.id)
+        self.client.get(reverse("store_add_to_cart", args=[self.a.id]))
+        self.client.get(reverse("store_add_to_cart", args=[self.b.id]))
+        response = self.client.post(reverse("store_login"), {"username": "cus", "password": "pw"})
+        self.assertEqual(response.cookies["cart_store"].value, "")
+
+        items = self.client.get(reverse("store_cart")).context["items"]
+        self.assertEqual({i["product"].id: i["qty"] for i in items}, {self.a.id: 2, self.b.id: 1})
+
+
+class CartApiTests(TestCase):
+    def setUp(self):
+        from django.conf import settings
+        from django.core.cache import caches
+
+        from apps.catalog.models import Category, Product
+
+        caches[settings.CART_CACHE_ALIAS].clear()
+        category = Category.objects.create(name="M")
+        self.a = Product.objects.create(category=category, name="A", price=10000, stock_qty=5)
+        self.b = Product.objects.create(category=category, name="B", price=2500, stock_qty=5)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+
+    def _post(self, cart, action, **data):
+        return self.client.post(reverse("cart_api_action", args=[cart, action]), data)
+
+    def test_add_set_remove_return_totals_and_deltas(self):
+        data = self._post("store", "add", product_id=self.a.id, qty=2).json()
+        self.assertEqual((data["count"], data["total_display"]), (2, "20,000"))
+        self.assertEqual(data["changed"], [{"product_id": self.a.id, "qty": 2, "line_total": "20000.00"}])
+
+        self._post("store", "add", product_id=self.b.id)
+        data = self._post("store", "set", product_id=self.a.id, qty=1).json()
+        self.assertEqual(data["total_display"], "12,500")
+        self.assertEqual([c["product_id"] for c in data["changed"]], [self.a.id])
+
+        data = self._post("store", "remove", product_id=self.b.id).json()
+        self.assertEqual(data["changed"], [{"product_id": self.b.id, "qty": 0, "line_total": 0}])
+        self.assertEqual(self.client.get(reverse("cart_api", args=["store"])).json()["count"], 1)
+
+    def test_partial_html_and_errors(self):
+        response = self.client.post(
+            reverse("cart_api_action", args=["store", "add"]) + "?partial=1", {"product_id": self.a.id},
+        )
+        self.assertIn("mz-cart-item", response.json()["html"])
+        self.assertEqual(self._post("store", "add", product_id=999).status_code, 404)
+        self.assertEqual(self._post("store", "add").status_code, 400)
+        self.assertEqual(self._post("pos", "add", product_id=self.a.id).status_code, 403)
+        self.assertEqual(self.client.get(reverse("cart_api", args=["store"])).json()["count"], 1)
+
+    def test_json_body_must_be_an_object(self):
+        url = reverse("cart_api_action", args=["store", "add"])
+        for body in ("[1]", "3", '"x"', "null", "{bad"):
+            response = self.client.post(url, body, content_type="application/json")
+            self.assertEqual(response.status_code, 400, body)
+        response = self.client.post(url, {"product_id": self.a.id, "qty": 2}, content_type="application/json")
+        self.assertEqual(response.json()["count"], 2)
+
+    def test_pos_cart_updates_in_place(self):
+        from django.contrib.auth import get_user_model
+
+        user = get_user_model().objects.create_user("till", "till@example.com", "pw", is_staff=True)
+        self.client.force_login(user)
+        shared = shared_cart_cache(self)
+        shared.enable()
+        self.addCleanup(shared.disable)
+        self._post("pos", "add", product_id=self.a.id)
+        with self.assertNumQueries(3):  # session, user, cart products
+            response = self.client.post(
+                reverse("cart_api_action", args=["pos", "add"]) + "?partial=1", {"product_id": self.a.id},
+            )
+        self.assertEqual(response.json()["count"], 2)
+        self.assertIn('data-cart-action="add"', response.json()["html"])
+        self.assertEqual(self._post("pos", "clear").json()["lines"], [])
+
+
+class CartPricingTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import RequestFactory
+
+        from apps.catalog.models import Category, Product
+
+        category = Category.objects.create(name="M")
+        self.a = Product.objects.create(category=category, name="A", price=10000, stock_qty=1)
+        self.b = Product.objects.create(category=category, name="B", price=2500, stock_qty=5)
+        self.hidden = Product.objects.create(category=category, name="H", price=1, stock_qty=5, is_active=False)
+        self.request = RequestFactory().get("/")
+        self.request.user = AnonymousUser()
+
+    def test_one_pass_with_stock_and_deposit(self):
+        from .cart_pricing import price_cart
+        from .cart_store import get_cart
+
+        cart = get_cart(self.request, "store")
+        cart.set(self.a.id, 2)
+        cart.set(self.b.id, 1)
+        cart.set(self.hidden.id, 1)
+        with self.assertNumQueries(1):
+            priced = price_cart(self.request, "store")
+            self.assertIs(price_cart(self.request, "store"), priced)
+        self.assertEqual((priced.total, priced.count, priced.deposit_preview), (22500, 3, 11250))
+        self.assertEqual([(i["product"].id, i["shortfall"]) for i in priced.out_of_stock], [(self.a.id, 1)])
+
+        # The POS may ring up hidden products; products are not re-fetched
+        get_cart(self.request, "pos").merge(cart.lines)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(price_cart(self.request, "pos").items), 3)
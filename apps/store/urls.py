@@ -1,14 +1,17 @@
 from django.urls import path
-from . import views
+from . import cart_api, views
 
 urlpatterns = [
     path('', views.store_home, name='store_home'),
     path('shop/', views.store_shop, name='store_shop'),
+    path('shop/more/', views.store_shop_more, name='store_shop_more'),
     path('product/<int:product_id>/', views.store_product_detail, name='store_product_detail'),
     path('cart/', views.store_cart, name='store_cart'),
     path('cart/add/<int:product_id>/', views.store_add_to_cart, name='store_add_to_cart'),
     path('cart/remove/<int:product_id>/', views.store_remove_one, name='store_remove_one'),
     path('cart/clear/', views.store_clear_cart, name='store_clear_cart'),
+    path('cart/api/<str:name>/', cart_api.cart_api, name='cart_api'),
+    path('cart/api/<str:name>/<str:action>/', cart_api.cart_api, name='cart_api_action'),
     path('checkout/', views.store_checkout, name='store_checkout'),
     path('order/<int:order_id>/pay/', views.store_confirm_payment, name='store_confirm_payment'),
     
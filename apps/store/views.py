@@ -1,4 +1,6 @@
+import hashlib
 from decimal import Decimal
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import login, logout, authenticate
@@ -6,118 +8,165 @@ from django.contrib.auth.decorators import login_required
 from django.db import DatabaseError, transaction
 from django.utils.timezone import now
 
+from apps.catalog.cache import cached, is_cached
 from apps.catalog.models import Category, Product
-from apps.sales.models import Customer, Order, OrderItem, Bill
+from apps.sales.models import Customer, Order, Bill
+from config.metrics import CHECKOUTS, SLIPS
+from config.query_budget import query_budget
+from .cart_pricing import RESERVE_DEPOSIT_RATE, RESERVE_EXPIRE_DAYS, price_cart
+from .cart_store import get_cart
 
-def get_store_cart(request):
-    cart = request.session.get("store_cart", {})
-    cart_items = []
-    total = Decimal("0")
-    
-    product_ids = cart.keys()
-    cart_products = {str(p.id): p for p in Product.objects.filter(id__in=product_ids, is_active=True)}
-    
-    for pid, qty in cart.items():
-        if pid in cart_products:
-            p = cart_products[pid]
-            line_total = p.price * qty
-            total += line_total
-            cart_items.append({
-                "product": p,
-                "qty": qty,
-                "unit_price": p.price,
-                "line_total": line_total
-            })
-            
-    return cart_items, total
+def _featured_products():
+    return list(Product.objects.filter(is_active=True).select_related("category")[:4])
+
+
+def _shop_page(q, cat_slug, ordering, cursor):
+    from apps.catalog.pagination import keyset_page, list_page
+    from apps.catalog.search import search_product_ids
+
+    products = Product.objects.filter(is_active=True).select_related("category")
+    if cat_slug:
+        products = products.filter(category__slug=cat_slug)
+    if not q:
+        return keyset_page(products, ordering, cursor, settings.SHOP_PAGE_SIZE)
+    page = list_page(search_product_ids(q, products), cursor, settings.SHOP_PAGE_SIZE)
+    by_id = {p.id: p for p in products.filter(id__in=page.items)}
+    page.items = [by_id[pid] for pid in page.items if pid in by_id]
+    return page
+
+
+def _shop_page_key(cat_slug, ordering):
+    # Hash the slug so cache keys stay short and whitespace-free
+    return "shop:" + hashlib.sha1(f"{cat_slug}|{ordering}".encode()).hexdigest()
+
+
+def _categories():
+    return list(Category.objects.all())
+
+
+def _landing_entries():
+    """(cache key, builder) of what /, /shop/ and its first page read."""
+    from apps.catalog.pagination import normalize_ordering
+
+    ordering = normalize_ordering(None)
+    return [
+        ("home:featured", _featured_products),
+        ("categories", _categories),
+        (_shop_page_key(None, ordering), lambda: _shop_page(None, None, ordering, "")),
+    ]
+
+
+def warm_catalog_cache() -> int:
+    """Build the landing-page catalog entries this worker does not hold yet
+    (readiness probe, startup warm-up). Returns how many were cold."""
+    cold = 0
+    for key, builder in _landing_entries():
+        if not is_cached(key):
+            cold += 1
+            cached(key, builder)
+    return cold
+
+
+def _shop_context(request):
+    """Shared by the full shop page and the infinite-scroll fragment."""
+    from urllib.parse import urlencode
+    from apps.catalog.pagination import Page, normalize_ordering
+
+    q = request.GET.get('q')
+    cat_slug = request.GET.get('category')
+    ordering = normalize_ordering(request.GET.get('sort'))
+    cursor = request.GET.get('after', '')
+    try:
+        # Only first pages of a category are cached: search text and cursors
+        # come straight from the URL and would grow the key space unbounded
+        if q or cursor:
+            page = _shop_page(q, cat_slug, ordering, cursor)
+        else:
+            page = cached(_shop_page_key(cat_slug, ordering), lambda: _shop_page(None, cat_slug, ordering, ""))
+    except DatabaseError:
+        page = Page()
+
+    next_query = ""
+    if page.has_next:
+        params = {k: v for k, v in (("q", q), ("category", cat_slug)) if v}
+        if ordering != "name":
+            params["sort"] = ordering
+        params["after"] = page.next_cursor
+        next_query = urlencode(params)
+
+    return {
+        "products": page.items,
+        "next_query": next_query,
+        "active_category": cat_slug,
+        "sort": ordering,
+        "q": q or "",
+    }
 
+
+@query_budget(4)
 def store_home(request):
     try:
-        featured_products = list(Product.objects.filter(is_active=True)[:4])
+        featured_products = cached("home:featured", _featured_products)
     except DatabaseError:
         # Avoid hard 500 when Supabase/Render DB is briefly unreachable
         featured_products = []
     return render(request, "store/home.html", {"featured_products": featured_products})
 
+@query_budget(6)
 def store_shop(request):
-    q = request.GET.get('q')
-    cat_slug = request.GET.get('category')
+    context = _shop_context(request)
     try:
-        products = Product.objects.filter(is_active=True)
-        categories = Category.objects.all()
-        if q:
-            products = products.filter(name__icontains=q)
-        if cat_slug:
-            products = products.filter(category__slug=cat_slug)
-        products = list(products)
-        categories = list(categories)
+        context["categories"] = cached("categories", _categories)
     except DatabaseError:
-        products = []
-        categories = []
+        context["categories"] = []
+    return render(request, "store/shop.html", context)
 
-    return render(request, "store/shop.html", {
-        "products": products,
-        "categories": categories,
-        "active_category": cat_slug,
-        "q": q or ""
-    })
+def store_shop_more(request):
+    """Next page of product cards for infinite scroll (HTML fragment)."""
+    return render(request, "store/_shop_page.html", _shop_context(request))
 
 def store_product_detail(request, product_id):
-    product = get_object_or_404(Product, id=product_id, is_active=True)
+    product = get_object_or_404(Product.objects.select_related("category"), id=product_id, is_active=True)
     return render(request, "store/product_detail.html", {"product": product})
 
+@query_budget(4)
 def store_cart(request):
-    cart_items, total = get_store_cart(request)
+    cart_items, total = price_cart(request, "store")
     return render(request, "store/cart.html", {
         "items": cart_items, 
         "total": total
     })
 
 def store_add_to_cart(request, product_id):
-    cart = request.session.get("store_cart", {})
-    pid = str(product_id)
-    cart[pid] = cart.get(pid, 0) + 1
-    request.session["store_cart"] = cart
+    get_cart(request, "store").add(product_id)
     messages.success(request, "ເພີ່ມລົງກະຕ່າສຳເລັດແລ້ວ")
     return redirect("store_cart")
 
 def store_remove_one(request, product_id):
-    cart = request.session.get("store_cart", {})
-    pid = str(product_id)
-    if pid in cart:
-        cart[pid] -= 1
-        if cart[pid] <= 0:
-            del cart[pid]
-    request.session["store_cart"] = cart
+    get_cart(request, "store").add(product_id, -1)
     return redirect("store_cart")
 
 def store_clear_cart(request):
-    request.session["store_cart"] = {}
+    get_cart(request, "store").clear()
     return redirect("store_cart")
 
-RESERVE_DEPOSIT_RATE = Decimal("0.5")
-RESERVE_EXPIRE_DAYS = 7
-
-
 @login_required(login_url="store_login")
 @transaction.atomic
 def store_checkout(request):
     from datetime import timedelta
     from django.utils import timezone
-    from apps.sales.models import Reserved
 
-    cart_items, total = get_store_cart(request)
+    priced = price_cart(request, "store")
+    cart_items, total = priced
     if not cart_items:
         messages.error(request, "ກະຕ່າຂອງທ່ານວ່າງເປົ່າ")
         return redirect("store_shop")
         
     if request.method == "POST":
-        from apps.catalog.stock import check_stock
-
         order_type = request.POST.get("order_type", "buy")
 
         if order_type != "reserve":
-            insufficient = check_stock(cart_items)
+            insufficient = priced.out_of_stock
             if insufficient:
                 names = ", ".join(item["product"].name for item in insufficient)
                 messages.error(
@@ -143,40 +192,17 @@ def store_checkout(request):
             customer.address = request.POST.get("address", customer.address)
             customer.save()
 
-        is_reserve = order_type == "reserve"
-        order = Order.objects.create(
-            customer=customer,
-            status=Order.Status.RESERVED if is_reserve else Order.Status.PENDING,
-        )
-
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item["product"],
-                quantity=item["qty"],
-                price=item["unit_price"],
-                subtotal=item["line_total"]
-            )
+        from apps.sales.order_builder import build_order, rate_deposit
 
-        if is_reserve:
-            deposit_total = (total * RESERVE_DEPOSIT_RATE).quantize(Decimal("1"))
-            expire_at = timezone.now() + timedelta(days=RESERVE_EXPIRE_DAYS)
-            for item in cart_items:
-                line_deposit = (item["line_total"] * RESERVE_DEPOSIT_RATE).quantize(Decimal("0.01"))
-                Reserved.objects.create(
-                    order=order,
-                    product=item["product"],
-                    quantity=item["qty"],
-                    deposit_amount=line_deposit,
-                    remain_amount=(item["line_total"] - line_deposit).quantize(Decimal("0.01")),
-                    status=Reserved.Status.RESERVED,
-                    expire_at=expire_at,
-                )
-            bill = Bill.objects.create(
-                order=order,
-                total_amount=total,
+        if order_type == "reserve":
+            deposit_total = priced.deposit_preview
+            built = build_order(
+                cart_items,
+                status=Order.Status.RESERVED,
+                customer=customer,
                 balance_due=deposit_total,
-                status=Bill.Status.PENDING,
+                reserve_until=timezone.now() + timedelta(days=RESERVE_EXPIRE_DAYS),
+                line_deposit=rate_deposit(RESERVE_DEPOSIT_RATE),
             )
             messages.info(
                 request,
@@ -185,24 +211,26 @@ def store_checkout(request):
         else:
             # Stock is only removed once staff approves the payment slip
             # (see verify_slip) — not at checkout time.
-            bill = Bill.objects.create(
-                order=order,
-                total_amount=total,
-                balance_due=total,
-                status=Bill.Status.PENDING
-            )
+            built = build_order(cart_items, status=Order.Status.PENDING, customer=customer)
+        order = built.order
+        CHECKOUTS.inc(channel="web", kind="reserve" if order_type == "reserve" else "buy")
+
+        from .notifications import notify_shop
+
+        kind = "ຈອງ" if order.status == Order.Status.RESERVED else "ສັ່ງຊື້"
+        notify_shop(
+            f"ອໍເດີໃໝ່ #{order.id} ({kind})",
+            f"{customer.cus_name} · {customer.cus_tel}\nຍອດລວມ {int(built.total):,} ກີບ · {len(built.items)} ລາຍການ",
+        )
 
-        request.session["store_cart"] = {}
+        get_cart(request, "store").clear()
         return redirect("store_confirm_payment", order_id=order.id)
         
-    from apps.catalog.stock import check_stock
-
     customer = getattr(request.user, "customer_profile", None)
     customer_name = customer.cus_name if customer else request.user.first_name
     phone = customer.cus_tel if customer else ""
     address = customer.address if customer else ""
-    deposit_preview = (total * RESERVE_DEPOSIT_RATE).quantize(Decimal("1"))
-    out_of_stock_items = check_stock(cart_items)
+    out_of_stock_items = priced.out_of_stock
 
     return render(request, "store/checkout.html", {
         "items": cart_items,
@@ -210,16 +238,15 @@ def store_checkout(request):
         "customer_name": customer_name,
         "phone": phone,
         "address": address,
-        "deposit_preview": deposit_preview,
+        "deposit_preview": priced.deposit_preview,
         "reserve_expire_days": RESERVE_EXPIRE_DAYS,
         "has_out_of_stock": bool(out_of_stock_items),
         "out_of_stock_names": ", ".join(i["product"].name for i in out_of_stock_items),
     })
 
 from decimal import Decimal, InvalidOperation
-from django.conf import settings
 from apps.sales.models import Payment
-from .slip_storage import upload_slip_to_supabase
+from .slip_storage import slip_storage_configured
 
 @login_required(login_url="store_login")
 def store_confirm_payment(request, order_id):
@@ -239,33 +266,48 @@ def store_confirm_payment(request, order_id):
             messages.error(request, "ຈຳນວນເງິນບໍ່ຖືກຕ້ອງ")
             return redirect("store_confirm_payment", order_id=order.id)
 
-        public_url = upload_slip_to_supabase(slip_image, f"order_{order.id}")
-        if not public_url:
+        if not slip_storage_configured():
             messages.error(request, "ອັບໂຫຼດຮູບບໍ່ສຳເລັດ — ລະບົບຍັງບໍ່ທັນຕັ້ງຄ່າ ຫຼື ເກີດຂໍ້ຜິດພາດ, ກະລຸນາລອງໃໝ່")
             return redirect("store_confirm_payment", order_id=order.id)
 
-        Payment.objects.create(
-            bill=order.bill,
-            pay_amount=paid_amount,
-            pay_with=Payment.PayWith.TRANSFER,
-            slip_url=public_url
-        )
+        from apps.sales.rollup import record_bill_change
+        from apps.sales.slip_uploads import enqueue_slip
 
-        # Record payment on the bill; order stays PENDING until staff verifies
-        bill = order.bill
-        bill.paid_amount = (bill.paid_amount or Decimal("0")) + paid_amount
-        bill.balance_due = max(bill.total_amount - bill.paid_amount, Decimal("0"))
-        if bill.paid_amount >= bill.total_amount:
-            bill.status = Bill.Status.PAID
-        elif bill.paid_amount > 0:
-            bill.status = Bill.Status.PARTIAL
-        bill.save()
-
-        # Reserved orders stay RESERVED after deposit is paid — staff completes
-        # them when the customer picks up and pays the remainder in person.
-        if order.status != Order.Status.RESERVED:
-            order.status = Order.Status.PENDING
-        order.save()
+        # The image is spooled to disk and pushed to storage by the
+        # process_slip_uploads worker; the payment exists right away.
+        with transaction.atomic():
+            payment = Payment.objects.create(
+                bill=order.bill,
+                pay_amount=paid_amount,
+                pay_with=Payment.PayWith.TRANSFER,
+            )
+            enqueue_slip(payment, slip_image)
+
+            # Record payment on the bill; order stays PENDING until staff verifies
+            bill = order.bill
+            old_status = bill.status
+            bill.paid_amount = (bill.paid_amount or Decimal("0")) + paid_amount
+            bill.balance_due = max(bill.total_amount - bill.paid_amount, Decimal("0"))
+            if bill.paid_amount >= bill.total_amount:
+                bill.status = Bill.Status.PAID
+            elif bill.paid_amount > 0:
+                bill.status = Bill.Status.PARTIAL
+            bill.save()
+            record_bill_change(bill, old_status)
+
+            # Reserved orders stay RESERVED after deposit is paid — staff completes
+            # them when the customer picks up and pays the remainder in person.
+            if order.status != Order.Status.RESERVED:
+                order.status = Order.Status.PENDING
+            order.save()
+
+            from .notifications import notify_shop
+
+            notify_shop(
+                f"ສະລິບໃໝ່ ອໍເດີ #{order.id}",
+                f"ຈ່າຍ {int(paid_amount):,} ກີບ — ກວດທີ່ /staff/slips/",
+            )
+        SLIPS.inc(event="submitted")
 
         if order.status == Order.Status.RESERVED:
             messages.success(
@@ -376,9 +418,13 @@ def store_logout(request):
 
 
 @login_required(login_url="store_login")
+@query_budget(6)
 def store_account(request):
     profile = getattr(request.user, "customer_profile", None)
-    orders = Order.objects.filter(customer=profile).order_by("-order_date")[:5] if profile else []
+    orders = (
+        Order.objects.filter(customer=profile).select_related("bill").order_by("-order_date")[:5]
+        if profile else []
+    )
     return render(request, "store/account.html", {
         "profile": profile,
         "orders": orders,
@@ -386,6 +432,7 @@ def store_account(request):
 
 
 @login_required(login_url="store_login")
+@query_budget(6)
 def store_account_orders(request):
     profile = getattr(request.user, "customer_profile", None)
     orders = (
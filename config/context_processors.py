@@ -28,3 +28,11 @@ def site_context(request):
         # {% if active_testimonials %} guards in templates stay safe.
         "active_testimonials": [],
     }
+
+
+def cart_context(request):
+    """Item count for the nav cart badge. Lazy; at most one query, and none
+    with a shared cart cache (see peek_count)."""
+    from apps.store.cart_store import peek_count
+
+    return {"cart_count": lambda: peek_count(request, "store")}
@@ -57,8 +57,14 @@ def configure_databases(base_dir: Path, debug: bool) -> dict:
         is_pooler = "pooler.supabase.com" in host or port == 6543
         cfg["CONN_MAX_AGE"] = 0 if is_pooler else 60
         cfg["CONN_HEALTH_CHECKS"] = True
+        # Transaction-mode pooling (:6543) cannot keep a cursor open between
+        # statements; .iterator() then falls back to chunked client fetches
+        cfg["DISABLE_SERVER_SIDE_CURSORS"] = port == 6543
         opts = cfg.setdefault("OPTIONS", {})
         opts.setdefault("sslmode", "require")
+        # Fail fast instead of hanging a request (or the /readyz/ probe)
+        # on an unreachable database; libpq waits forever by default
+        opts.setdefault("connect_timeout", int(os.getenv("DB_CONNECT_TIMEOUT", "10")))
     else:
         cfg = dj_database_url.parse(db_url)
 
@@ -1,6 +1,44 @@
-from django.http import HttpResponse
+"""Liveness and readiness probes.
+
+- /healthz/ — the process answers. Never touches the database; it is the
+  Render health check, so Render does not restart an instance just because
+  the database or a queue is slow.
+- /readyz/ — the instance can serve a shop page quickly: the database
+  answers within READYZ_DB_TIMEOUT_MS, every migration is applied, the
+  landing-page catalog cache is built (a cold one is filled here, so the
+  probe itself warms the worker) and the background queues are moving.
+  Database and migrations decide readiness (503 when either fails); cache
+  and queues only mark the result "degraded". A passing result is reused
+  for READYZ_CACHE_SECONDS so frequent probes stay cheap. The Cloudflare
+  worker and the wake page wait on it before sending customers in.
+
+The probe is public, so the response only names each check with pass/fail
+and its time; why a check failed goes to the log.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.http import require_http_methods
 
+logger = logging.getLogger(__name__)
+
+CRITICAL = ("database", "migrations")
+
+_lock = threading.Lock()
+_last: tuple[float, dict] | None = None
+_migrated = False
+
+
+def _cors(response):
+    response["Cache-Control"] = "no-store"
+    response["Access-Control-Allow-Origin"] = "*"
+    response["Access-Control-Allow-Methods"] = "GET, HEAD, OPTIONS"
+    return response
+
 
 @require_http_methods(["GET", "HEAD", "OPTIONS"])
 def healthz(request):
@@ -8,7 +46,107 @@ def healthz(request):
         response = HttpResponse()
     else:
         response = HttpResponse("ok", content_type="text/plain")
-    response["Cache-Control"] = "no-store"
-    response["Access-Control-Allow-Origin"] = "*"
-    response["Access-Control-Allow-Methods"] = "GET, HEAD, OPTIONS"
-    return response
+    return _cors(response)
+
+
+def _check_database() -> None:
+    from django.db import connection, transaction
+
+    timeout_ms = int(getattr(settings, "READYZ_DB_TIMEOUT_MS", 2000))
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def _check_migrations() -> None:
+    global _migrated
+    if _migrated:  # nothing un-applies them while this process runs
+        return
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise RuntimeError(f"{len(plan)} unapplied: {plan[0][0]}")
+    _migrated = True
+
+
+def _check_cache() -> None:
+    from apps.store.views import warm_catalog_cache
+
+    warm_catalog_cache()
+
+
+def _check_queues() -> None:
+    from config.metrics import queue_backlog
+
+    max_age = int(getattr(settings, "READYZ_QUEUE_MAX_AGE", 600))
+    backlog = queue_backlog()
+    detail = ", ".join(f"{queue} {n} pending (oldest {age:.0f}s)" for queue, (n, age) in backlog.items())
+    if any(age > max_age for _, age in backlog.values()):
+        raise RuntimeError(detail)
+
+
+CHECKS = (
+    ("database", _check_database),
+    ("migrations", _check_migrations),
+    ("cache", _check_cache),
+    ("queues", _check_queues),
+)
+
+
+def run_checks() -> dict:
+    checks = {}
+    for name, check in CHECKS:
+        if name != "database" and not checks["database"]["ok"]:
+            checks[name] = {"ok": False, "ms": 0}  # skipped
+            continue
+        start = time.perf_counter()
+        try:
+            check()
+            ok = True
+        except Exception:
+            logger.warning("readiness check %s failed", name, exc_info=True)
+            ok = False
+        checks[name] = {"ok": ok, "ms": round((time.perf_counter() - start) * 1000, 1)}
+    if not all(checks[name]["ok"] for name in CRITICAL):
+        status = "fail"
+    elif all(check["ok"] for check in checks.values()):
+        status = "ok"
+    else:
+        status = "degraded"
+    return {"status": status, "checks": checks}
+
+
+def readiness() -> tuple[dict, float]:
+    """The last passing result while it is fresh, else a new run (one at a
+    time; concurrent probes wait and share it). Returns (result, age)."""
+    global _last
+    ttl = float(getattr(settings, "READYZ_CACHE_SECONDS", 5))
+    with _lock:
+        now = time.monotonic()
+        if _last is not None and now - _last[0] < ttl:
+            return _last[1], now - _last[0]
+        result = run_checks()
+        # A failing instance is re-checked on the next probe
+        _last = (time.monotonic(), result) if result["status"] != "fail" else None
+        return result, 0.0
+
+
+def reset() -> None:
+    global _last, _migrated
+    with _lock:
+        _last = None
+        _migrated = False
+
+
+@require_http_methods(["GET", "HEAD", "OPTIONS"])
+def readyz(request):
+    if request.method == "OPTIONS":
+        return _cors(HttpResponse())
+    result, age = readiness()
+    response = JsonResponse({**result, "age_s": round(age, 1)}, status=503 if result["status"] == "fail" else 200)
+    return _cors(response)
@@ -0,0 +1,208 @@
+"""Production handler for /media/ (uploaded product photos and other files).
+
+django.views.static.serve reads every file through the worker on every
+hit and sends nothing a browser or CDN can cache against. serve_media():
+
+- answers If-None-Match / If-Modified-Since with 304 (ETag from mtime+size);
+- honours a single ``Range: bytes=…`` (206, or 416 when unsatisfiable),
+  including If-Range;
+- hands the open file to the WSGI server, so gunicorn sends it with
+  os.sendfile — or, with MEDIA_SENDFILE_HEADER set, only returns an
+  X-Accel-Redirect / X-Sendfile header and lets nginx/Apache do the rest;
+- serves ``<file>.br`` / ``<file>.gz`` written by `manage.py compress_media`
+  to clients that accept them;
+- marks ``?v=<content hash>`` URLs (from versioned_media_url()) immutable for a
+  year; anything else gets MEDIA_MAX_AGE and is revalidated by ETag.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_http_methods
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+# (suffix, Content-Encoding) in order of preference
+ENCODINGS = ((".br", "br"), (".gz", "gzip"))
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+_hashes: dict[Path, tuple[tuple[int, int], str]] = {}
+_hashes_lock = threading.Lock()
+
+
+def media_path(name: str) -> Path | None:
+    """The file under MEDIA_ROOT for ``name``, or None if missing/outside."""
+    try:
+        path = Path(safe_join(settings.MEDIA_ROOT, name))
+    except (SuspiciousFileOperation, ValueError):
+        return None
+    return path if path.is_file() else None
+
+
+def content_hash(path: Path) -> str:
+    """Short sha256 of the file, memoized on (mtime, size)."""
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _hashes_lock:
+        hit = _hashes.get(path)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()[:12]
+    with _hashes_lock:
+        _hashes[path] = (stamp, value)
+    return value
+
+
+def versioned_media_url(name: str, url: str) -> str:
+    """``url`` (the storage URL of ``name``) with a ``?v=`` content hash, so
+    it can be cached forever. Unchanged when the file is not under
+    MEDIA_ROOT."""
+    path = media_path(name)
+    return f"{url}?v={content_hash(path)}" if path else url
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Inclusive (start, end) for a single byte range, or None to send the
+    whole file (no/unsupported header). Raises ValueError when the range
+    cannot be satisfied."""
+    match = _RANGE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    first, last = match.groups()
+    if not first:
+        # "bytes=-N": the last N bytes
+        if int(last) == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class _Slice:
+    """read() stops at ``length`` bytes; fileno() lets gunicorn sendfile
+    from the current offset (it trusts Content-Length for the count)."""
+
+    def __init__(self, fh, length: int):
+        self._fh = fh
+        self._left = length
+
+    def read(self, size: int = -1) -> bytes:
+        if self._left <= 0:
+            return b""
+        size = self._left if size is None or size < 0 else min(size, self._left)
+        data = self._fh.read(size)
+        self._left -= len(data)
+        return data
+
+    def fileno(self) -> int:
+        return self._fh.fileno()
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def _variant(request, path: Path) -> tuple[Path, str | None, bool]:
+    """(file to send, Content-Encoding, whether precompressed copies exist)."""
+    accepted = request.headers.get("Accept-Encoding", "")
+    # Whole seconds: compressors copy the source mtime, not always to the ns
+    mtime = int(path.stat().st_mtime)
+    has_variants = False
+    for suffix, encoding in ENCODINGS:
+        candidate = path.with_name(path.name + suffix)
+        if candidate.is_file() and int(candidate.stat().st_mtime) >= mtime:
+            has_variants = True
+            if encoding in accepted:
+                return candidate, encoding, True
+    return path, None, has_variants
+
+
+def _if_range_ok(request, etag: str, last_modified: int) -> bool:
+    value = request.headers.get("If-Range")
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith("W/"):
+        return value == etag
+    return parse_http_date_safe(value) == last_modified
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_media(request, path):
+    source = media_path(path)
+    if source is None:
+        raise Http404
+    served, encoding, has_variants = _variant(request, source)
+    stat = served.stat()
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _body_response(request, source, served, encoding, etag, last_modified, stat.st_size)
+        response["Last-Modified"] = http_date(last_modified)
+
+    response["ETag"] = etag
+    version = request.GET.get("v")
+    if version and version == content_hash(source):
+        response["Cache-Control"] = IMMUTABLE
+    else:
+        response["Cache-Control"] = f"public, max-age={getattr(settings, 'MEDIA_MAX_AGE', 3600)}"
+    if has_variants:
+        patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+def _body_response(request, source, served, encoding, etag, last_modified, size):
+    content_type = mimetypes.guess_type(source.name)[0] or "application/octet-stream"
+
+    sendfile_header = getattr(settings, "MEDIA_SENDFILE_HEADER", "")
+    if sendfile_header:
+        # The front server reads the file itself (and does Range/gzip_static)
+        prefix = getattr(settings, "MEDIA_SENDFILE_PREFIX", "/protected-media/")
+        response = HttpResponse(content_type=content_type)
+        response[sendfile_header] = prefix + quote(Path(os.path.relpath(source, settings.MEDIA_ROOT)).as_posix())
+        return response
+
+    byte_range = None
+    header = request.headers.get("Range")
+    if header and encoding is None and _if_range_ok(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    fh = open(served, "rb")
+    if byte_range is None:
+        response = FileResponse(fh, content_type=content_type)
+    else:
+        start, end = byte_range
+        fh.seek(start)
+        response = FileResponse(_Slice(fh, end - start + 1), status=206, content_type=content_type)
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return response
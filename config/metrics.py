@@ -0,0 +1,328 @@
+"""Prometheus metrics at /metrics, without the prometheus_client dependency.
+
+Counters and histograms are plain dicts in each process. With
+METRICS_MULTIPROC_DIR set (scripts/render_start.sh does), every process
+also writes its values to ``metrics-<pid>-<boot>.json`` there at most
+every METRICS_FLUSH_SECONDS, and /metrics sums the files of all gunicorn
+workers — whichever worker answers the scrape. Files of workers that have
+exited stay, so counters keep counting across worker restarts; the
+directory is emptied when the whole service starts.
+
+What is measured:
+
+- shop_request_duration_seconds / shop_request_db_queries /
+  shop_request_db_seconds per view — fed by
+  config.request_metrics.RequestMetricsMiddleware;
+- shop_cart_changes_total, shop_checkouts_total, shop_slips_total;
+- shop_stock_operation_seconds for apps.catalog.stock;
+- shop_catalog_cache_lookups_total (+ the hit ratio as a gauge);
+- shop_queue_depth / shop_queue_oldest_seconds for the notification
+  outbox and the slip-upload queue, read from the database per scrape.
+
+The endpoint wants ``Authorization: Bearer $METRICS_TOKEN``; without a
+token configured only a logged-in superuser can open it.
+"""
+
+from __future__ import annotations
+
+import atexit
+import hmac
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_lock = threading.Lock()
+_registry: dict[str, "_Metric"] = {}
+_counters: dict[tuple, float] = {}
+# (name, label values) -> per-bucket counts, +Inf count, sum
+_histograms: dict[tuple, list] = {}
+_boot = time.time_ns()
+_last_flush = 0.0
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _registry[name] = self
+
+    def _key(self, labels: dict) -> tuple:
+        return self.name, tuple(str(labels.get(label, "")) for label in self.labels)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with _lock:
+            _counters[key] = _counters.get(key, 0) + amount
+        _maybe_flush()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        slot = bisect_left(self.buckets, value)  # first bound >= value, or +Inf
+        with _lock:
+            row = _histograms.get(key)
+            if row is None:
+                row = _histograms[key] = [0] * (len(self.buckets) + 2)
+            row[slot] += 1
+            row[-1] += value
+        _maybe_flush()
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def timed(self, **labels):
+        """Decorator form of time()."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.time(**labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+REQUEST_SECONDS = Histogram(
+    "shop_request_duration_seconds", "Time to answer a request, per view.", ("view", "method", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "shop_request_db_queries", "SQL statements run by one request.", ("view",), buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram("shop_request_db_seconds", "Time spent in SQL by one request.", ("view",))
+CART_CHANGES = Counter("shop_cart_changes_total", "Cart lines added, updated or removed, and carts cleared.", ("cart", "change"))
+CHECKOUTS = Counter("shop_checkouts_total", "Orders placed from a cart.", ("channel", "kind"))
+SLIPS = Counter("shop_slips_total", "Payment slips submitted and reviewed by staff.", ("event",))
+STOCK_SECONDS = Histogram("shop_stock_operation_seconds", "Time taken by the stock engine.", ("operation",))
+CACHE_LOOKUPS = Counter("shop_catalog_cache_lookups_total", "Catalog cache reads by the tier that answered.", ("result",))
+
+
+def _directory() -> Path | None:
+    value = getattr(settings, "METRICS_MULTIPROC_DIR", "")
+    return Path(value) if value else None
+
+
+def _dump() -> dict:
+    with _lock:
+        return {
+            "counters": [[name, list(values), total] for (name, values), total in _counters.items()],
+            "histograms": [[name, list(values), list(row)] for (name, values), row in _histograms.items()],
+        }
+
+
+def flush() -> None:
+    """Write this process's values to METRICS_MULTIPROC_DIR (no-op without it)."""
+    global _last_flush
+    directory = _directory()
+    if directory is None:
+        return
+    _last_flush = time.monotonic()
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"metrics-{os.getpid()}-{_boot}.json"
+    partial = target.with_name(f"{target.name}.{threading.get_ident()}.tmp")
+    partial.write_text(json.dumps(_dump()))
+    os.replace(partial, target)
+
+
+def _maybe_flush() -> None:
+    if _directory() is None or time.monotonic() - _last_flush < getattr(settings, "METRICS_FLUSH_SECONDS", 1.0):
+        return
+    try:
+        flush()
+    except OSError:
+        logger.warning("could not write metrics to %s", _directory(), exc_info=True)
+
+
+def _flush_at_exit() -> None:
+    try:
+        flush()
+    except Exception:  # settings gone or directory removed on shutdown
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _forget_parent() -> None:
+    # A forked worker starts from zero instead of re-reporting the master's values
+    global _boot, _last_flush
+    _counters.clear()
+    _histograms.clear()
+    _boot = time.time_ns()
+    _last_flush = 0.0
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_parent)
+
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def collect() -> tuple[dict, dict]:
+    """Counters and histograms summed over every process that wrote to
+    METRICS_MULTIPROC_DIR, or this process's own values without it."""
+    directory = _directory()
+    if directory is None:
+        dumps = [_dump()]
+    else:
+        flush()
+        dumps = []
+        for path in directory.glob("metrics-*.json"):
+            try:
+                dumps.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+    counters: dict[tuple, float] = {}
+    histograms: dict[tuple, list] = {}
+    for dump in dumps:
+        for name, values, total in dump.get("counters", ()):
+            key = (name, tuple(values))
+            counters[key] = counters.get(key, 0) + total
+        for name, values, row in dump.get("histograms", ()):
+            metric = _registry.get(name)
+            # written by an older deploy with other buckets
+            if not isinstance(metric, Histogram) or len(row) != len(metric.buckets) + 2:
+                continue
+            merged = histograms.setdefault((name, tuple(values)), [0] * len(row))
+            for i, value in enumerate(row):
+                merged[i] += value
+    return counters, histograms
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def exposition(counters: dict, histograms: dict, gauges=()) -> str:
+    """Text exposition format. ``gauges`` is an iterable of
+    ``(name, help, [(labels dict, value), ...])``."""
+    lines = []
+    for name in sorted(_registry):
+        metric = _registry[name]
+        lines += [f"# HELP {name} {metric.help}", f"# TYPE {name} {metric.kind}"]
+        if isinstance(metric, Counter):
+            for (metric_name, values), total in sorted(counters.items()):
+                if metric_name == name:
+                    lines.append(f"{name}{_labels(zip(metric.labels, values))} {_number(total)}")
+            continue
+        for (metric_name, values), row in sorted(histograms.items()):
+            if metric_name != name:
+                continue
+            pairs = list(zip(metric.labels, values))
+            running = 0
+            for bound, count in zip((*metric.buckets, math.inf), row):
+                running += count
+                lines.append(f"{name}_bucket{_labels([*pairs, ('le', _number(bound))])} {_number(running)}")
+            lines.append(f"{name}_sum{_labels(pairs)} {_number(row[-1])}")
+            lines.append(f"{name}_count{_labels(pairs)} {_number(running)}")
+    for name, help, samples in gauges:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+        lines += [f"{name}{_labels(labels.items())} {_number(value)}" for labels, value in samples]
+    return "\n".join(lines) + "\n"
+
+
+def _cache_hit_ratio(counters: dict) -> float:
+    lookups = {values[0]: total for (name, values), total in counters.items() if name == CACHE_LOOKUPS.name}
+    total = sum(lookups.values())
+    return (lookups.get("local", 0) + lookups.get("shared", 0)) / total if total else 0
+
+
+def queue_backlog() -> dict[str, tuple[int, float]]:
+    """Pending jobs and the age in seconds of the oldest one, per
+    background queue (also used by the /readyz probe)."""
+    from django.db.models import Count, Min
+    from django.utils import timezone
+
+    from apps.sales.models import SlipUploadJob
+    from apps.store.models import OutboxMessage
+
+    now = timezone.now()
+    backlog = {}
+    for queue, model in (("notifications", OutboxMessage), ("slip_uploads", SlipUploadJob)):
+        row = model.objects.filter(status=model.Status.PENDING).aggregate(n=Count("id"), first=Min("created_at"))
+        backlog[queue] = (row["n"], (now - row["first"]).total_seconds() if row["first"] else 0)
+    return backlog
+
+
+def _queue_gauges():
+    backlog = queue_backlog()
+    depth = [({"queue": queue}, n) for queue, (n, _) in backlog.items()]
+    oldest = [({"queue": queue}, age) for queue, (_, age) in backlog.items()]
+    return [
+        ("shop_queue_depth", "Pending jobs in a background queue.", depth),
+        ("shop_queue_oldest_seconds", "Age of the oldest pending job in a background queue.", oldest),
+    ]
+
+
+def _authorized(request) -> bool:
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token:
+        return hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}")
+    user = getattr(request, "user", None)
+    return bool(user and user.is_active and user.is_superuser)
+
+
+def metrics_view(request):
+    if not _authorized(request):
+        raise Http404
+    counters, histograms = collect()
+    gauges = [
+        *_queue_gauges(),
+        ("shop_catalog_cache_hit_ratio", "Share of catalog cache reads answered from cache.",
+         [({}, round(_cache_hit_ratio(counters), 4))]),
+    ]
+    response = HttpResponse(exposition(counters, histograms, gauges), content_type=CONTENT_TYPE)
+    response["Cache-Control"] = "no-store"
+    return response
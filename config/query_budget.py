@@ -0,0 +1,105 @@
+"""Query budgets — keep list pages O(1) in queries as data grows.
+
+- ``@query_budget(n)`` declares how many SQL queries a view may run.
+- ``QueryBudgetMiddleware`` counts queries per request and, when a view
+  goes over its budget, raises in DEBUG (so N+1 regressions show up as a
+  yellow page locally) or logs a warning in production.
+- ``QueryBudgetTestMixin`` gives TestCases ``assertQueryBudget`` and
+  ``assertConstantQueries`` — the latter renders a view at two fixture
+  sizes and fails if the query count changes with the number of rows.
+"""
+
+from __future__ import annotations
+
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit: int):
+    """Mark a view with its maximum query count (read by the middleware)."""
+
+    def decorator(view_func):
+        view_func.query_budget = limit
+        return view_func
+
+    return decorator
+
+
+class _Counter:
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        if len(self.statements) < 50:
+            self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "QUERY_BUDGET_ENABLED", settings.DEBUG):
+            return self.get_response(request)
+
+        counter = _Counter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        budget = getattr(request, "_query_budget", None)
+        if budget is not None and counter.count > budget:
+            message = (
+                f"{request.method} {request.path} ran {counter.count} queries "
+                f"(budget {budget})"
+            )
+            if getattr(settings, "QUERY_BUDGET_RAISE", settings.DEBUG):
+                raise QueryBudgetExceeded(message + "\n" + "\n".join(counter.statements))
+            logger.warning(message)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget = getattr(view_func, "query_budget", None)
+
+
+class QueryBudgetTestMixin:
+    """Mix into a django.test.TestCase."""
+
+    @contextmanager
+    def assertQueryBudget(self, limit: int):
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            yield ctx
+        if len(ctx.captured_queries) > limit:
+            statements = "\n".join(q["sql"] for q in ctx.captured_queries)
+            self.fail(f"{len(ctx.captured_queries)} queries, budget {limit}:\n{statements}")
+
+    def assertConstantQueries(self, request, grow, small: int = 1, large: int = 10):
+        """``grow(n)`` adds ``n`` more fixture rows; ``request()`` hits the
+        view. Fails when the larger fixture needs more queries."""
+        from django.test.utils import CaptureQueriesContext
+
+        grow(small)
+        with CaptureQueriesContext(connection) as before:
+            request()
+        grow(large - small)
+        with CaptureQueriesContext(connection) as after:
+            request()
+        self.assertEqual(
+            len(before.captured_queries),
+            len(after.captured_queries),
+            "query count grows with fixture size:\n"
+            + "\n".join(q["sql"] for q in after.captured_queries),
+        )
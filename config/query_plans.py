@@ -0,0 +1,161 @@
+"""EXPLAIN checks for the hot queries — the index-side companion of
+config.query_budget.
+
+HOT_QUERIES lists the filters that run on every shop/POS/staff page or
+stock movement, each with the indexes that may serve it. check_plans()
+runs EXPLAIN on each one and reports those whose plan uses none of them
+(a full table scan as the tables grow). `manage.py check_query_plans
+--seed N` first fills the tables with N throwaway rows per model (inside a
+transaction that is rolled back), so the planner sees realistic sizes.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable
+
+from django.db import connection
+from django.utils import timezone
+
+
+@dataclass
+class HotQuery:
+    label: str
+    queryset: Callable  # () -> QuerySet
+    indexes: tuple[str, ...]
+
+
+@dataclass
+class PlanResult:
+    query: HotQuery
+    plan: str
+
+    @property
+    def index(self) -> str | None:
+        return next((name for name in self.query.indexes if name in self.plan), None)
+
+    @property
+    def ok(self) -> bool:
+        return self.index is not None
+
+
+def hot_queries() -> list[HotQuery]:
+    from apps.catalog.models import Product
+    from apps.catalog.stock import batches_to_take
+    from apps.sales.models import Bill, DailySalesRollup, Order, Reserved
+
+    product_id = Product.objects.order_by("id").values_list("id", flat=True).first() or 0
+    today = timezone.localdate()
+    week_ago = timezone.now() - timedelta(days=7)
+    return [
+        HotQuery(
+            "staff_slips: pending orders",
+            lambda: Order.objects.filter(status=Order.Status.PENDING).order_by("-order_date"),
+            ("sales_order_status_date_idx",),
+        ),
+        HotQuery(
+            "receive_stock: waiting reservations",
+            lambda: Reserved.objects.filter(
+                product_id__in=[product_id], status=Reserved.Status.RESERVED, stock_ready=False,
+            ).order_by("-res_date", "-id"),
+            ("sales_reserved_waiting_idx",),
+        ),
+        HotQuery(
+            "take_stock: open inventory batches",
+            lambda: batches_to_take({product_id: 1}),
+            ("inventory_open_batch_idx",),
+        ),
+        HotQuery(
+            "reports: paid bills in a date range",
+            lambda: Bill.objects.filter(status=Bill.Status.PAID, bill_date__gte=week_ago),
+            ("sales_bill_status_date_idx", "sales_bill_date_idx"),
+        ),
+        HotQuery(
+            "dashboard: today's rollup",
+            lambda: DailySalesRollup.objects.filter(day=today, product__isnull=True),
+            ("sales_rollup_day_idx",),
+        ),
+        HotQuery(
+            "shop/POS: active products by name",
+            lambda: Product.objects.filter(is_active=True).order_by("name", "id")[:24],
+            ("catalog_prod_active_name_idx",),
+        ),
+        HotQuery(
+            "shop: active products, newest first",
+            lambda: Product.objects.filter(is_active=True).order_by("-created_at", "-id")[:24],
+            ("catalog_prod_active_new_idx",),
+        ),
+    ]
+
+
+def analyze() -> None:
+    """Refresh planner statistics."""
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def explain(queryset) -> str:
+    """Like QuerySet.explain(), which nests a second EXPLAIN into queries
+    that filter on a window function (take_stock's batch query)."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}", params)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def check_plans(queries: list[HotQuery] | None = None) -> list[PlanResult]:
+    return [PlanResult(query, explain(query.queryset())) for query in queries or hot_queries()]
+
+
+def seed(rows: int) -> None:
+    """Bulk-insert ``rows`` cold rows per hot table: completed orders and
+    paid bills spread over past days, collected reservations, emptied
+    batches and mostly active products — the shape of a shop that has been
+    running for a while. Only meant to run inside a rolled-back transaction."""
+    from apps.catalog.models import Category, Product
+    from apps.inventory.models import Inventory
+    from apps.sales.models import Bill, DailySalesRollup, Order, Reserved
+
+    batch = 1000
+    category = Category.objects.create(name="query-plan-seed")
+    products = Product.objects.bulk_create(
+        [
+            Product(category=category, name=f"seed {i:07d}", slug=f"query-plan-seed-{i}", price=1, is_active=i % 10 != 0)
+            for i in range(rows)
+        ],
+        batch_size=batch,
+    )
+    orders = Order.objects.bulk_create(
+        [Order(status=Order.Status.COMPLETED) for _ in range(rows)], batch_size=batch,
+    )
+    Bill.objects.bulk_create(
+        [Bill(order=order, total_amount=1, paid_amount=1, status=Bill.Status.PAID) for order in orders],
+        batch_size=batch,
+    )
+    now = timezone.now()
+    for start in range(0, rows, batch):
+        ids = [order.id for order in orders[start:start + batch]]
+        when = now - timedelta(days=30 + start // batch)
+        Order.objects.filter(id__in=ids).update(order_date=when)
+        Bill.objects.filter(order_id__in=ids).update(bill_date=when)
+    Reserved.objects.bulk_create(
+        [
+            Reserved(
+                order=order,
+                product=products[i % len(products)],
+                status=Reserved.Status.COMPLETED,
+                stock_ready=True,
+                expire_at=now,
+            )
+            for i, order in enumerate(orders)
+        ],
+        batch_size=batch,
+    )
+    Inventory.objects.bulk_create(
+        [Inventory(product=products[i % len(products)], quantity=0) for i in range(rows)], batch_size=batch,
+    )
+    DailySalesRollup.objects.bulk_create(
+        [DailySalesRollup(day=now.date() - timedelta(days=i), channel="POS") for i in range(rows)],
+        batch_size=batch,
+    )
@@ -0,0 +1,223 @@
+"""Per-request cost: SQL count/time, duplicates, slowest statements.
+
+RequestMetricsMiddleware wraps every request's database work in an
+execute wrapper (like config.query_budget, which only counts) and:
+
+- adds ``Server-Timing: app, db;desc="N queries", total`` so the browser
+  devtools show where the time went;
+- logs one JSON line on ``config.request_metrics`` for requests slower
+  than REQUEST_METRICS_SLOW_MS or with a statement slower than
+  REQUEST_METRICS_SLOW_SQL_MS — with the repeated statements (N+1 loops)
+  and the slowest ones;
+- keeps the last REQUEST_METRICS_SAMPLES timings per URL name in memory;
+  /admin/request-metrics/ shows p50/p90/p99 per view to superusers;
+- feeds the per-view histograms of config.metrics (/metrics).
+
+The in-memory numbers are per worker process and reset on restart.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import logging
+import math
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.db import connection
+from django.http import Http404, JsonResponse
+from django.shortcuts import render
+
+from config import metrics
+
+logger = logging.getLogger(__name__)
+
+TOP = 5
+
+
+class _Recorder:
+    """connection.execute_wrapper: times every statement of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.exact = Counter()  # (sql, params) → times run
+        self.shapes = Counter()  # sql → times run (same statement, any params)
+        self.slowest: list[tuple[float, int, str]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            self.shapes[sql] += 1
+            try:
+                self.exact[(sql, repr(params))] += 1
+            except Exception:  # odd params: shape counting is enough
+                pass
+            entry = (elapsed, self.count, sql)
+            if len(self.slowest) < TOP:
+                heapq.heappush(self.slowest, entry)
+            elif elapsed > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def duplicates(self) -> list[dict]:
+        """Statements run more than once with the same parameters."""
+        return [
+            {"sql": sql[:300], "times": n}
+            for (sql, _), n in self.exact.most_common(TOP) if n > 1
+        ]
+
+    def repeated(self) -> list[dict]:
+        """Statements run more than once with any parameters (N+1 shape)."""
+        return [{"sql": sql[:300], "times": n} for sql, n in self.shapes.most_common(TOP) if n > 1]
+
+    def slow(self) -> list[dict]:
+        return [
+            {"sql": sql[:500], "ms": round(seconds * 1000, 1)}
+            for seconds, _, sql in sorted(self.slowest, reverse=True)
+        ]
+
+
+class _ViewStats:
+    def __init__(self, samples: int):
+        self.requests = 0
+        self.total_ms = deque(maxlen=samples)
+        self.db_ms = deque(maxlen=samples)
+        self.queries = deque(maxlen=samples)
+
+    def add(self, total_ms: float, db_ms: float, queries: int) -> None:
+        self.requests += 1
+        self.total_ms.append(total_ms)
+        self.db_ms.append(db_ms)
+        self.queries.append(queries)
+
+
+_stats: dict[str, _ViewStats] = {}
+_stats_lock = threading.Lock()
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile (0 for no values)."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[min(max(rank, 1), len(ordered)) - 1]
+
+
+def record(view: str, total_ms: float, db_ms: float, queries: int) -> None:
+    with _stats_lock:
+        stats = _stats.get(view)
+        if stats is None:
+            stats = _stats[view] = _ViewStats(getattr(settings, "REQUEST_METRICS_SAMPLES", 500))
+        stats.add(total_ms, db_ms, queries)
+
+
+def snapshot() -> list[dict]:
+    """Per-view percentiles over the kept samples, slowest p90 first."""
+    with _stats_lock:
+        copies = {
+            view: (s.requests, list(s.total_ms), list(s.db_ms), list(s.queries)) for view, s in _stats.items()
+        }
+    rows = []
+    for view, (requests, total_ms, db_ms, queries) in copies.items():
+        rows.append({
+            "view": view,
+            "requests": requests,
+            "samples": len(total_ms),
+            "p50_ms": round(percentile(total_ms, 50), 1),
+            "p90_ms": round(percentile(total_ms, 90), 1),
+            "p99_ms": round(percentile(total_ms, 99), 1),
+            "max_ms": round(max(total_ms, default=0), 1),
+            "db_p90_ms": round(percentile(db_ms, 90), 1),
+            "queries_p50": percentile(queries, 50),
+            "queries_max": max(queries, default=0),
+        })
+    return sorted(rows, key=lambda row: row["p90_ms"], reverse=True)
+
+
+def reset() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def view_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "<unresolved>"
+    return match.view_name or match.route or "<unnamed>"
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, "REQUEST_METRICS_ENABLED", True):
+            return self.get_response(request)
+
+        recorder = _Recorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = recorder.seconds * 1000
+
+        if getattr(settings, "REQUEST_METRICS_SERVER_TIMING", True):
+            response["Server-Timing"] = ", ".join((
+                f"app;dur={max(total_ms - db_ms, 0):.1f}",
+                f'db;dur={db_ms:.1f};desc="{recorder.count} queries"',
+                f"total;dur={total_ms:.1f}",
+            ))
+
+        view = view_name(request)
+        record(view, total_ms, db_ms, recorder.count)
+        metrics.REQUEST_SECONDS.observe(
+            total_ms / 1000, view=view, method=request.method, status=f"{response.status_code // 100}xx",
+        )
+        metrics.REQUEST_QUERIES.observe(recorder.count, view=view)
+        metrics.REQUEST_DB_SECONDS.observe(recorder.seconds, view=view)
+        slowest = recorder.slow()
+        slow_sql = slowest and slowest[0]["ms"] >= getattr(settings, "REQUEST_METRICS_SLOW_SQL_MS", 100)
+        if total_ms >= getattr(settings, "REQUEST_METRICS_SLOW_MS", 500) or slow_sql:
+            logger.warning(json.dumps({
+                "event": "slow_request",
+                "method": request.method,
+                "path": request.path,
+                "view": view,
+                "status": response.status_code,
+                "total_ms": round(total_ms, 1),
+                "db_ms": round(db_ms, 1),
+                "queries": recorder.count,
+                "duplicates": recorder.duplicates(),
+                "repeated": recorder.repeated(),
+                "slowest": slowest,
+            }, ensure_ascii=False))
+        return response
+
+
+def request_metrics_view(request):
+    """Superuser-only table of the per-view percentiles (?format=json);
+    wrapped in admin_view() in config.urls."""
+    if not (request.user.is_active and request.user.is_superuser):
+        raise Http404
+    if request.method == "POST" and request.POST.get("reset"):
+        reset()
+    rows = snapshot()
+    if request.GET.get("format") == "json":
+        return JsonResponse({"views": rows})
+    from django.contrib import admin
+
+    return render(request, "admin/request_metrics.html", {
+        **admin.site.each_context(request),
+        "title": "Request metrics",
+        "rows": rows,
+        "samples": getattr(settings, "REQUEST_METRICS_SAMPLES", 500),
+    })
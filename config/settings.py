@@ -56,13 +56,16 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "config.request_metrics.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.locale.LocaleMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "apps.store.cart_store.CartMiddleware",
     "config.middleware.AdminSuperuserOnlyMiddleware",
+    "config.query_budget.QueryBudgetMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
@@ -81,6 +84,7 @@ TEMPLATES = [
                 "django.contrib.messages.context_processors.messages",
                 "django.template.context_processors.i18n",
                 "config.context_processors.site_context",
+                "config.context_processors.cart_context",
             ],
         },
     },
@@ -90,6 +94,10 @@ WSGI_APPLICATION = "config.wsgi.application"
 
 DATABASES = configure_databases(BASE_DIR, DEBUG)
 
+# Covering (INCLUDE) indexes are PostgreSQL-only; SQLite builds them
+# without the extra columns, which is fine for dev and tests
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -129,8 +137,93 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedStaticFilesStorage"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Catalog cache (apps.catalog.cache): per-worker memory + optional shared tier.
+# scripts/render_start.sh sets CATALOG_CACHE_DIR, so warm pages run no
+# queries; without a shared tier (local dev) the invalidation counter costs
+# one query per request.
+# CATALOG_CACHE_DIR → FileBasedCache shared by all gunicorn workers on a host;
+# CATALOG_CACHE_TABLE → DatabaseCache (run `manage.py createcachetable` once).
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+_catalog_cache_dir = os.getenv("CATALOG_CACHE_DIR", "").strip()
+_catalog_cache_table = os.getenv("CATALOG_CACHE_TABLE", "").strip()
+if _catalog_cache_dir:
+    CACHES["catalog"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": _catalog_cache_dir,
+    }
+elif _catalog_cache_table:
+    CACHES["catalog"] = {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": _catalog_cache_table,
+    }
+CATALOG_CACHE_ALIAS = "catalog" if "catalog" in CACHES else "default"
+CATALOG_CACHE_TIMEOUT = int(os.getenv("CATALOG_CACHE_TIMEOUT", "600"))
+# Carts (apps.store.cart_store): anonymous = signed cookie; logged-in/POS =
+# SavedCart, cached in their own alias and copied back at most every
+# CART_DB_SYNC_SECONDS. CART_CACHE_DIR → FileBasedCache shared by all
+# workers that never culls (an evicted cart would lose unsynced edits);
+# without it every change is written straight to the row.
+_cart_cache_dir = os.getenv("CART_CACHE_DIR", "").strip()
+if _cart_cache_dir:
+    CACHES["carts"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": _cart_cache_dir,
+        "OPTIONS": {"MAX_ENTRIES": 2**31},
+    }
+CART_CACHE_ALIAS = "carts" if "carts" in CACHES else "default"
+CART_DB_SYNC_SECONDS = int(os.getenv("CART_DB_SYNC_SECONDS", "60"))
+CART_COOKIE_AGE = 60 * 60 * 24 * 30
+
+# Per-view SQL query budgets (config.query_budget): raise locally, log in prod
+QUERY_BUDGET_ENABLED = os.getenv("QUERY_BUDGET_ENABLED", "1" if DEBUG else "0") == "1"
+QUERY_BUDGET_RAISE = DEBUG
+# Per-request SQL/time instrumentation (config.request_metrics): Server-Timing
+# header, JSON log line for slow requests, per-view percentiles for superusers
+# at /admin/request-metrics/
+REQUEST_METRICS_ENABLED = os.getenv("REQUEST_METRICS_ENABLED", "1") == "1"
+REQUEST_METRICS_SERVER_TIMING = os.getenv("REQUEST_METRICS_SERVER_TIMING", "1") == "1"
+REQUEST_METRICS_SLOW_MS = int(os.getenv("REQUEST_METRICS_SLOW_MS", "500"))
+REQUEST_METRICS_SLOW_SQL_MS = int(os.getenv("REQUEST_METRICS_SLOW_SQL_MS", "100"))
+REQUEST_METRICS_SAMPLES = int(os.getenv("REQUEST_METRICS_SAMPLES", "500"))
+# Prometheus /metrics (config.metrics). With several gunicorn workers point
+# METRICS_MULTIPROC_DIR at a directory they share; scrapers send
+# "Authorization: Bearer $METRICS_TOKEN" (unset = superusers only)
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "").strip()
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "").strip()
+# Readiness probe /readyz/ (config.health): statement timeout for its DB
+# check, how long a passing result is reused, and how old a pending
+# notification / slip upload may get before the queues count as stuck
+READYZ_DB_TIMEOUT_MS = int(os.getenv("READYZ_DB_TIMEOUT_MS", "2000"))
+READYZ_CACHE_SECONDS = float(os.getenv("READYZ_CACHE_SECONDS", "5"))
+READYZ_QUEUE_MAX_AGE = int(os.getenv("READYZ_QUEUE_MAX_AGE", "600"))
+
+# Cards per page for the shop grid / POS list (apps.catalog.pagination)
+SHOP_PAGE_SIZE = int(os.getenv("SHOP_PAGE_SIZE", "24"))
+POS_PAGE_SIZE = int(os.getenv("POS_PAGE_SIZE", "40"))
+
+# Which Inventory batches a sale empties first (apps.catalog.stock):
+# "fifo" = oldest received, "fefo" = soonest expiry_date
+STOCK_CONSUMPTION_POLICY = os.getenv("STOCK_CONSUMPTION_POLICY", "fifo")
+# Which waiting reservations new stock is earmarked for first:
+# "newest" (default) or "oldest" (first come, first served)
+RESERVATION_ALLOCATION_POLICY = os.getenv("RESERVATION_ALLOCATION_POLICY", "newest")
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# /media/ is served by config.media.serve_media. ?v=<hash> URLs are immutable;
+# others are cached for MEDIA_MAX_AGE seconds and revalidated by ETag.
+MEDIA_MAX_AGE = int(os.getenv("MEDIA_MAX_AGE", "3600"))
+# Behind nginx/Apache: "X-Accel-Redirect" / "X-Sendfile" hands the transfer
+# to the front server (MEDIA_SENDFILE_PREFIX must map to MEDIA_ROOT there)
+MEDIA_SENDFILE_HEADER = os.getenv("MEDIA_SENDFILE_HEADER", "")
+MEDIA_SENDFILE_PREFIX = os.getenv("MEDIA_SENDFILE_PREFIX", "/protected-media/")
+# Width buckets for product photo srcsets (apps.catalog.images); renditions
+# are generated on first request and cached under PRODUCT_IMAGE_CACHE_DIR
+PRODUCT_IMAGE_WIDTHS = (160, 320, 480, 640, 960)
+PRODUCT_IMAGE_CACHE_DIR = Path(os.getenv("PRODUCT_IMAGE_CACHE_DIR", str(BASE_DIR / "var" / "renditions")))
 
 CONTACT_EMAIL = os.getenv("CONTACT_EMAIL", "")
 LINE_URL = os.getenv("LINE_URL", "")
@@ -176,12 +269,26 @@ WAKE_PAGE_URL = os.getenv("WAKE_PAGE_URL", "https://iboy5070.github.io/matcha_sh
 NOTIFY_EMAIL = os.getenv("NOTIFY_EMAIL", CONTACT_EMAIL)
 GA_MEASUREMENT_ID = os.getenv("GA_MEASUREMENT_ID", "")
 LINE_NOTIFY_TOKEN = os.getenv("LINE_NOTIFY_TOKEN", "")
+# Shop notifications go through an outbox drained by `manage.py drain_notifications`
+NOTIFY_COALESCE_SECONDS = int(os.getenv("NOTIFY_COALESCE_SECONDS", "10"))
+NOTIFY_BATCH_SIZE = 20
+NOTIFY_MAX_ATTEMPTS = 6
 
 # Supabase Storage for payment slips (persists across Render redeploys)
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 SUPABASE_URL = os.getenv("SUPABASE_URL", "").rstrip("/")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 SUPABASE_SLIP_BUCKET = os.getenv("SUPABASE_SLIP_BUCKET", "slips")
+# Slips wait here until `manage.py process_slip_uploads` pushes them (apps.sales.slip_uploads)
+SLIP_SPOOL_DIR = Path(os.getenv("SLIP_SPOOL_DIR", str(BASE_DIR / "var" / "slip_spool")))
+SLIP_UPLOAD_MAX_ATTEMPTS = int(os.getenv("SLIP_UPLOAD_MAX_ATTEMPTS", "8"))
+SLIP_UPLOAD_RETRY_BASE = 5  # seconds, doubled per failed attempt
+SLIP_UPLOAD_RETRY_MAX = 900
+# Slip images are re-encoded before upload (apps.sales.slip_images)
+SLIP_IMAGE_FORMAT = os.getenv("SLIP_IMAGE_FORMAT", "WEBP")
+SLIP_IMAGE_QUALITY = int(os.getenv("SLIP_IMAGE_QUALITY", "80"))
+SLIP_MAX_DIMENSION = 1600
+SLIP_THUMB_DIMENSION = 320
 
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "noreply@196haus-matcha.local")
 EMAIL_HOST = os.getenv("EMAIL_HOST", "")
@@ -220,6 +327,18 @@ LOGGING = {
             "level": "ERROR",
             "propagate": False,
         },
+        # Per-step timings of the worker warm-up (config.warmup)
+        "config.warmup": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        # One JSON line per slow request (config.request_metrics)
+        "config.request_metrics": {
+            "handlers": ["console"],
+            "level": "WARNING",
+            "propagate": False,
+        },
     },
 }
 
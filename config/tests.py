@@ -0,0 +1,278 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from pathlib import Path
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        overrides = self.settings(MEDIA_ROOT=tmp.name, MEDIA_SENDFILE_HEADER="")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.root = Path(tmp.name)
+        (self.root / "products").mkdir()
+        self.file = self.root / "products" / "menu.svg"
+        self.file.write_bytes(b"<svg>" + b"x" * 200 + b"</svg>")
+        self.client = Client(HTTP_HOST="127.0.0.1")
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get("/media/products/menu.svg")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.file.read_bytes())
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        again = self.client.get("/media/products/menu.svg", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_byte_range(self):
+        response = self.client.get("/media/products/menu.svg", HTTP_RANGE="bytes=0-4")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"<svg>")
+        self.assertEqual(response["Content-Range"], f"bytes 0-4/{self.file.stat().st_size}")
+        self.assertEqual(response["Content-Length"], "5")
+
+        tail = self.client.get("/media/products/menu.svg", HTTP_RANGE="bytes=-6")
+        self.assertEqual(b"".join(tail.streaming_content), b"</svg>")
+        self.assertEqual(self.client.get("/media/products/menu.svg", HTTP_RANGE="bytes=9999-").status_code, 416)
+
+    def test_versioned_url_is_immutable(self):
+        from config.media import versioned_media_url
+
+        url = versioned_media_url("products/menu.svg", "/media/products/menu.svg")
+        self.assertIn("?v=", url)
+        self.assertIn("immutable", self.client.get(url)["Cache-Control"])
+        self.assertNotIn("immutable", self.client.get("/media/products/menu.svg?v=stale")["Cache-Control"])
+
+    def test_precompressed_variant(self):
+        from django.core.management import call_command
+
+        call_command("compress_media", stdout=__import__("io").StringIO())
+        response = self.client.get("/media/products/menu.svg", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(response["Content-Type"], "image/svg+xml")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        plain = self.client.get("/media/products/menu.svg")
+        self.assertFalse(plain.has_header("Content-Encoding"))
+
+    def test_outside_media_root_is_404(self):
+        self.assertEqual(self.client.get("/media/../settings.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/products/missing.jpg").status_code, 404)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_their_indexes(self):
+        import io
+
+        from django.core.management import call_command
+
+        from apps.catalog.models import Product
+
+        out = io.StringIO()
+        call_command("check_query_plans", "--seed", "1500", stdout=out)
+        self.assertNotIn("FAIL", out.getvalue())
+        self.assertFalse(Product.objects.exists())  # seed rolled back
+
+    def test_reports_missing_index(self):
+        import io
+        from unittest import mock
+
+        from django.core.management import CommandError, call_command
+
+        from apps.sales.models import Payment
+        from config import query_plans
+
+        slow = query_plans.HotQuery("unindexed", lambda: Payment.objects.filter(pay_amount=1), ("no_such_idx",))
+        with mock.patch.object(query_plans, "hot_queries", lambda: [slow]), self.assertRaises(CommandError):
+            call_command("check_query_plans", stdout=io.StringIO())
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        from config import request_metrics
+
+        request_metrics.reset()
+        self.addCleanup(request_metrics.reset)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+
+    def test_server_timing_and_per_view_stats(self):
+        from config import request_metrics
+
+        response = self.client.get("/")
+        self.assertRegex(response["Server-Timing"], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+        self.client.get("/")
+        row = next(r for r in request_metrics.snapshot() if r["view"] == "store_home")
+        self.assertEqual(row["requests"], 2)
+        self.assertLessEqual(row["p50_ms"], row["max_ms"])
+
+    def test_slow_request_logs_repeated_queries(self):
+        import json
+
+        with self.settings(REQUEST_METRICS_SLOW_MS=0), self.assertLogs("config.request_metrics", "WARNING") as logs:
+            self.client.get("/")
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry["event"], "slow_request")
+        self.assertEqual(entry["view"], "store_home")
+        self.assertIn("queries", entry)
+        self.assertLessEqual(len(entry["slowest"]), 5)
+
+    def test_percentile(self):
+        from config.request_metrics import percentile
+
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 90), 7)
+        self.assertEqual(percentile([], 90), 0)
+
+    def test_view_is_superuser_only(self):
+        from django.contrib.auth import get_user_model
+
+        users = get_user_model().objects
+        users.create_user("staff", "staff@example.com", "pw", is_staff=True)
+        self.client.login(username="staff", password="pw")
+        self.assertNotEqual(self.client.get("/admin/request-metrics/?format=json").status_code, 200)
+
+        users.create_superuser("root", "root@example.com", "pw")
+        self.client.login(username="root", password="pw")
+        self.client.get("/")
+        data = self.client.get("/admin/request-metrics/?format=json").json()
+        self.assertIn("store_home", [row["view"] for row in data["views"]])
+        self.assertContains(self.client.get("/admin/request-metrics/"), "p90")
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        from config import metrics
+
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+
+    def scrape(self):
+        with self.settings(METRICS_TOKEN="s3cret"):
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        return response.content.decode()
+
+    def test_exposition(self):
+        from apps.catalog.models import Category, Product
+
+        product = Product.objects.create(category=Category.objects.create(name="M"), name="P", price=10, stock_qty=5)
+        self.client.post(reverse("cart_api_action", args=["store", "add"]), {"product_id": product.id})
+        self.client.post(reverse("cart_api_action", args=["store", "add"]), {"product_id": product.id})
+        text = self.scrape()
+        self.assertIn('shop_cart_changes_total{cart="store",change="add"} 1', text)
+        self.assertIn('shop_cart_changes_total{cart="store",change="update"} 1', text)
+        self.assertIn('shop_request_duration_seconds_count{view="cart_api_action",method="POST",status="2xx"} 2', text)
+        self.assertIn('shop_request_db_queries_bucket{view="cart_api_action",le="+Inf"} 2', text)
+        self.assertIn('shop_queue_depth{queue="notifications"} 0', text)
+        self.assertIn("# TYPE shop_stock_operation_seconds histogram", text)
+
+    def test_token_required(self):
+        with self.settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+            self.assertEqual(self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer nope").status_code, 404)
+
+    def test_workers_are_summed(self):
+        import json
+        import tempfile
+        from pathlib import Path
+
+        from config import metrics
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        other = {
+            "counters": [["shop_checkouts_total", ["web", "buy"], 2]],
+            "histograms": [["shop_stock_operation_seconds", ["take"], [1] + [0] * 11 + [0.004]]],
+        }
+        Path(tmp.name, "metrics-1-1.json").write_text(json.dumps(other))
+        with self.settings(METRICS_MULTIPROC_DIR=tmp.name):
+            metrics.CHECKOUTS.inc(channel="web", kind="buy")
+            metrics.STOCK_SECONDS.observe(20, operation="take")
+            text = self.scrape()
+        self.assertIn('shop_checkouts_total{channel="web",kind="buy"} 3', text)
+        self.assertIn('shop_stock_operation_seconds_bucket{operation="take",le="0.005"} 1', text)
+        self.assertIn('shop_stock_operation_seconds_bucket{operation="take",le="10"} 1', text)
+        self.assertIn('shop_stock_operation_seconds_count{operation="take"} 2', text)
+        self.assertEqual(len(list(Path(tmp.name).glob("metrics-*.json"))), 2)
+
+
+class ReadinessTests(TestCase):
+    def setUp(self):
+        from config import health
+
+        health.reset()
+        self.addCleanup(health.reset)
+        self.client = Client(HTTP_HOST="127.0.0.1")
+
+    def test_ready_and_warms_catalog_cache(self):
+        from apps.catalog.cache import is_cached, reset_catalog_cache
+
+        reset_catalog_cache()
+        response = self.client.get("/readyz/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["status"], "ok")
+        self.assertEqual(set(data["checks"]), {"database", "migrations", "cache", "queues"})
+        self.assertEqual(data["checks"]["cache"], {"ok": True, "ms": data["checks"]["cache"]["ms"]})
+        self.assertTrue(is_cached("home:featured"))
+        self.assertIsInstance(data["checks"]["database"]["ms"], float)
+
+    def test_result_is_reused_while_fresh(self):
+        from unittest import mock
+
+        from config import health
+
+        self.client.get("/readyz/")
+        with mock.patch.object(health, "run_checks") as run_checks:
+            self.assertGreaterEqual(self.client.get("/readyz/").json()["age_s"], 0)
+            run_checks.assert_not_called()
+
+    def test_database_failure_is_503_and_not_cached(self):
+        from unittest import mock
+
+        from django.db import OperationalError
+
+        from config import health
+
+        failing = mock.Mock(side_effect=OperationalError('could not connect to server "db.internal.example"'))
+        checks = (("database", failing), *health.CHECKS[1:])
+        with mock.patch.object(health, "CHECKS", checks), self.assertLogs("config.health", "WARNING") as logs:
+            response = self.client.get("/readyz/")
+            self.assertEqual(response.status_code, 503)
+            self.assertFalse(response.json()["checks"]["cache"]["ok"])
+            self.assertNotIn(b"db.internal.example", response.content)
+            self.client.get("/readyz/")
+        self.assertEqual(failing.call_count, 2)
+        self.assertIn("db.internal.example", logs.output[0])
+
+    def test_stuck_queue_is_degraded(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from apps.store.models import OutboxMessage
+
+        OutboxMessage.objects.create(channel="EMAIL", subject="x", created_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs("config.health", "WARNING"):
+            data = self.client.get("/readyz/").json()
+        self.assertEqual(data["status"], "degraded")
+        self.assertFalse(data["checks"]["queues"]["ok"])
+
+
+class WarmupTests(TestCase):
+    def test_every_step_runs(self):
+        from apps.catalog.cache import is_cached, reset_catalog_cache
+        from config import warmup
+
+        reset_catalog_cache()
+        with self.assertLogs("config.warmup", "INFO") as logs:
+            timings = warmup.run()
+        self.assertEqual(set(timings), {name for name, _ in warmup.STEPS} | {"total"})
+        self.assertNotIn("failed", logs.output[-1])
+        self.assertEqual(len(logs.records), 1)
+        self.assertTrue(is_cached("categories"))
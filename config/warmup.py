@@ -0,0 +1,107 @@
+"""Warm a fresh worker before it takes traffic.
+
+gunicorn.conf.py calls run() from post_worker_init, i.e. in each worker
+after the app is loaded and before it accepts connections, so the first
+customer after a Render cold start does not pay for:
+
+- database: opening the connection (TLS with sslmode=require). It stays
+  open for the first request with CONN_MAX_AGE > 0; on the transaction
+  pooler (CONN_MAX_AGE = 0) only DNS/TLS session reuse is gained;
+- urls: importing every view module and building the URL resolver;
+- templates: compiling every template under templates/store and
+  templates/staff into the cached loader;
+- translations: loading the locale/ catalogs of every LANGUAGES entry;
+- catalog: the landing-page catalog cache entries (see /readyz/).
+
+Each step is timed and a failing step is logged and skipped — a worker
+that could not warm up still serves, just slower.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIRS = ("store", "staff")
+
+
+def _database() -> str:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+    return connection.vendor
+
+
+def _urls() -> str:
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    # reverse_dict populates the resolver, importing every view module
+    return f"{len(resolver.reverse_dict)} names"
+
+
+def _templates() -> str:
+    from django.template.loader import get_template
+
+    root = Path(settings.BASE_DIR) / "templates"
+    names = sorted(
+        path.relative_to(root).as_posix() for folder in TEMPLATE_DIRS for path in (root / folder).rglob("*.html")
+    )
+    for name in names:
+        get_template(name)
+    return f"{len(names)} compiled"
+
+
+def _translations() -> str:
+    from django.utils import translation
+
+    codes = [code for code, _ in settings.LANGUAGES]
+    current = translation.get_language()
+    try:
+        for code in codes:
+            translation.activate(code)
+            translation.gettext("Home")
+    finally:
+        translation.activate(current or settings.LANGUAGE_CODE)
+    return ", ".join(codes)
+
+
+def _catalog() -> str:
+    from apps.store.views import warm_catalog_cache
+
+    return f"{warm_catalog_cache()} entries built"
+
+
+STEPS = (
+    ("database", _database),
+    ("urls", _urls),
+    ("templates", _templates),
+    ("translations", _translations),
+    ("catalog", _catalog),
+)
+
+
+def run() -> dict[str, float]:
+    """Run every step; returns milliseconds per step (and "total")."""
+    timings: dict[str, float] = {}
+    details = []
+    started = time.perf_counter()
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            detail = step()
+        except Exception:
+            logger.exception("warm-up step %s failed", name)
+            detail = "failed"
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+        details.append(f"{name} {timings[name]:.0f} ms ({detail})")
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("warm-up %.0f ms: %s", timings["total"], "; ".join(details))
+    return timings
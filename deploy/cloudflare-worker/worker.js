@@ -8,6 +8,10 @@
  *
  * Env var in Worker settings:
  *   ORIGIN = https://matcha-shopbeta.onrender.com
+ *
+ * While the origin wakes up, customers see LOADING_HTML until /readyz/
+ * passes (database connected, migrations applied, catalog cache warm) —
+ * /healthz/ only proves the process is up.
  */
 
 const LOADING_HTML = `<!DOCTYPE html>
@@ -23,7 +27,7 @@ async function wakeOrigin(origin, maxWaitMs) {
   const deadline = Date.now() + maxWaitMs;
   while (Date.now() < deadline) {
     try {
-      const r = await fetch(origin + "/healthz/", { cf: { cacheTtl: 0, cacheEverything: false } });
+      const r = await fetch(origin + "/readyz/", { cf: { cacheTtl: 0, cacheEverything: false } });
       if (r.ok) return true;
     } catch (e) {}
     await new Promise((r) => setTimeout(r, 2500));
@@ -37,7 +41,7 @@ export default {
     const url = new URL(request.url);
     const target = origin + url.pathname + url.search;
 
-    if (url.pathname === "/healthz" || url.pathname === "/healthz/") {
+    if (["/healthz", "/healthz/", "/readyz", "/readyz/"].includes(url.pathname)) {
       return fetch(origin + url.pathname, request);
     }
 
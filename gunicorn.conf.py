@@ -0,0 +1,25 @@
+"""gunicorn settings shared by scripts/render_start.sh (bind/workers stay on
+its command line)."""
+
+import logging
+import os
+
+
+def post_worker_init(worker):
+    """Warm each worker (config.warmup) before it accepts connections."""
+    if os.getenv("WARMUP_ON_START", "1") != "1":
+        return
+    from config.warmup import run
+
+    run()
+
+
+def worker_exit(server, worker):
+    """Write back carts this worker changed only in the cache
+    (apps.store.cart_store)."""
+    from apps.store.cart_store import flush_pending
+
+    try:
+        flush_pending()
+    except Exception:
+        logging.getLogger("apps.store.cart_store").exception("cart write-back on exit failed")
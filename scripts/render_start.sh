@@ -3,6 +3,18 @@ set -euo pipefail
 
 mkdir -p media/slips
 
+# Per-worker metric files for /metrics (config.metrics); start from zero each boot
+export METRICS_MULTIPROC_DIR="${METRICS_MULTIPROC_DIR:-/tmp/matcha-metrics}"
+rm -rf "$METRICS_MULTIPROC_DIR" && mkdir -p "$METRICS_MULTIPROC_DIR"
+# Shared catalog cache tier and its version counter (apps.catalog.cache), so
+# warm storefront pages run no queries; derived data, so start empty each boot
+export CATALOG_CACHE_DIR="${CATALOG_CACHE_DIR:-/tmp/matcha-catalog-cache}"
+rm -rf "$CATALOG_CACHE_DIR" && mkdir -p "$CATALOG_CACHE_DIR"
+# Live logged-in/POS carts (apps.store.cart_store); synced to the database on
+# a timer and when each worker exits, so this directory need not survive
+export CART_CACHE_DIR="${CART_CACHE_DIR:-/tmp/matcha-carts}"
+mkdir -p "$CART_CACHE_DIR"
+
 # Do not block the web port if DB is slow or unreachable at boot.
 if command -v timeout >/dev/null 2>&1; then
   timeout 90 python manage.py migrate --noinput || echo "WARN: migrate failed or timed out; starting web anyway"
@@ -10,7 +22,19 @@ else
   python manage.py migrate --noinput || echo "WARN: migrate failed; starting web anyway"
 fi
 
+# Warm product photo renditions (apps.catalog.images) and precompress media
+# (config.media); both are served lazily/uncompressed while this still runs
+(python manage.py build_product_images && python manage.py compress_media) >/dev/null 2>&1 &
+# Seed the dashboard sales rollup from existing orders on first deploy (apps.sales.rollup)
+python manage.py rebuild_sales_rollup --if-empty >/dev/null 2>&1 &
+# Push spooled payment slips to storage in the background (apps.sales.slip_uploads)
+python manage.py process_slip_uploads &
+# Deliver queued shop notifications (apps.store.notifications)
+python manage.py drain_notifications &
+
+# gunicorn.conf.py warms each worker (config.warmup) before it takes traffic
 exec gunicorn config.wsgi \
+  --config gunicorn.conf.py \
   --workers 1 \
   --bind "0.0.0.0:${PORT:?PORT not set}" \
   --timeout 120 \
@@ -0,0 +1,83 @@
+(function () {
+  // Cart links/forms marked [data-cart-action] post to the JSON cart API
+  // (apps.store.cart_api) and patch the page in place: the cart panel
+  // ([data-cart-panel]) is swapped for the server-rendered partial and
+  // [data-cart-count] badges are updated. Clicks are queued so rapid taps
+  // at the POS apply in order. Without fetch, or if the request never
+  // reaches the server, the link/form falls back to the classic redirecting
+  // cart URL. Any answer from the server (even an error) means the change
+  // may already be applied, so the page is reloaded instead of replaying it.
+  // The CSRF token comes from a form on the page or the csrftoken cookie;
+  // pages are not made to carry one (that would make them uncacheable), so
+  // with neither the classic URL is used too.
+  if (!window.fetch || !window.URLSearchParams) return;
+
+  var API = "/cart/api/";
+  var queue = Promise.resolve();
+
+  function csrfToken() {
+    var input = document.querySelector('input[name="csrfmiddlewaretoken"]');
+    if (input) return input.value;
+    var match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : "";
+  }
+
+  function send(el, qty) {
+    var cart = el.dataset.cart;
+    var body = new URLSearchParams();
+    if (el.dataset.product) body.set("product_id", el.dataset.product);
+    if (qty) body.set("qty", qty);
+    var panel = document.querySelector('[data-cart-panel="' + cart + '"]');
+    var url = API + cart + "/" + el.dataset.cartAction + "/" + (panel ? "?partial=1" : "");
+    var request = fetch(url, {
+      method: "POST",
+      body: body,
+      credentials: "same-origin",
+      headers: { "X-CSRFToken": csrfToken(), "X-Requested-With": "XMLHttpRequest" },
+    }).catch(function (err) {
+      err.network = true;
+      throw err;
+    });
+    return request
+      .then(function (r) {
+        if (!r.ok) throw new Error(r.status);
+        return r.json();
+      })
+      .then(function (data) {
+        if (panel && typeof data.html === "string") panel.innerHTML = data.html;
+        document.querySelectorAll('[data-cart-count="' + cart + '"]').forEach(function (badge) {
+          badge.textContent = data.count;
+          badge.hidden = !data.count;
+        });
+        if (!panel) {
+          el.classList.add("mz-cart-added");
+          setTimeout(function () { el.classList.remove("mz-cart-added"); }, 600);
+        }
+      });
+  }
+
+  function enqueue(el, qty, fallback) {
+    queue = queue.then(function () {
+      if (!csrfToken()) return fallback();
+      return send(el, qty).catch(function (err) {
+        if (err && err.network) fallback();
+        else window.location.reload();
+      });
+    });
+  }
+
+  document.addEventListener("click", function (event) {
+    var link = event.target.closest("a[data-cart-action]");
+    if (!link || event.button !== 0 || event.metaKey || event.ctrlKey || event.shiftKey) return;
+    event.preventDefault();
+    enqueue(link, link.dataset.qty, function () { window.location.href = link.href; });
+  });
+
+  document.addEventListener("submit", function (event) {
+    var form = event.target.closest("form[data-cart-action]");
+    if (!form) return;
+    event.preventDefault();
+    var qty = form.elements.qty ? form.elements.qty.value : form.dataset.qty;
+    enqueue(form, qty, function () { form.submit(); });
+  });
+})();
@@ -0,0 +1,40 @@
+(function () {
+  // Replaces each [data-infinite-next] sentinel with the next page fragment
+  // once it scrolls near the viewport. Without JS the sentinel's own
+  // "Load more" link still works as plain pagination.
+  if (!("IntersectionObserver" in window) || !window.fetch) return;
+
+  var observer = new IntersectionObserver(function (entries) {
+    entries.forEach(function (entry) {
+      if (entry.isIntersecting) load(entry.target);
+    });
+  }, { rootMargin: "600px 0px" });
+
+  function load(sentinel) {
+    if (sentinel.dataset.loading) return;
+    sentinel.dataset.loading = "1";
+    observer.unobserve(sentinel);
+    fetch(sentinel.dataset.infiniteNext, {
+      headers: { "X-Requested-With": "XMLHttpRequest" },
+      credentials: "same-origin",
+    })
+      .then(function (r) {
+        if (!r.ok) throw new Error(r.status);
+        return r.text();
+      })
+      .then(function (html) {
+        var tpl = document.createElement("template");
+        tpl.innerHTML = html;
+        var next = tpl.content.querySelectorAll("[data-infinite-next]");
+        sentinel.replaceWith(tpl.content);
+        next.forEach(function (el) { observer.observe(el); });
+      })
+      .catch(function () {
+        delete sentinel.dataset.loading;
+      });
+  }
+
+  document.querySelectorAll("[data-infinite-next]").forEach(function (el) {
+    observer.observe(el);
+  });
+})();
@@ -0,0 +1,54 @@
+(function () {
+  // Shrinks the chosen slip photo in the browser before the form posts, so
+  // a 5 MB phone photo goes up as a ~200 KB JPEG. The server re-encodes
+  // anyway (apps.sales.slip_images); if anything here is unsupported the
+  // original file is sent untouched.
+  var MAX_SIDE = 1600;
+  var QUALITY = 0.82;
+  var MIN_BYTES = 300 * 1024;
+
+  if (!window.DataTransfer || !HTMLCanvasElement.prototype.toBlob || !window.createImageBitmap) return;
+
+  function shrink(file) {
+    // imageOrientation: "from-image" applies the EXIF rotation
+    return createImageBitmap(file, { imageOrientation: "from-image" }).then(function (bitmap) {
+      var scale = Math.min(1, MAX_SIDE / Math.max(bitmap.width, bitmap.height));
+      var canvas = document.createElement("canvas");
+      canvas.width = Math.round(bitmap.width * scale);
+      canvas.height = Math.round(bitmap.height * scale);
+      var ctx = canvas.getContext("2d");
+      ctx.fillStyle = "#fff";
+      ctx.fillRect(0, 0, canvas.width, canvas.height);
+      ctx.drawImage(bitmap, 0, 0, canvas.width, canvas.height);
+      return new Promise(function (resolve) {
+        canvas.toBlob(resolve, "image/jpeg", QUALITY);
+      });
+    });
+  }
+
+  document.querySelectorAll("input[data-slip-compress]").forEach(function (input) {
+    var form = input.form;
+    if (!form) return;
+    form.addEventListener("submit", function (event) {
+      var file = input.files && input.files[0];
+      if (!file || form.dataset.compressed || file.size < MIN_BYTES || !/^image\//.test(file.type)) return;
+      event.preventDefault();
+      var button = form.querySelector("[type=submit]");
+      if (button) button.disabled = true;
+      shrink(file)
+        .then(function (blob) {
+          if (blob && blob.size < file.size) {
+            var name = file.name.replace(/\.[^.]*$/, "") + ".jpg";
+            var dt = new DataTransfer();
+            dt.items.add(new File([blob], name, { type: "image/jpeg" }));
+            input.files = dt.files;
+          }
+        })
+        .catch(function () {})
+        .then(function () {
+          form.dataset.compressed = "1";
+          form.submit();
+        });
+    });
+  });
+})();